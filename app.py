@@ -3,20 +3,34 @@ HTTP Playground v3.0 — Main Application
 20 modules, dual API keys, Deep Freeze daemon, per-user isolation
 """
 import os
-import threading
+import sqlite3
 from datetime import datetime
-from functools import wraps
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from flask import Flask, request, jsonify, render_template, g
 from flask_cors import CORS
-from database import init_db, get_db
+from database import init_db, get_db, release_request_db, pool_stats
+from indexes import ensure_indexes
+from search import ensure_search_indexes
+from counters import ensure_counters, get_counts
+from overlay import ensure_overlays, overlay_stats, FREEZE_MODE
+from codec import ensure_snapshot_schemas
+from snapshot import ensure_snapshot, capture_snapshot, restore_snapshot, resolve_tables, snapshot_info, snapshot_stats
+from writer import writer_stats
+from telemetry import telemetry_stats
+from retention import ensure_auto_vacuum, start_retention_daemon, retention_stats, RETENTION_DAEMON
+from quota import quota_stats, revoke_keys
+from state import state_stats
+from ratelimit import check_rate_limit, add_rate_limit_headers, rate_limit, rate_limit_stats
+from hashing import HashPoolBusy, hashing_stats
+from registry import MODULES, MODULE_TABLES, TABLE_MODULES
+from freeze import count_pending_modifications, start_freeze_daemon, freeze_stats, freeze_health, FREEZE_DAEMON
 from auth import (
     hash_password, verify_password, create_access_token, create_refresh_token,
     decode_token, generate_api_key, get_current_user, require_role,
-    track_login_attempt, is_locked_out, log_audit,
+    needs_rehash, track_login_attempt, is_locked_out, log_audit, invalidate_user, user_cache_stats, api_key_stats,
     STANDARD_KEY_LIMIT, AI_KEY_LIMIT
 )
 
@@ -25,28 +39,14 @@ app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024  # 2MB
 
 CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=[
     "X-API-Requests-Remaining", "X-API-Requests-Max", "X-API-Key-Type",
-    "X-AI-Requests-Remaining", "X-AI-Requests-Max"
+    "X-AI-Requests-Remaining", "X-AI-Requests-Max",
+    "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"
 ])
 
 # ============ RATE LIMITING ============
-from collections import defaultdict
-import time
-
-rate_limits = defaultdict(list)
-
-def rate_limit(max_calls, window_seconds):
-    def decorator(f):
-        @wraps(f)
-        def decorated(*args, **kwargs):
-            key = f"{request.remote_addr}:{f.__name__}"
-            now = time.time()
-            rate_limits[key] = [t for t in rate_limits[key] if now - t < window_seconds]
-            if len(rate_limits[key]) >= max_calls:
-                return jsonify({'error': 'Rate limit exceeded', 'retry_after': window_seconds}), 429
-            rate_limits[key].append(now)
-            return f(*args, **kwargs)
-        return decorated
-    return decorator
+# Per route class and caller, see ratelimit.py; register/login add @rate_limit on top
+app.before_request(check_rate_limit)
+app.after_request(add_rate_limit_headers)
 
 
 # ============ SECURITY HEADERS ============
@@ -66,12 +66,22 @@ def log_request():
     g.request_start = datetime.utcnow()
 
 
+# ============ DB CONNECTION LEASE ============
+app.teardown_appcontext(release_request_db)
+
+
 # ============ REGISTER MODULES ============
 from modules import modules_bp
 app.register_blueprint(modules_bp)
 
 
 # ============ AUTH ROUTES ============
+def hashing_busy():
+    resp = jsonify({'error': 'Server busy, please retry'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
+
+
 @app.route('/api/auth/register', methods=['POST'])
 @rate_limit(5, 60)
 def register():
@@ -92,14 +102,24 @@ def register():
 
     conn = get_db()
     existing = conn.execute("SELECT id FROM users WHERE username = ? OR email = ?", (username, email)).fetchone()
+    conn.close()
     if existing:
-        conn.close()
         return jsonify({'error': 'Username or email already exists'}), 409
 
-    pw_hash = hash_password(password)
-    conn.execute("INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)", (username, email, pw_hash))
-    conn.commit()
-    conn.close()
+    # Hash without holding a pooled connection
+    try:
+        pw_hash = hash_password(password)
+    except HashPoolBusy:
+        return hashing_busy()
+    conn = get_db()
+    try:
+        conn.execute("INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)", (username, email, pw_hash))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 409
+    finally:
+        conn.close()
 
     return jsonify({
         'message': 'Registration successful! Your account is pending admin approval.',
@@ -108,6 +128,36 @@ def register():
     }), 201
 
 
+# The standard key in use (active) and the user's one AI key (active or exhausted)
+LOGIN_KEYS_JOIN = ("LEFT JOIN api_keys ak ON ak.user_id = u.id AND (ak.key_type = 'ai' OR ak.is_active = 1)")
+KEY_COLUMNS = ('key', 'key_type', 'request_count', 'max_requests')
+
+def _collect_keys(rows):
+    keys = {}
+    for row in rows:
+        if row['key_type'] is not None and row['key_type'] not in keys:
+            keys[row['key_type']] = {col: row[col] for col in KEY_COLUMNS}
+    return keys
+
+def fetch_login(conn, username):
+    """(user row, {key_type: key}) in one query; (None, {}) for an unknown username."""
+    rows = conn.execute(
+        f"SELECT u.*, {', '.join('ak.' + c for c in KEY_COLUMNS)} FROM users u {LOGIN_KEYS_JOIN} "
+        "WHERE u.username = ? ORDER BY ak.id", (username,)
+    ).fetchall()
+    if not rows:
+        return None, {}
+    user = {col: rows[0][col] for col in rows[0].keys() if col not in KEY_COLUMNS}
+    return user, _collect_keys(rows)
+
+def fetch_keys(conn, user_id):
+    rows = conn.execute(
+        f"SELECT {', '.join('ak.' + c for c in KEY_COLUMNS)} FROM users u {LOGIN_KEYS_JOIN} "
+        "WHERE u.id = ? ORDER BY ak.id", (user_id,)
+    ).fetchall()
+    return _collect_keys(rows)
+
+
 @app.route('/api/auth/login', methods=['POST'])
 @rate_limit(10, 60)
 def login():
@@ -124,57 +174,62 @@ def login():
     if is_locked_out(username):
         return jsonify({'error': 'Account locked due to too many failed attempts. Try again in 15 minutes.'}), 423
 
+    # One read for the user and both keys; the connection goes back before hashing
     conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    user, keys = fetch_login(conn, username)
+    conn.close()
 
-    if not user or not verify_password(password, user['password_hash']):
+    try:
+        valid = user is not None and verify_password(password, user['password_hash'])
+    except HashPoolBusy:
+        return hashing_busy()
+    if not valid:
         track_login_attempt(username, False, request.remote_addr)
-        conn.close()
         return jsonify({'error': 'Invalid credentials'}), 401
 
     if user['status'] != 'approved':
-        conn.close()
         return jsonify({'error': 'Account not approved yet', 'status': user['status']}), 403
 
+    # Attempt and audit rows go through the telemetry buffer, not this request's transaction
     track_login_attempt(username, True, request.remote_addr)
 
-    # Generate/fetch both API keys
-    standard_key = conn.execute(
-        "SELECT * FROM api_keys WHERE user_id = ? AND key_type = 'standard' AND is_active = 1",
-        (user['id'],)
-    ).fetchone()
-
-    if not standard_key:
-        new_key = generate_api_key('standard')
-        conn.execute(
-            "INSERT INTO api_keys (user_id, key, key_type, max_requests) VALUES (?, ?, 'standard', ?)",
-            (user['id'], new_key, STANDARD_KEY_LIMIT)
-        )
-        standard_key_str = new_key
-        standard_remaining = STANDARD_KEY_LIMIT
-    else:
-        standard_key_str = standard_key['key']
-        standard_remaining = standard_key['max_requests'] - standard_key['request_count']
-
-    ai_key = conn.execute(
-        "SELECT * FROM api_keys WHERE user_id = ? AND key_type = 'ai'",
-        (user['id'],)
-    ).fetchone()
-
-    if not ai_key:
-        new_ai_key = generate_api_key('ai')
-        conn.execute(
-            "INSERT INTO api_keys (user_id, key, key_type, max_requests) VALUES (?, ?, 'ai', ?)",
-            (user['id'], new_ai_key, AI_KEY_LIMIT)
-        )
-        ai_key_str = new_ai_key
-        ai_remaining = AI_KEY_LIMIT
-    else:
-        ai_key_str = ai_key['key']
-        ai_remaining = max(0, ai_key['max_requests'] - ai_key['request_count'])
+    # Upgrade hashes made with other than the current HASH_ITERATIONS; best effort
+    new_hash = None
+    if needs_rehash(user['password_hash']):
+        try:
+            new_hash = hash_password(password)
+        except HashPoolBusy:
+            pass
 
-    conn.commit()
-    conn.close()
+    # At most one write transaction: the rehash and any missing keys
+    if new_hash or 'standard' not in keys or 'ai' not in keys:
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if new_hash:
+                conn.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                             (new_hash, user['id'], user['password_hash']))
+            # Re-read under the write lock: a concurrent login may have just created them
+            keys = fetch_keys(conn, user['id'])
+            for key_type, limit in (('standard', STANDARD_KEY_LIMIT), ('ai', AI_KEY_LIMIT)):
+                if key_type not in keys:
+                    new_key = generate_api_key(key_type)
+                    conn.execute(
+                        "INSERT INTO api_keys (user_id, key, key_type, max_requests) VALUES (?, ?, ?, ?)",
+                        (user['id'], new_key, key_type, limit)
+                    )
+                    keys[key_type] = {'key': new_key, 'request_count': 0, 'max_requests': limit}
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    standard_key_str = keys['standard']['key']
+    standard_remaining = keys['standard']['max_requests'] - keys['standard']['request_count']
+    ai_key_str = keys['ai']['key']
+    ai_remaining = max(0, keys['ai']['max_requests'] - keys['ai']['request_count'])
 
     access_token = create_access_token(user['id'], user['username'], user['role'])
     refresh_token = create_refresh_token(user['id'])
@@ -278,6 +333,8 @@ def regenerate_standard_key():
 
     conn = get_db()
     # Deactivate all existing standard keys
+    old_keys = [r[0] for r in conn.execute(
+        "SELECT id FROM api_keys WHERE user_id = ? AND key_type = 'standard' AND is_active = 1", (user['id'],))]
     conn.execute("UPDATE api_keys SET is_active = 0 WHERE user_id = ? AND key_type = 'standard'", (user['id'],))
     # Create new standard key
     new_key = generate_api_key('standard')
@@ -287,6 +344,8 @@ def regenerate_standard_key():
     )
     conn.commit()
     conn.close()
+    invalidate_user(user['id'])
+    revoke_keys(old_keys)
 
     log_audit(user['id'], 'regenerate_standard_key', 'auth')
 
@@ -335,6 +394,7 @@ def approve_user(user_id):
 
     conn.commit()
     conn.close()
+    invalidate_user(user_id)
     log_audit(g.current_user['id'], 'approve_user', 'admin', f'Approved user {user_id}')
     return jsonify({'message': f'User {user["username"]} approved with both standard and AI API keys'})
 
@@ -345,6 +405,7 @@ def reject_user(user_id):
     conn.execute("UPDATE users SET status = 'rejected' WHERE id = ?", (user_id,))
     conn.commit()
     conn.close()
+    invalidate_user(user_id)
     return jsonify({'message': 'User rejected'})
 
 @app.route('/api/admin/stats', methods=['GET'])
@@ -364,46 +425,71 @@ def admin_stats():
             'total_ai_requests': conn.execute("SELECT COALESCE(SUM(request_count),0) FROM api_keys WHERE key_type = 'ai'").fetchone()[0],
         },
         'deep_freeze': {
-            'pending_modifications': conn.execute("SELECT COUNT(*) FROM user_modifications WHERE expires_at > datetime('now')").fetchone()[0],
+            'pending_modifications': count_pending_modifications(),
+            'overlay': overlay_stats(),
+            'scheduler': freeze_stats(),
+            'snapshot': snapshot_stats(),
+        },
+        'database': {
+            'pool': pool_stats(),
+            'writer': writer_stats(),
+            'telemetry': telemetry_stats(),
+            'retention': retention_stats(),
         },
+        'auth': {'user_cache': user_cache_stats(), 'quota': quota_stats(), 'hashing': hashing_stats(),
+                 'api_keys': api_key_stats()},
+        'state': state_stats(),
+        'rate_limit': rate_limit_stats(),
         'modules': {}
     }
-    tables = ['books','menu_items','tasks','students','notes','files','blog_posts','inventory',
-              'products','movies','recipes','events','contacts','songs','quotes','countries',
-              'jokes','vehicles','courses','pets']
-    for t in tables:
-        try:
-            stats['modules'][t] = conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
-        except:
-            stats['modules'][t] = 0
     conn.close()
+    counts = get_counts()
+    for t in MODULE_TABLES:
+        stats['modules'][t] = counts.get(t, 0)
     return jsonify(stats)
 
 
+def _snapshot_tables():
+    """Module tables named in the body's "modules" list (all when absent); None if a name is unknown."""
+    names = (request.get_json(silent=True) or {}).get('modules') or []
+    try:
+        return resolve_tables([names] if isinstance(names, str) else names)
+    except KeyError:
+        return None
+
+@app.route('/api/admin/snapshot', methods=['GET'])
+@require_role('admin', 'superadmin')
+def admin_snapshot():
+    return jsonify({'modules': snapshot_info(), 'stats': snapshot_stats()})
+
+@app.route('/api/admin/snapshot/restore', methods=['POST'])
+@require_role('admin', 'superadmin')
+def admin_snapshot_restore():
+    tables = _snapshot_tables()
+    if tables is None:
+        return jsonify({'error': 'Unknown module'}), 400
+    try:
+        result = restore_snapshot(tables)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 409
+    log_audit(g.current_user['id'], 'restore_baseline', 'admin',
+              f"Restored {', '.join(result['tables'])} in {result['ms']} ms")
+    return jsonify({'message': f"Restored {len(result['tables'])} modules to their baseline", **result})
+
+@app.route('/api/admin/snapshot/capture', methods=['POST'])
+@require_role('superadmin')
+def admin_snapshot_capture():
+    tables = _snapshot_tables()
+    if tables is None:
+        return jsonify({'error': 'Unknown module'}), 400
+    captured = capture_snapshot(tables)
+    log_audit(g.current_user['id'], 'capture_baseline', 'admin', f"Captured {', '.join(captured)}")
+    return jsonify({'message': f'Captured the baseline of {len(captured)} modules', 'tables': captured})
+
 # ============ MODULE PAGES ============
 MODULE_INFO = {
-    'books': {'title': 'Library System', 'icon': '📚', 'endpoint': '/api/books', 'table': 'books'},
-    'menu': {'title': 'Restaurant Menu', 'icon': '🍽️', 'endpoint': '/api/menu', 'table': 'menu_items'},
-    'tasks': {'title': 'Task Manager', 'icon': '✅', 'endpoint': '/api/tasks', 'table': 'tasks'},
-    'students': {'title': 'Student Management', 'icon': '🎓', 'endpoint': '/api/students', 'table': 'students'},
-    'notes': {'title': 'Notes System', 'icon': '📝', 'endpoint': '/api/notes', 'table': 'notes'},
-    'files': {'title': 'File Manager', 'icon': '📁', 'endpoint': '/api/files', 'table': 'files'},
-    'blog': {'title': 'Blog Platform', 'icon': '✍️', 'endpoint': '/api/blog', 'table': 'blog_posts'},
-    'inventory': {'title': 'Inventory System', 'icon': '📦', 'endpoint': '/api/inventory', 'table': 'inventory'},
-    'products': {'title': 'Product Store', 'icon': '🛍️', 'endpoint': '/api/products', 'table': 'products'},
-    'movies': {'title': 'Movie Database', 'icon': '🎬', 'endpoint': '/api/movies', 'table': 'movies'},
-    'recipes': {'title': 'Recipe Book', 'icon': '🧑‍🍳', 'endpoint': '/api/recipes', 'table': 'recipes'},
-    'events': {'title': 'Event Calendar', 'icon': '📅', 'endpoint': '/api/events', 'table': 'events'},
-    'contacts': {'title': 'Address Book', 'icon': '📇', 'endpoint': '/api/contacts', 'table': 'contacts'},
-    'songs': {'title': 'Music Library', 'icon': '🎵', 'endpoint': '/api/songs', 'table': 'songs'},
-    'quotes': {'title': 'Quotes Collection', 'icon': '💬', 'endpoint': '/api/quotes', 'table': 'quotes'},
-    'countries': {'title': 'World Countries', 'icon': '🌍', 'endpoint': '/api/countries', 'table': 'countries'},
-    'jokes': {'title': 'Joke API', 'icon': '😂', 'endpoint': '/api/jokes', 'table': 'jokes'},
-    'vehicles': {'title': 'Vehicle Market', 'icon': '🚗', 'endpoint': '/api/vehicles', 'table': 'vehicles'},
-    'courses': {'title': 'Online Courses', 'icon': '🎓', 'endpoint': '/api/courses', 'table': 'courses'},
-    'pets': {'title': 'Pet Adoption', 'icon': '🐾', 'endpoint': '/api/pets', 'table': 'pets'},
-    'weather': {'title': 'Weather API', 'icon': '🌤️', 'endpoint': '/api/weather', 'table': None},
-    'ai': {'title': 'AI Assistant', 'icon': '🤖', 'endpoint': '/api/ai', 'table': None},
+    m.name: {'title': m.title, 'icon': m.icon, 'endpoint': m.endpoint, 'table': m.table}
+    for m in MODULES.values()
 }
 
 @app.route('/module/<name>')
@@ -417,15 +503,8 @@ def module_page(name):
 # ============ UTILITY API ENDPOINTS ============
 @app.route('/api/health', methods=['GET'])
 def health():
-    conn = get_db()
-    module_counts = {}
-    for name, info in MODULE_INFO.items():
-        if info['table']:
-            try:
-                module_counts[name] = conn.execute(f"SELECT COUNT(*) FROM {info['table']}").fetchone()[0]
-            except:
-                module_counts[name] = 0
-    conn.close()
+    counts = get_counts()
+    module_counts = {name: counts.get(info['table'], 0) for name, info in MODULE_INFO.items() if info['table']}
     return jsonify({
         'status': 'healthy',
         'version': '3.0.0',
@@ -433,12 +512,20 @@ def health():
         'total_endpoints': '100+',
         'module_records': module_counts,
         'features': ['deep_freeze', 'dual_api_keys', 'per_user_isolation', 'file_security', 'ai_assistant'],
+        'deep_freeze_mode': FREEZE_MODE,
         'api_key_system': {
             'standard': {'prefix': 'nhk_', 'limit': STANDARD_KEY_LIMIT, 'regenerable': True},
             'ai': {'prefix': 'nai_', 'limit': AI_KEY_LIMIT, 'regenerable': False}
         }
     })
 
+
+@app.route('/api/health/freeze', methods=['GET'])
+def health_freeze():
+    """Deep Freeze leader and revert lag; 503 when no leader heartbeats or reverts fall behind."""
+    info = freeze_health()
+    return jsonify(info), 200 if info['status'] == 'healthy' else 503
+
 @app.route('/api/info', methods=['GET'])
 def api_info():
     return jsonify({
@@ -548,14 +635,6 @@ def server_error(e):
     return jsonify({'error': 'Internal server error'}), 500
 
 
-# ============ DEEP FREEZE DAEMON ============
-def start_freeze_daemon():
-    from freeze import freeze_cleanup
-    t = threading.Thread(target=freeze_cleanup, daemon=True)
-    t.start()
-    print("🧊 Deep Freeze daemon started")
-
-
 # ============ INIT & RUN ============
 def create_superadmin():
     """Create superadmin from env vars if not exists"""
@@ -582,8 +661,19 @@ def create_superadmin():
 
 
 init_db()
+ensure_indexes(TABLE_MODULES)
+ensure_search_indexes(TABLE_MODULES)
+ensure_counters(MODULE_TABLES)
+ensure_overlays(TABLE_MODULES)
+ensure_snapshot_schemas(TABLE_MODULES)
+ensure_snapshot(MODULE_TABLES)
 create_superadmin()
-start_freeze_daemon()
+ensure_auto_vacuum()
+# Under gunicorn (gunicorn.conf.py) each worker starts its own candidates after the fork instead
+if FREEZE_DAEMON == 'import':
+    start_freeze_daemon()
+if RETENTION_DAEMON == 'import':
+    start_retention_daemon()
 
 if __name__ == '__main__':
     port = int(os.getenv('SERVER_PORT', 5050))
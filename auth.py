@@ -5,12 +5,22 @@ AI keys: 3 requests (AI endpoints only, max 1 per user)
 """
 import os
 import jwt
+import hmac
 import secrets
+import math
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, g
 from database import get_db
+from telemetry import record, pending_rows, utc_timestamp
+from quota import lookup_key, take_request, invalidate_user_keys, QuotaBusy, QUOTA_FLUSH_INTERVAL
+# PBKDF2 runs on the hashing pool, off the worker's event loop; re-exported for app.py
+from hashing import hash_password, verify_password, needs_rehash
+from state import get_state, StateUnavailable
 
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', 'dev-secret-key-change-me')
 JWT_ALGORITHM = 'HS256'
@@ -20,20 +30,9 @@ REFRESH_TOKEN_EXPIRY = timedelta(days=30)
 STANDARD_KEY_LIMIT = 15
 AI_KEY_LIMIT = 3
 
-
-# ============ PASSWORD HASHING ============
-def hash_password(password):
-    salt = secrets.token_hex(16)
-    hashed = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-    return f"{salt}:{hashed.hex()}"
-
-def verify_password(password, stored):
-    try:
-        salt, hashed = stored.split(':')
-        check = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-        return check.hex() == hashed
-    except Exception:
-        return False
+# Verified bearer token -> user row, per worker process
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
 
 
 # ============ JWT TOKEN MANAGEMENT ============
@@ -67,19 +66,143 @@ def decode_token(token):
 
 
 # ============ API KEY GENERATION ============
+def _load_key_secrets():
+    """API_KEY_SECRETS="kid:secret,kid:secret" (first one signs). Default: one kid derived from JWT_SECRET."""
+    secrets_by_kid = {}
+    for item in os.getenv('API_KEY_SECRETS', '').split(','):
+        kid, _, secret = item.strip().partition(':')
+        if kid and secret:
+            if not kid.isalnum():
+                raise ValueError(f'API key id {kid!r} must be alphanumeric')
+            secrets_by_kid[kid] = secret.encode()
+    if not secrets_by_kid:
+        secrets_by_kid['k0'] = hmac.new(JWT_SECRET.encode(), b'api-key-signing', hashlib.sha256).digest()
+    return secrets_by_kid
+
+API_KEY_SECRETS = _load_key_secrets()
+API_KEY_KID = os.getenv('API_KEY_KID') or next(iter(API_KEY_SECRETS))
+# Unsigned keys from before signing existed still go to the database
+API_KEY_ALLOW_LEGACY = os.getenv('API_KEY_ALLOW_LEGACY', 'true').lower() in ('1', 'true', 'yes', 'on')
+API_KEY_PREFIXES = {'standard': 'nhk_', 'ai': 'nai_'}
+API_KEY_MAC_LENGTH = 24  # hex chars, 96 bits
+LEGACY_KEY_LENGTH = 48
+
+_key_checks = {'signed': 0, 'legacy': 0, 'rejected': 0}
+
+
+def _key_mac(kid, body):
+    return hmac.new(API_KEY_SECRETS[kid], body.encode(), hashlib.sha256).hexdigest()[:API_KEY_MAC_LENGTH]
+
 def generate_api_key(key_type='standard'):
-    """Generate a prefixed API key: nhk_ for standard, nai_ for AI"""
-    prefix = 'nhk_' if key_type == 'standard' else 'nai_'
-    return prefix + secrets.token_hex(24)
+    """Generate a signed, prefixed API key: nhk_ for standard, nai_ for AI.
+
+    Format: <prefix><kid>_<32 hex random>_<HMAC-SHA256(prefix + kid + random), 24 hex>
+    """
+    body = f"{API_KEY_PREFIXES.get(key_type, 'nai_')}{API_KEY_KID}_{secrets.token_hex(16)}"
+    return f"{body}_{_key_mac(API_KEY_KID, body)}"
+
+def check_api_key_format(api_key, key_type):
+    """True if api_key could be a real key of key_type: a valid signature, or legacy shape.
+
+    Runs before any database lookup, so forged and malformed keys cost one HMAC.
+    """
+    prefix = API_KEY_PREFIXES.get(key_type, 'nai_')
+    ok = False
+    if api_key.startswith(prefix) and len(api_key) <= 128:
+        rest = api_key[len(prefix):]
+        if rest.count('_') == 2:
+            body, _, mac = api_key.rpartition('_')
+            kid = rest.split('_', 1)[0]
+            ok = kid in API_KEY_SECRETS and hmac.compare_digest(_key_mac(kid, body), mac)
+            _key_checks['signed' if ok else 'rejected'] += 1
+            return ok
+        ok = (API_KEY_ALLOW_LEGACY and len(rest) == LEGACY_KEY_LENGTH
+              and all(c in '0123456789abcdef' for c in rest))
+    _key_checks['legacy' if ok else 'rejected'] += 1
+    return ok
+
+def api_key_stats():
+    return dict(_key_checks, kid=API_KEY_KID, kids=sorted(API_KEY_SECRETS), allow_legacy=API_KEY_ALLOW_LEGACY)
 
 
 # ============ CURRENT USER FROM JWT ============
+class UserCache:
+    """Bounded LRU of sha256(token) -> (expires_at, user row).
+
+    An entry never outlives its token's exp. Entries for a user are dropped by
+    invalidate_user() when their status or role changes; other workers converge
+    within USER_CACHE_TTL.
+    """
+
+    def __init__(self, size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.size = max(1, size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[0] <= time.time():
+                self._drop(key)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return dict(entry[1])
+
+    def put(self, key, user, token_exp):
+        expires_at = min(time.time() + self.ttl, token_exp)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (expires_at, dict(user))
+            self._by_user.setdefault(user['id'], set()).add(key)
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+                self.stats['invalidations'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[1]['id'])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[1]['id']]
+
+    def metrics(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(self.stats, size=size, capacity=self.size, ttl=self.ttl,
+                    hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else 0)
+
+
+_user_cache = UserCache()
+
+
 def get_current_user():
     """Extract user from Authorization Bearer token"""
     auth_header = request.headers.get('Authorization', '')
     if not auth_header.startswith('Bearer '):
         return None
     token = auth_header[7:]
+    key = hashlib.sha256(token.encode()).hexdigest()
+    user = _user_cache.get(key)
+    if user is not None:
+        return user
     payload = decode_token(token)
     if not payload or payload.get('type') != 'access':
         return None
@@ -88,7 +211,17 @@ def get_current_user():
     conn.close()
     if not user:
         return None
-    return dict(user)
+    user = dict(user)
+    _user_cache.put(key, user, payload['exp'])
+    return user
+
+def invalidate_user(user_id):
+    """Forget cached sessions and API key rows of a user whose row (status, role, keys) just changed."""
+    _user_cache.invalidate_user(user_id)
+    invalidate_user_keys(user_id)
+
+def user_cache_stats():
+    return _user_cache.metrics()
 
 
 # ============ GET USER FROM API KEY ============
@@ -98,21 +231,24 @@ def get_user_from_api_key(key_type='standard'):
     if not api_key:
         return None, None
 
-    conn = get_db()
-    key_row = conn.execute(
-        "SELECT ak.*, u.username, u.role, u.status FROM api_keys ak JOIN users u ON ak.user_id = u.id WHERE ak.key = ? AND ak.key_type = ?",
-        (api_key, key_type)
-    ).fetchone()
-
-    if not key_row:
-        conn.close()
+    if not check_api_key_format(api_key, key_type):
+        return None, None
+    key_data = lookup_key(api_key, key_type)
+    if not key_data:
         return None, None
-
-    key_data = dict(key_row)
-    conn.close()
     return key_data, key_data
 
 
+def quota_busy_response():
+    """429 for a key whose remaining requests are all held by other workers; they are handed back shortly."""
+    resp = jsonify({
+        'error': 'API key busy',
+        'message': 'The last requests of this key are held by other workers. Retry shortly.'
+    })
+    resp.headers['Retry-After'] = str(max(1, math.ceil(QUOTA_FLUSH_INTERVAL)))
+    return resp, 429
+
+
 # ============ REQUIRE API KEY DECORATOR (Standard) ============
 def require_api_key(f):
     """Decorator: requires a valid STANDARD API key for PUT/DELETE endpoints.
@@ -130,24 +266,16 @@ def require_api_key(f):
                 'prefix': 'nhk_'
             }), 401
 
-        conn = get_db()
-        key_row = conn.execute(
-            "SELECT ak.*, u.username, u.role, u.status FROM api_keys ak JOIN users u ON ak.user_id = u.id WHERE ak.key = ? AND ak.key_type = 'standard'",
-            (api_key,)
-        ).fetchone()
+        key_data = lookup_key(api_key, 'standard') if check_api_key_format(api_key, 'standard') else None
 
-        if not key_row:
-            conn.close()
+        if not key_data:
             return jsonify({
                 'error': 'Invalid API key',
                 'message': 'This key is not recognized as a valid Standard API key. Standard keys start with nhk_',
                 'key_type_expected': 'standard'
             }), 401
 
-        key_data = dict(key_row)
-
         if not key_data['is_active']:
-            conn.close()
             return jsonify({
                 'error': 'API key exhausted',
                 'message': f'This key has used all {STANDARD_KEY_LIMIT} requests. Generate a new key at POST /api/auth/regenerate-key',
@@ -156,29 +284,21 @@ def require_api_key(f):
             }), 403
 
         if key_data['status'] != 'approved':
-            conn.close()
             return jsonify({'error': 'Account not approved', 'message': 'Your account is pending admin approval.'}), 403
 
-        if key_data['request_count'] >= key_data['max_requests']:
-            conn.execute("UPDATE api_keys SET is_active = 0 WHERE id = ?", (key_data['id'],))
-            conn.commit()
-            conn.close()
+        # Spend one request from the quota ledger (claims a new block from api_keys when needed)
+        try:
+            remaining = take_request(key_data)
+        except QuotaBusy:
+            return quota_busy_response()
+        if remaining is None:
             return jsonify({
                 'error': 'API key limit reached',
                 'message': f'You have used all {STANDARD_KEY_LIMIT} requests. Create a new key: POST /api/auth/regenerate-key',
-                'requests_used': key_data['request_count'],
+                'requests_used': key_data['max_requests'],
                 'max_requests': key_data['max_requests']
             }), 429
 
-        # Increment usage
-        conn.execute(
-            "UPDATE api_keys SET request_count = request_count + 1, last_used = CURRENT_TIMESTAMP WHERE id = ?",
-            (key_data['id'],)
-        )
-        conn.commit()
-
-        remaining = key_data['max_requests'] - key_data['request_count'] - 1
-
         g.current_user = {
             'id': key_data['user_id'],
             'username': key_data['username'],
@@ -190,8 +310,6 @@ def require_api_key(f):
         g.requests_remaining = remaining
         g.requests_max = key_data['max_requests']
 
-        conn.close()
-
         response = f(*args, **kwargs)
 
         # Add tracking headers
@@ -228,24 +346,16 @@ def require_ai_key(f):
                 'limit': AI_KEY_LIMIT
             }), 401
 
-        conn = get_db()
-        key_row = conn.execute(
-            "SELECT ak.*, u.username, u.role, u.status FROM api_keys ak JOIN users u ON ak.user_id = u.id WHERE ak.key = ? AND ak.key_type = 'ai'",
-            (api_key,)
-        ).fetchone()
+        key_data = lookup_key(api_key, 'ai') if check_api_key_format(api_key, 'ai') else None
 
-        if not key_row:
-            conn.close()
+        if not key_data:
             return jsonify({
                 'error': 'Invalid AI API key',
                 'message': 'This key is not recognized as a valid AI API key. AI keys start with nai_',
                 'key_type_expected': 'ai'
             }), 401
 
-        key_data = dict(key_row)
-
         if not key_data['is_active']:
-            conn.close()
             return jsonify({
                 'error': 'AI API key exhausted',
                 'message': f'Your AI key has used all {AI_KEY_LIMIT} requests. AI keys cannot be regenerated — each user gets only {AI_KEY_LIMIT} AI requests total.',
@@ -254,29 +364,21 @@ def require_ai_key(f):
             }), 429
 
         if key_data['status'] != 'approved':
-            conn.close()
             return jsonify({'error': 'Account not approved'}), 403
 
-        if key_data['request_count'] >= key_data['max_requests']:
-            conn.execute("UPDATE api_keys SET is_active = 0 WHERE id = ?", (key_data['id'],))
-            conn.commit()
-            conn.close()
+        # Spend one request from the quota ledger (claims a new block from api_keys when needed)
+        try:
+            remaining = take_request(key_data)
+        except QuotaBusy:
+            return quota_busy_response()
+        if remaining is None:
             return jsonify({
                 'error': 'AI request limit reached',
                 'message': f'You have used all {AI_KEY_LIMIT} AI requests. AI keys cannot be regenerated.',
-                'requests_used': key_data['request_count'],
+                'requests_used': key_data['max_requests'],
                 'max_requests': AI_KEY_LIMIT
             }), 429
 
-        # Increment usage
-        conn.execute(
-            "UPDATE api_keys SET request_count = request_count + 1, last_used = CURRENT_TIMESTAMP WHERE id = ?",
-            (key_data['id'],)
-        )
-        conn.commit()
-
-        remaining = key_data['max_requests'] - key_data['request_count'] - 1
-
         g.current_user = {
             'id': key_data['user_id'],
             'username': key_data['username'],
@@ -288,8 +390,6 @@ def require_ai_key(f):
         g.requests_remaining = remaining
         g.requests_max = key_data['max_requests']
 
-        conn.close()
-
         response = f(*args, **kwargs)
 
         if hasattr(response, 'headers'):
@@ -308,26 +408,39 @@ def require_ai_key(f):
 
 
 # ============ LOGIN TRACKING ============
-def track_login_attempt(identifier, success, ip):
-    conn = get_db()
-    conn.execute(
-        "INSERT INTO login_attempts (identifier, success, ip_address) VALUES (?, ?, ?)",
-        (identifier, 1 if success else 0, ip)
-    )
-    conn.commit()
-    conn.close()
+LOCKOUT_WINDOW_MINUTES = 15
 
-def get_failed_attempts(identifier, window_minutes=15):
-    conn = get_db()
-    cutoff = datetime.utcnow() - timedelta(minutes=window_minutes)
-    count = conn.execute(
+def track_login_attempt(identifier, success, ip):
+    record('login_attempts', (identifier, 1 if success else 0, ip, utc_timestamp()))
+    if not success:
+        # Failure counter in the shared state backend; the window starts at the first failure
+        try:
+            get_state().incr(f"lockout:{identifier}", ttl=LOCKOUT_WINDOW_MINUTES * 60)
+        except StateUnavailable:
+            pass
+
+def get_failed_attempts(identifier, window_minutes=LOCKOUT_WINDOW_MINUTES):
+    # created_at is stored as 'YYYY-MM-DD HH:MM:SS', so the cutoff must use the same format
+    cutoff = utc_timestamp(datetime.utcnow() - timedelta(minutes=window_minutes))
+    # Failures not yet flushed by the telemetry buffer count too. Read them before the
+    # table: a flush landing in between is then counted twice, never missed.
+    count = len(pending_rows('login_attempts', lambda r: r[0] == identifier and not r[1] and r[3] > cutoff))
+    conn = get_db('login_attempts')
+    count += conn.execute(
         "SELECT COUNT(*) FROM login_attempts WHERE identifier = ? AND success = 0 AND created_at > ?",
-        (identifier, cutoff.isoformat())
+        (identifier, cutoff)
     ).fetchone()[0]
     conn.close()
     return count
 
 def is_locked_out(identifier, max_attempts=5):
+    state = get_state()
+    if state.shared:
+        try:
+            return (state.get(f"lockout:{identifier}") or 0) >= max_attempts
+        except StateUnavailable:
+            pass
+    # Per-process store, or the shared one is down: count in login_attempts
     return get_failed_attempts(identifier) >= max_attempts
 
 
@@ -358,12 +471,6 @@ def require_role(*roles):
 # ============ AUDIT LOGGING ============
 def log_audit(user_id, action, resource=None, details=None):
     try:
-        conn = get_db()
-        conn.execute(
-            "INSERT INTO audit_logs (user_id, action, resource, details, ip_address) VALUES (?, ?, ?, ?, ?)",
-            (user_id, action, resource, details, request.remote_addr)
-        )
-        conn.commit()
-        conn.close()
+        record('audit_logs', (user_id, action, resource, details, request.remote_addr, utc_timestamp()))
     except Exception:
         pass
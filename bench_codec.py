@@ -0,0 +1,92 @@
+"""
+Deep Freeze Snapshot Codec Benchmark for HTTP Playground
+Encodes and decodes the original_data of every seed row on a scratch
+database, three ways: the whole row as JSON (the old format), the whole row
+in the binary codec (what a DELETE stores) and a one-column diff in the
+binary codec (what a typical PUT stores). Blog content is padded to
+--content characters to show the zlib path. Reports bytes per snapshot and
+encode / decode time.
+
+    python bench_codec.py --rounds 2000 --content 3000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+
+def load_rows(content):
+    """(module, row) for every seed row, as dict(row) the way the handlers snapshot it."""
+    from database import init_db, get_db
+    from registry import TABLE_MODULES
+    init_db()
+    rows = []
+    for module in TABLE_MODULES:
+        conn = get_db(module.table)
+        for r in conn.execute(f"SELECT * FROM {module.table}").fetchall():
+            row = dict(r)
+            if module.table == 'blog_posts' and content:
+                row['content'] = ((row['content'] or '') + ' ') * (content // max(1, len(row['content'] or '') + 1) + 1)
+                row['content'] = row['content'][:content]
+            rows.append((module, row))
+        conn.close()
+    return rows
+
+
+def json_encode(module, data):
+    return json.dumps(data)
+
+
+def json_decode(module, raw):
+    return json.loads(raw)
+
+
+def timed(fn, items, rounds):
+    """Mean microseconds per call of fn over `items`, repeated `rounds` times."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(*item)
+    return (time.perf_counter() - started) * 1e6 / (rounds * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--content', type=int, default=3000, help='blog content length in characters (0 = seed text)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    from codec import encode_snapshot, decode_snapshot
+
+    rows = load_rows(args.content)
+    # A PUT of the first data column, holding its old value
+    diffs = [(m, {m.columns[0]: row[m.columns[0]]}) for m, row in rows]
+    cases = [
+        ('json, full row', rows, json_encode, json_decode),
+        ('binary, full row', rows, encode_snapshot, decode_snapshot),
+        ('binary, PUT diff', diffs, encode_snapshot, decode_snapshot),
+    ]
+
+    print(f"\n{'='*72}")
+    print(f"  HTTP Playground Deep Freeze Snapshot Codec Benchmark")
+    print(f"  Snapshots: {len(rows)} seed rows   Rounds: {args.rounds}   Blog content: {args.content or 'seed'} chars")
+    print(f"{'='*72}\n")
+    print(f"  {'format':<18} {'avg bytes':>10} {'blog bytes':>11} {'encode us':>10} {'decode us':>10}")
+    for label, items, encode, decode in cases:
+        blobs = [(m, encode(m, data)) for m, data in items]
+        sizes = [len(b) for _, b in blobs]
+        blog = [len(b) for m, b in blobs if m.table == 'blog_posts']
+        enc_us = timed(encode, items, args.rounds)
+        dec_us = timed(decode, blobs, args.rounds)
+        print(f"  {label:<18} {sum(sizes) / len(sizes):>10.0f} {sum(blog) / max(1, len(blog)):>11.0f} "
+              f"{enc_us:>10.2f} {dec_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Deep Freeze Revert Benchmark for HTTP Playground
+Seeds a backlog of expired user_modifications (updates, deletes and creates
+on books) and reverts it while writer threads keep committing single-row
+INSERTs, the way request handlers do. Reports revert throughput and the
+writers' commit latency, for the batched engine and with the whole backlog
+in one transaction as before (--batch 0). --format json stores the whole
+row as JSON the old way; binary stores the packed codec form, with updates
+holding only the changed column.
+
+    python bench_freeze.py --mods 20000 --writers 4 --batch 200 --format binary
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0
+
+
+def build_backlog(mods, fmt):
+    """`mods` expired modifications: half updates of frozen rows, a quarter each deletes and creates."""
+    from database import init_db, get_db
+    from registry import MODULES_BY_TABLE
+    from codec import encode_snapshot
+    books = MODULES_BY_TABLE['books']
+    if fmt == 'json':
+        update_data = delete_data = json.dumps
+    else:
+        update_data = lambda r: encode_snapshot(books, {'title': r['title']})
+        delete_data = lambda r: encode_snapshot(books, r)
+    init_db()
+    conn = get_db('books')
+    n_update, n_delete = mods // 2, mods // 4
+    n_create = mods - n_update - n_delete
+    conn.executemany(
+        "INSERT INTO books (title, author, genre, year, is_frozen) VALUES (?, ?, 'Fiction', 2000, 1)",
+        ((f'Frozen {i}', f'Author {i}') for i in range(n_update))
+    )
+    conn.executemany(
+        "INSERT INTO books (title, author, genre, year, is_frozen) VALUES (?, ?, 'Fiction', 2000, 0)",
+        ((f'User {i}', f'Author {i}') for i in range(n_delete + n_create))
+    )
+    frozen = [dict(r) for r in conn.execute("SELECT * FROM books WHERE title LIKE 'Frozen %'")]
+    user = [dict(r) for r in conn.execute("SELECT * FROM books WHERE title LIKE 'User %'")]
+    deleted, created = user[:n_delete], user[n_delete:]
+    conn.executemany("UPDATE books SET title = 'Edited' WHERE id = ?", [(r['id'],) for r in frozen])
+    conn.executemany("DELETE FROM books WHERE id = ?", [(r['id'],) for r in deleted])
+    expired = '2000-01-01 00:00:00'
+    conn.executemany(
+        "INSERT INTO user_modifications (table_name, record_id, action, original_data, user_key, expires_at) "
+        "VALUES ('books', ?, ?, ?, 'bench', ?)",
+        [(r['id'], 'update', update_data(r), expired) for r in frozen]
+        + [(r['id'], 'delete', delete_data(r), expired) for r in deleted]
+        + [(r['id'], 'create', None, expired) for r in created]
+    )
+    journal = conn.execute("SELECT SUM(LENGTH(original_data)) FROM user_modifications").fetchone()[0]
+    conn.commit()
+    conn.close()
+    return journal
+
+
+def run(mods, writers, batch):
+    from database import get_db, shard_for
+    from freeze import revert_expired
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def writer():
+        local = []
+        conn = get_db('books')
+        while not done.is_set():
+            started = time.perf_counter()
+            conn.execute("INSERT INTO books (title, author) VALUES ('w', 'w')")
+            conn.commit()
+            local.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.002)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    [t.start() for t in threads]
+    time.sleep(0.2)
+    started = time.perf_counter()
+    if batch:
+        reverted, complete = 0, False
+        while not complete:
+            n, complete = revert_expired(shard_for('books'), '2001-01-01 00:00:00', batch_size=batch)
+            reverted += n
+    else:
+        reverted, _ = revert_expired(shard_for('books'), '2001-01-01 00:00:00', batch_size=mods + 1, max_seconds=3600)
+    elapsed = time.perf_counter() - started
+    time.sleep(0.2)
+    done.set()
+    [t.join() for t in threads]
+    return reverted, elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mods', type=int, default=20000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=200, help='entries per revert transaction (0 = one transaction)')
+    parser.add_argument('--format', choices=('binary', 'json'), default='binary', help='original_data encoding')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+
+    print(f"\n{'='*72}")
+    print(f"  HTTP Playground Deep Freeze Revert Benchmark")
+    print(f"  Modifications: {args.mods}   Writers: {args.writers}   "
+          f"Batch: {args.batch or 'single transaction'}   Format: {args.format}")
+    print(f"{'='*72}\n")
+    journal = build_backlog(args.mods, args.format)
+    reverted, elapsed, latencies = run(args.mods, args.writers, args.batch)
+    from freeze import revert_stats
+    stats = revert_stats()
+    print(f"  original_data {journal:>9} bytes ({journal / args.mods:.0f} per entry)")
+    print(f"  reverted     {reverted:>10}      in {elapsed:.2f} s ({reverted / elapsed:.0f} /s)")
+    print(f"  batches      {stats['batches']:>10}      avg {stats['avg_batch_ms']:.2f} ms   max {stats['max_batch_ms']:.2f} ms")
+    print(f"  writer commit p50 {percentile(latencies, 50):7.2f} ms   p99 {percentile(latencies, 99):7.2f} ms   "
+          f"max {max(latencies or [0]):7.2f} ms   ({len(latencies)} commits)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Login Benchmark for HTTP Playground
+Drives POST /api/auth/login through the Flask test client on a scratch
+database and reports throughput and p50/p99 latency. Password hashing is
+turned down (--iterations) so the database work of the login pipeline is
+what gets measured; pass --iterations 100000 for production cost.
+
+    python bench_login.py --users 2000 --threads 8 --seconds 5 --fresh 0.2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0
+
+
+def build_users(app_module, users, fresh):
+    """Approved users; all but the `fresh` fraction already hold both API keys."""
+    from database import get_db
+    from auth import hash_password, generate_api_key
+    pw_hash = hash_password('benchpass')
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, status) VALUES (?, ?, ?, 'approved')",
+        ((f'bench{i}', f'bench{i}@example.com', pw_hash) for i in range(users))
+    )
+    ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE username LIKE 'bench%' ORDER BY id")]
+    keyed = ids[int(len(ids) * fresh):]
+    conn.executemany(
+        "INSERT INTO api_keys (user_id, key, key_type, max_requests) VALUES (?, ?, ?, ?)",
+        [(uid, generate_api_key(kind), kind, limit) for uid in keyed
+         for kind, limit in (('standard', 15), ('ai', 3))]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(app_module, users, threads, seconds, fail_ratio):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client():
+        c = app_module.app.test_client()
+        local, codes = [], {}
+        while time.time() < stop:
+            password = 'wrong' if random.random() < fail_ratio else 'benchpass'
+            body = {'username': f'bench{random.randrange(users)}', 'password': password}
+            started = time.perf_counter()
+            status = c.post('/api/auth/login', json=body).status_code
+            local.append((time.perf_counter() - started) * 1000)
+            codes[status] = codes.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for code, n in codes.items():
+                statuses[code] = statuses.get(code, 0) + n
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--iterations', type=int, default=1000, help='PBKDF2 iterations for the bench users')
+    parser.add_argument('--fresh', type=float, default=0.2, help='fraction of users with no API keys yet')
+    parser.add_argument('--fail', type=float, default=0.0, help='fraction of logins with a wrong password')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['HASH_ITERATIONS'] = str(args.iterations)
+    # Measure the login pipeline, not the limiter or lockout in front of it
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    os.environ.setdefault('STATE_BACKEND', 'memory')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import app as app_module
+
+    print(f"\n{'='*72}")
+    print(f"  HTTP Playground Login Benchmark")
+    print(f"  Users: {args.users}   Threads: {args.threads}   PBKDF2 iterations: {args.iterations}   "
+          f"Fresh: {args.fresh:.0%}   Failing: {args.fail:.0%}")
+    print(f"{'='*72}\n")
+    build_users(app_module, args.users, args.fresh)
+    latencies, statuses = run(app_module, args.users, args.threads, args.seconds, args.fail)
+    print(f"  logins       {len(latencies) / args.seconds:>10.0f} /s   "
+          f"p50 {percentile(latencies, 50):7.2f} ms   p99 {percentile(latencies, 99):7.2f} ms")
+    print(f"  statuses     {dict(sorted(statuses.items()))}")
+
+
+if __name__ == '__main__':
+    main()
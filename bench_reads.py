@@ -0,0 +1,130 @@
+"""
+Read-Path Benchmark for HTTP Playground
+Compares read connection profiles (see database.READ_PROFILES) on a scratch
+database, optionally with a writer thread committing in the background.
+
+    python bench_reads.py --rows 200000 --threads 8 --seconds 5 --writer
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0
+
+
+def build_db(rows):
+    from database import init_db, get_db
+    from indexes import ensure_indexes
+    from search import ensure_search_indexes
+    from counters import ensure_counters
+    from registry import TABLE_MODULES, MODULE_TABLES
+    init_db()
+    conn = get_db('books')
+    genres = ['Fiction', 'Science', 'History', 'Technology', 'Dystopian', 'Business', 'Philosophy']
+    conn.executemany(
+        "INSERT INTO books (title, author, genre, year) VALUES (?, ?, ?, ?)",
+        ((f'Book {i} volume {i % 97}', f'Author {i % 5000}', genres[i % len(genres)], 1900 + i % 120)
+         for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+    ensure_indexes(TABLE_MODULES)
+    ensure_search_indexes(TABLE_MODULES)
+    ensure_counters(MODULE_TABLES)
+
+
+# The queries behind GET /api/books, /api/books/<id>, ?genre=, ?search= and keyset pages
+def read_op(conn, max_id):
+    op = random.random()
+    if op < 0.35:
+        conn.execute("SELECT books.* FROM books ORDER BY books.id DESC LIMIT 20 OFFSET ?",
+                     (random.randint(0, 50) * 20,)).fetchall()
+    elif op < 0.65:
+        conn.execute("SELECT * FROM books WHERE id = ?", (random.randint(1, max_id),)).fetchone()
+    elif op < 0.85:
+        conn.execute("SELECT books.* FROM books WHERE genre = ? AND books.id < ? ORDER BY books.id DESC LIMIT 21",
+                     ('Science', random.randint(1, max_id))).fetchall()
+    else:
+        conn.execute("SELECT books.* FROM books WHERE id IN (SELECT rowid FROM books_fts WHERE books_fts MATCH ?) "
+                     "ORDER BY books.id DESC LIMIT 20", (f'"volume {random.randint(10, 96)}"',)).fetchall()
+
+
+def run_profile(name, pool, threads, seconds, max_id):
+    latencies = []
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def reader():
+        local = []
+        while time.time() < stop:
+            conn = pool.acquire()
+            started = time.perf_counter()
+            read_op(conn, max_id)
+            local.append((time.perf_counter() - started) * 1000)
+            pool.release(conn)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+    print(f"  {name:<12} {len(latencies) / seconds:>10.0f} ops/s   "
+          f"p50 {percentile(latencies, 50):6.3f} ms   p99 {percentile(latencies, 99):7.3f} ms")
+
+
+def writer_loop(stop_event, stats):
+    from database import get_db
+    while not stop_event.is_set():
+        conn = get_db('books')
+        conn.execute("INSERT INTO books (title, author) VALUES ('bench', 'writer')")
+        conn.commit()
+        conn.close()
+        stats['writes'] += 1
+        time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--writer', action='store_true', help='commit inserts in the background while reading')
+    args = parser.parse_args()
+
+    os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import database
+
+    print(f"\n{'='*72}")
+    print(f"  HTTP Playground Read-Path Benchmark")
+    print(f"  Rows: {args.rows}   Reader threads: {args.threads}   Background writer: {args.writer}")
+    print(f"{'='*72}\n")
+    build_db(args.rows)
+    max_id = args.rows
+
+    stop_event = threading.Event()
+    stats = {'writes': 0}
+    if args.writer:
+        threading.Thread(target=writer_loop, args=(stop_event, stats), daemon=True).start()
+
+    profiles = [('read-write', database.ConnectionPool(database.DB_PATH, size=args.threads))]
+    for name in database.READ_PROFILES:
+        profiles.append((name, database.ConnectionPool(
+            database.DB_PATH, readonly=True, pragmas=database.read_pragmas(name), size=args.threads)))
+    for name, pool in profiles:
+        run_profile(name, pool, args.threads, args.seconds, max_id)
+
+    stop_event.set()
+    if args.writer:
+        print(f"\n  Background writes committed: {stats['writes']}")
+
+
+if __name__ == '__main__':
+    main()
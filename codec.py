@@ -0,0 +1,226 @@
+"""
+HTTP Playground v3.0 — Deep Freeze Snapshot Codec
+Compact binary form of the original_data stored with each user_modifications
+entry. A PUT keeps only the columns it changed; a DELETE keeps the whole row.
+Either way only the module's data columns and is_frozen are stored — the
+revert path never reads anything else.
+
+    byte 0      format version (1)
+    bytes 1-2   schema tag: hash of the module's column list
+    varint      bitmap of the columns present, in column-list order
+    per column  type tag + value:
+                0 NULL   1 int (zigzag varint)   2 float (8 bytes)
+                3 text   4 zlib-compressed text  5 blob   6 other (JSON)
+
+Text longer than CODEC_ZLIB_MIN bytes (blog content, descriptions) is
+zlib-compressed when that makes it shorter. Rows written before this format
+are JSON text and still decode.
+
+Every column list a module has had is kept in the snapshot_schemas table
+(tag -> column names), so snapshots written before a column was added or
+removed decode after the change. An earlier list is read from the table the
+first time a snapshot needs it. A snapshot whose tag is not on record
+raises SnapshotUnreadable; it is never silently read as empty.
+"""
+import os
+import json
+import zlib
+import struct
+import hashlib
+from database import get_db, fingerprint, schema_state, mark_schema_state
+
+CODEC_ZLIB_MIN = int(os.getenv('CODEC_ZLIB_MIN', 256))
+CODEC_VERSION = 1
+
+T_NULL, T_INT, T_FLOAT, T_TEXT, T_ZTEXT, T_BLOB, T_JSON = range(7)
+_double = struct.Struct('<d')
+
+# table -> (columns, {column: bit}, schema tag)
+_schemas = {}
+# (table, schema tag) -> columns of an earlier column list, read from snapshot_schemas on first use
+_history = {}
+# (table or (table, tag), bitmap) -> column names present
+_shapes = {}
+
+
+class SnapshotUnreadable(ValueError):
+    """original_data written in an unknown format version or against a column list not on record."""
+
+
+def snapshot_schema(module):
+    """Columns a snapshot of `module` can carry, with their bit positions and the schema tag."""
+    schema = _schemas.get(module.table)
+    if schema is None:
+        cols = tuple(module.columns) + ('is_frozen',)
+        tag = hashlib.sha256(repr(cols).encode()).digest()[:2]
+        schema = _schemas[module.table] = (cols, {c: 1 << i for i, c in enumerate(cols)}, tag)
+    return schema
+
+
+def ensure_snapshot_schemas(modules):
+    """Record each module's current column list under its tag. Returns how many were recorded (0 on a warm start)."""
+    current = {m.table: snapshot_schema(m) for m in modules}
+    plan_fp = fingerprint(sorted((table, cols) for table, (cols, _, _) in current.items()))
+    if schema_state('snapshot_schemas')[1] == plan_fp:
+        return 0
+    conn = get_db()
+    conn.execute("""CREATE TABLE IF NOT EXISTS snapshot_schemas (
+        table_name TEXT NOT NULL,
+        tag BLOB NOT NULL,
+        columns TEXT NOT NULL,
+        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (table_name, tag)
+    )""")
+    conn.executemany("INSERT OR IGNORE INTO snapshot_schemas (table_name, tag, columns) VALUES (?, ?, ?)",
+                     [(table, tag, json.dumps(cols)) for table, (cols, _, tag) in current.items()])
+    mark_schema_state(conn, 'snapshot_schemas', fingerprint=plan_fp)
+    conn.commit()
+    conn.close()
+    return len(current)
+
+
+def _earlier_columns(table, tag):
+    """Column list recorded under `tag` for `table`, or None when it is not on record."""
+    cols = _history.get((table, tag))
+    if cols is None:
+        conn = get_db()
+        row = conn.execute("SELECT columns FROM snapshot_schemas WHERE table_name = ? AND tag = ?",
+                           (table, tag)).fetchone()
+        conn.close()
+        if row:
+            cols = _history[(table, tag)] = tuple(json.loads(row[0]))
+    return cols
+
+
+def _varint(n, out):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _put(value, out):
+    if value is None:
+        out.append(T_NULL)
+    elif type(value) is int:
+        out.append(T_INT)
+        _varint(value << 1 if value >= 0 else ((-value) << 1) - 1, out)
+    elif type(value) is float:
+        out.append(T_FLOAT)
+        out += _double.pack(value)
+    elif type(value) is str:
+        raw = value.encode()
+        if len(raw) >= CODEC_ZLIB_MIN:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                out.append(T_ZTEXT)
+                _varint(len(packed), out)
+                out += packed
+                return
+        out.append(T_TEXT)
+        _varint(len(raw), out)
+        out += raw
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(T_BLOB)
+        _varint(len(value), out)
+        out += value
+    else:
+        raw = json.dumps(value).encode()
+        out.append(T_JSON)
+        _varint(len(raw), out)
+        out += raw
+
+
+def encode_snapshot(module, data):
+    """Pack the schema columns present in `data`; None when there are none."""
+    cols, bits, tag = snapshot_schema(module)
+    present = [c for c in cols if c in data]
+    if not present:
+        return None
+    bitmap = 0
+    for c in present:
+        bitmap |= bits[c]
+    out = bytearray((CODEC_VERSION,))
+    out += tag
+    _varint(bitmap, out)
+    for c in present:
+        _put(data[c], out)
+    return bytes(out)
+
+
+def _present(schema, cols, bitmap):
+    """Column names set in `bitmap`, cached per shape: a module sees only a handful of them."""
+    key = (schema, bitmap)
+    names = _shapes.get(key)
+    if names is None:
+        names = _shapes[key] = tuple(c for i, c in enumerate(cols) if bitmap >> i & 1)
+    return names
+
+
+def decode_snapshot(module, raw):
+    """
+    {column: value} from stored original_data (binary or legacy JSON); {} when empty.
+    Columns the module has dropped since may be present. Raises SnapshotUnreadable.
+    """
+    if not raw:
+        return {}
+    if isinstance(raw, str):
+        return json.loads(raw)
+    if raw[0] != CODEC_VERSION:
+        raise SnapshotUnreadable(f"format version {raw[0]}")
+    cols, _, tag = snapshot_schema(module)
+    schema = module.table
+    if raw[1:3] != tag:
+        # Written against an earlier column list: its bit positions are the ones to read
+        schema = (module.table, bytes(raw[1:3]))
+        cols = _earlier_columns(*schema)
+        if cols is None:
+            raise SnapshotUnreadable(f"schema tag {bytes(raw[1:3]).hex()} of {module.table} is not on record")
+    bitmap, pos = _read_varint(raw, 3)
+    data = {}
+    for name in _present(schema, cols, bitmap):
+        t = raw[pos]
+        if t == T_NULL:
+            data[name] = None
+            pos += 1
+            continue
+        if t == T_FLOAT:
+            data[name] = _double.unpack_from(raw, pos + 1)[0]
+            pos += 9
+            continue
+        # Every other value starts with a varint; most fit in one byte
+        n = raw[pos + 1]
+        if n < 0x80:
+            pos += 2
+        else:
+            n, pos = _read_varint(raw, pos + 1)
+        if t == T_INT:
+            data[name] = (n >> 1) ^ -(n & 1)
+            continue
+        chunk = raw[pos:pos + n]
+        pos += n
+        if t == T_TEXT:
+            data[name] = chunk.decode()
+        elif t == T_ZTEXT:
+            data[name] = zlib.decompress(chunk).decode()
+        elif t == T_BLOB:
+            data[name] = chunk
+        else:
+            data[name] = json.loads(chunk)
+    return data
+
+
+def changed_columns(existing, changes):
+    """The original values of the columns `changes` (column -> new value) actually alters."""
+    return {c: existing[c] for c, v in changes.items() if existing[c] != v}
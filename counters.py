@@ -0,0 +1,69 @@
+"""
+HTTP Playground v3.0 — Row Counters
+Per-table row counts kept in row_counts by AFTER INSERT / AFTER DELETE triggers,
+so creates, deletes and Deep Freeze reverts update them in the same transaction
+and list / health / stats endpoints never need SELECT COUNT(*).
+"""
+from database import get_db, fingerprint, schema_state, mark_schema_state, SHARDS, shards_with
+
+
+def _trigger_ddl(table):
+    return [
+        f"""CREATE TRIGGER {table}_count_ai AFTER INSERT ON {table} BEGIN
+            UPDATE row_counts SET row_count = row_count + 1 WHERE table_name = '{table}';
+        END""",
+        f"""CREATE TRIGGER {table}_count_ad AFTER DELETE ON {table} BEGIN
+            UPDATE row_counts SET row_count = row_count - 1 WHERE table_name = '{table}';
+        END""",
+    ]
+
+
+def ensure_counters(tables):
+    """Install counting triggers and (re)seed the count for any table that lacks them."""
+    plan_fp = fingerprint((sorted(tables), SHARDS))
+    if schema_state('counters')[1] == plan_fp:
+        return []
+    installed = []
+    for table in tables:
+        # Triggers can only touch tables in their own file: each shard counts into its own row_counts
+        conn = get_db(table)
+        triggers = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?)",
+            (f'{table}_count_ai', f'{table}_count_ad')
+        ).fetchall()}
+        seeded = conn.execute("SELECT 1 FROM row_counts WHERE table_name = ?", (table,)).fetchone()
+        if len(triggers) < 2 or not seeded:
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_count_ai")
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_count_ad")
+            for stmt in _trigger_ddl(table):
+                conn.execute(stmt)
+            # Same transaction as the trigger install, so no write can slip in between
+            conn.execute(
+                f"INSERT OR REPLACE INTO row_counts (table_name, row_count) VALUES (?, (SELECT COUNT(*) FROM {table}))",
+                (table,)
+            )
+            installed.append(table)
+        conn.commit()
+        conn.close()
+    conn = get_db()
+    mark_schema_state(conn, 'counters', fingerprint=plan_fp)
+    conn.commit()
+    conn.close()
+    return installed
+
+
+def get_count(conn, table):
+    row = conn.execute("SELECT row_count FROM row_counts WHERE table_name = ?", (table,)).fetchone()
+    if row is None:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return row[0]
+
+
+def get_counts():
+    """{table: row_count} for every counted table, one query per shard."""
+    counts = {}
+    for shard in shards_with('row_counts'):
+        conn = get_db(shard=shard)
+        counts.update((r[0], r[1]) for r in conn.execute("SELECT table_name, row_count FROM row_counts").fetchall())
+        conn.close()
+    return counts
@@ -4,22 +4,294 @@ HTTP Playground v3.0 — Database Layer
 """
 import sqlite3
 import os
+import hashlib
+import threading
+import time
+from urllib.parse import quote
+from flask import g, has_app_context, has_request_context, request
 
 DB_PATH = os.getenv('DB_PATH', 'platform.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 30))  # idle seconds before a health check
+# off: everything in DB_PATH. module: one file per module table, plus a telemetry file
+DB_SHARDING = os.getenv('DB_SHARDING', 'off')
+SHARDED = DB_SHARDING == 'module'
+# GET/HEAD requests lease from a separate read-only pool tuned by DB_READ_PROFILE
+DB_READ_POOL = os.getenv('DB_READ_POOL', 'true').lower() in ('1', 'true', 'yes', 'on')
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', DB_POOL_SIZE))
+DB_READ_PROFILE = os.getenv('DB_READ_PROFILE', 'balanced')
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
+# Pragmas applied to read-only connections. mmap serves hot pages straight from
+# the OS page cache; cache_size is in KiB when negative.
+READ_PROFILES = {
+    'baseline': {},
+    'balanced': {'mmap_size': 64 * 1024 * 1024, 'cache_size': -16384, 'temp_store': 'MEMORY'},
+    'memory': {'mmap_size': 256 * 1024 * 1024, 'cache_size': -65536, 'temp_store': 'MEMORY'},
+}
+
+
+def read_pragmas(profile=DB_READ_PROFILE):
+    """Pragmas for a read profile, with DB_MMAP_SIZE / DB_CACHE_SIZE / DB_TEMP_STORE overrides."""
+    pragmas = dict(READ_PROFILES.get(profile, READ_PROFILES['balanced']))
+    for name in ('mmap_size', 'cache_size', 'temp_store'):
+        value = os.getenv(f'DB_{name.upper()}')
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+# ============ CONNECTION POOL ============
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool instead of closing it."""
+
+    def close(self):
+        pool = getattr(self, 'pool', None)
+        if pool is None:
+            return super().close()
+        if getattr(self, 'request_depth', 0) > 1:
+            # Nested get_db() inside the same request — the outer caller still owns it
+            self.request_depth -= 1
+            return
+        leases = g.get('_db_conns') if has_app_context() else None
+        if leases and leases.get(pool.key) is self:
+            del leases[pool.key]
+        pool.release(self)
+
+    def discard(self):
+        self.pool = None
+        try:
+            sqlite3.Connection.close(self)
+        except sqlite3.Error:
+            pass
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of SQLite connections, safe under threads and gevent.
+
+    Connections are opened with check_same_thread=False so they can move between
+    threads/greenlets, and the WAL / foreign_keys pragmas run once per connection
+    instead of once per get_db() call. A pool inherited across fork() is dropped.
+    A readonly pool opens mode=ro + query_only connections with `pragmas` applied.
+    """
+
+    def __init__(self, path, shard='main', readonly=False, pragmas=None, size=DB_POOL_SIZE,
+                 timeout=DB_POOL_TIMEOUT, ping_after=DB_POOL_PING_AFTER):
+        self.path = path
+        self.shard = shard
+        self.readonly = readonly
+        self.key = (shard, readonly)
+        self.pragmas = pragmas or {}
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self.stats = {'created': 0, 'leased': 0, 'returned': 0, 'discarded': 0,
+                      'waits': 0, 'timeouts': 0, 'health_check_failures': 0}
+
+    def _connect(self):
+        if self.readonly:
+            uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=PooledConnection)
+            conn.execute("PRAGMA query_only=1")
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=PooledConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        conn.pool = self
+        conn.request_depth = 0
+        conn.idle_since = time.monotonic()
+        return conn
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.idle_since < self.ping_after:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            self.stats['health_check_failures'] += 1
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset()
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._healthy(conn):
+                        self.stats['leased'] += 1
+                        return conn
+                    self._open -= 1
+                    self.stats['discarded'] += 1
+                    conn.discard()
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise sqlite3.OperationalError(f'connection pool exhausted ({self.size} in use)')
+                self.stats['waits'] += 1
+                self._cond.wait(remaining)
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats['created'] += 1
+            self.stats['leased'] += 1
+        return conn
+
+    def release(self, conn):
+        conn.request_depth = 0
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if self._pid != os.getpid() or conn.pool is not self:
+                conn.discard()
+                return
+            self.stats['returned'] += 1
+            if healthy:
+                conn.idle_since = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                self.stats['discarded'] += 1
+                conn.discard()
+            self._cond.notify()
+
+    def metrics(self):
+        with self._cond:
+            idle = len(self._idle) if self._pid == os.getpid() else 0
+            in_use = self._open - idle if self._pid == os.getpid() else 0
+            return dict(self.stats, size=self.size, open=idle + in_use, idle=idle, in_use=in_use)
+
+
+# ============ SHARD ROUTING ============
+# Platform tables stay in DB_PATH; log tables share one telemetry file; with
+# DB_SHARDING=module every other table (the 20 modules) gets its own file, so
+# writes to different modules no longer queue behind one SQLite write lock.
+MAIN_TABLES = ('users', 'api_keys', 'user_modifications', 'row_counts')
+TELEMETRY_TABLES = ('audit_logs', 'rate_limits', 'login_attempts')
+# Every module shard carries its own Deep Freeze tracking and row counters, so a
+# module write and its bookkeeping commit together in one file
+SHARD_LOCAL_TABLES = ('user_modifications', 'row_counts')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def shard_for(table):
+    """Name of the shard that owns `table` ('main' when unsharded or for platform tables)."""
+    if not SHARDED or table is None or table in MAIN_TABLES:
+        return 'main'
+    if table in TELEMETRY_TABLES:
+        return 'telemetry'
+    return table
+
+def shard_path(shard):
+    if shard == 'main':
+        return DB_PATH
+    root, ext = os.path.splitext(DB_PATH)
+    return f"{root}.{shard}{ext or '.db'}"
+
+def shard_tables(shard):
+    """Base tables created in a shard's file."""
+    if not SHARDED:
+        return tuple(BASE_TABLES)
+    if shard == 'main':
+        return MAIN_TABLES
+    if shard == 'telemetry':
+        return TELEMETRY_TABLES
+    return (shard,) + SHARD_LOCAL_TABLES
+
+def shards_with(table):
+    """Every shard holding a copy of `table` (user_modifications and row_counts live in each module shard)."""
+    return [s for s in SHARDS if table in shard_tables(s)]
+
+def _pool_for(shard, readonly=False):
+    pool = _pools.get((shard, readonly))
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get((shard, readonly))
+            if pool is None:
+                if readonly:
+                    pool = ConnectionPool(shard_path(shard), shard, readonly=True,
+                                          pragmas=read_pragmas(), size=DB_READ_POOL_SIZE)
+                else:
+                    pool = ConnectionPool(shard_path(shard), shard)
+                _pools[(shard, readonly)] = pool
+    return pool
+
+def _read_only_request():
+    return DB_READ_POOL and has_request_context() and request.method in ('GET', 'HEAD')
+
+
+def get_db(table=None, shard=None, write=None):
+    """Lease a pooled connection to the shard owning `table` (or the named shard).
+    Calling close() on it returns it to the pool.
+
+    GET/HEAD requests get a read-only connection unless write=True; everything
+    else (other methods, background threads) gets a read-write one.
+
+    Inside an app/request context nested get_db() calls for the same shard share
+    one lease, and anything still leased when the context tears down is returned
+    automatically.
+    """
+    shard = shard or shard_for(table)
+    readonly = _read_only_request() if write is None else not write
+    pool = _pool_for(shard, readonly)
+    if not has_app_context():
+        return pool.acquire()
+    leases = g.get('_db_conns')
+    if leases is None:
+        leases = g._db_conns = {}
+    conn = leases.get(pool.key)
+    if conn is not None and conn.request_depth > 0:
+        conn.request_depth += 1
+        return conn
+    conn = pool.acquire()
+    conn.request_depth = 1
+    leases[pool.key] = conn
     return conn
 
-def init_db():
-    conn = get_db()
-    c = conn.cursor()
+def release_request_db(exc=None):
+    """teardown_appcontext hook: return connections the handler never closed."""
+    for key, conn in (g.pop('_db_conns', None) or {}).items():
+        if conn.request_depth > 0:
+            _pool_for(*key).release(conn)
 
+def pool_stats():
+    """{pool: metrics} for every pool opened so far ('books', 'books:ro', ...)."""
+    return {f"{shard}{':ro' if readonly else ''}": pool.metrics()
+            for (shard, readonly), pool in sorted(_pools.items())}
+
+
+# ============ BASE SCHEMA ============
+# table -> DDL, in creation order. With DB_SHARDING each table is created only
+# in the shard file that owns it (see shard_tables()).
+BASE_TABLES = {
     # ---------- USERS ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS users (
+    'users': """CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT UNIQUE NOT NULL,
         email TEXT UNIQUE NOT NULL,
@@ -28,10 +300,10 @@ def init_db():
         status TEXT DEFAULT 'pending',
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # ---------- API KEYS (dual: standard + ai) ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS api_keys (
+    'api_keys': """CREATE TABLE IF NOT EXISTS api_keys (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER NOT NULL,
         key TEXT UNIQUE NOT NULL,
@@ -43,16 +315,10 @@ def init_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         last_used TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users(id)
-    )""")
-
-    # Migration: add key_type if missing
-    try:
-        c.execute("SELECT key_type FROM api_keys LIMIT 1")
-    except sqlite3.OperationalError:
-        c.execute("ALTER TABLE api_keys ADD COLUMN key_type TEXT NOT NULL DEFAULT 'standard'")
+    )""",
 
     # ---------- AUDIT LOGS ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS audit_logs (
+    'audit_logs': """CREATE TABLE IF NOT EXISTS audit_logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER,
         action TEXT NOT NULL,
@@ -60,28 +326,28 @@ def init_db():
         details TEXT,
         ip_address TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # ---------- RATE LIMITS ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS rate_limits (
+    'rate_limits': """CREATE TABLE IF NOT EXISTS rate_limits (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         identifier TEXT NOT NULL,
         endpoint TEXT NOT NULL,
         count INTEGER DEFAULT 0,
         window_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # ---------- LOGIN ATTEMPTS ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS login_attempts (
+    'login_attempts': """CREATE TABLE IF NOT EXISTS login_attempts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         identifier TEXT NOT NULL,
         success INTEGER DEFAULT 0,
         ip_address TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # ---------- USER MODIFICATIONS (Deep Freeze tracking) ----------
-    c.execute("""CREATE TABLE IF NOT EXISTS user_modifications (
+    'user_modifications': """CREATE TABLE IF NOT EXISTS user_modifications (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         table_name TEXT NOT NULL,
         record_id INTEGER NOT NULL,
@@ -91,515 +357,682 @@ def init_db():
         user_id INTEGER,
         expires_at TIMESTAMP NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
-    # Migration: add user_id to user_modifications
-    try:
-        c.execute("SELECT user_id FROM user_modifications LIMIT 1")
-    except sqlite3.OperationalError:
-        c.execute("ALTER TABLE user_modifications ADD COLUMN user_id INTEGER")
+    # ---------- ROW COUNTS (maintained by triggers, see counters.py) ----------
+    'row_counts': """CREATE TABLE IF NOT EXISTS row_counts (
+        table_name TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL DEFAULT 0
+    )""",
 
     # ================================================================
     # MODULE TABLES (20 modules)
     # ================================================================
 
     # 1. Books
-    c.execute("""CREATE TABLE IF NOT EXISTS books (
+    'books': """CREATE TABLE IF NOT EXISTS books (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, author TEXT NOT NULL, isbn TEXT,
         genre TEXT, year INTEGER, available INTEGER DEFAULT 1,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 2. Menu Items
-    c.execute("""CREATE TABLE IF NOT EXISTS menu_items (
+    'menu_items': """CREATE TABLE IF NOT EXISTS menu_items (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, description TEXT, price REAL NOT NULL,
         category TEXT, is_available INTEGER DEFAULT 1,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 3. Tasks
-    c.execute("""CREATE TABLE IF NOT EXISTS tasks (
+    'tasks': """CREATE TABLE IF NOT EXISTS tasks (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, description TEXT,
         status TEXT DEFAULT 'pending', priority TEXT DEFAULT 'medium',
         due_date TEXT, assigned_to TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 4. Students
-    c.execute("""CREATE TABLE IF NOT EXISTS students (
+    'students': """CREATE TABLE IF NOT EXISTS students (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, email TEXT, student_id TEXT,
         major TEXT, gpa REAL, enrollment_year INTEGER,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 5. Notes
-    c.execute("""CREATE TABLE IF NOT EXISTS notes (
+    'notes': """CREATE TABLE IF NOT EXISTS notes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, content TEXT,
         category TEXT DEFAULT 'General', is_pinned INTEGER DEFAULT 0,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 6. Files
-    c.execute("""CREATE TABLE IF NOT EXISTS files (
+    'files': """CREATE TABLE IF NOT EXISTS files (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         original_name TEXT NOT NULL, stored_name TEXT NOT NULL,
         file_type TEXT, file_size INTEGER,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 7. Blog Posts
-    c.execute("""CREATE TABLE IF NOT EXISTS blog_posts (
+    'blog_posts': """CREATE TABLE IF NOT EXISTS blog_posts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, content TEXT NOT NULL,
         author TEXT, tags TEXT, is_published INTEGER DEFAULT 1,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 8. Inventory
-    c.execute("""CREATE TABLE IF NOT EXISTS inventory (
+    'inventory': """CREATE TABLE IF NOT EXISTS inventory (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, sku TEXT, quantity INTEGER DEFAULT 0,
         price REAL, category TEXT, warehouse TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 9. Products (e-commerce)
-    c.execute("""CREATE TABLE IF NOT EXISTS products (
+    'products': """CREATE TABLE IF NOT EXISTS products (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, description TEXT, price REAL NOT NULL,
         category TEXT, brand TEXT, rating REAL DEFAULT 0,
         stock INTEGER DEFAULT 0, image_url TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 10. Movies
-    c.execute("""CREATE TABLE IF NOT EXISTS movies (
+    'movies': """CREATE TABLE IF NOT EXISTS movies (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, director TEXT, genre TEXT,
         year INTEGER, rating REAL, runtime INTEGER,
         language TEXT DEFAULT 'English',
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 11. Recipes
-    c.execute("""CREATE TABLE IF NOT EXISTS recipes (
+    'recipes': """CREATE TABLE IF NOT EXISTS recipes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, description TEXT, cuisine TEXT,
         difficulty TEXT DEFAULT 'easy', prep_time INTEGER,
         cook_time INTEGER, servings INTEGER, ingredients TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 12. Events
-    c.execute("""CREATE TABLE IF NOT EXISTS events (
+    'events': """CREATE TABLE IF NOT EXISTS events (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, description TEXT, location TEXT,
         event_date TEXT, event_time TEXT, category TEXT,
         capacity INTEGER, organizer TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 13. Contacts
-    c.execute("""CREATE TABLE IF NOT EXISTS contacts (
+    'contacts': """CREATE TABLE IF NOT EXISTS contacts (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         first_name TEXT NOT NULL, last_name TEXT,
         email TEXT, phone TEXT, company TEXT,
         job_title TEXT, city TEXT, country TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 14. Music / Songs
-    c.execute("""CREATE TABLE IF NOT EXISTS songs (
+    'songs': """CREATE TABLE IF NOT EXISTS songs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, artist TEXT NOT NULL,
         album TEXT, genre TEXT, duration INTEGER,
         year INTEGER, is_explicit INTEGER DEFAULT 0,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 15. Quotes
-    c.execute("""CREATE TABLE IF NOT EXISTS quotes (
+    'quotes': """CREATE TABLE IF NOT EXISTS quotes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         text TEXT NOT NULL, author TEXT NOT NULL,
         category TEXT, language TEXT DEFAULT 'English',
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 16. Countries
-    c.execute("""CREATE TABLE IF NOT EXISTS countries (
+    'countries': """CREATE TABLE IF NOT EXISTS countries (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, capital TEXT, continent TEXT,
         population INTEGER, area_km2 REAL, currency TEXT,
         language TEXT, calling_code TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 17. Jokes
-    c.execute("""CREATE TABLE IF NOT EXISTS jokes (
+    'jokes': """CREATE TABLE IF NOT EXISTS jokes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         setup TEXT NOT NULL, punchline TEXT NOT NULL,
         category TEXT DEFAULT 'general', rating REAL DEFAULT 0,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 18. Vehicles
-    c.execute("""CREATE TABLE IF NOT EXISTS vehicles (
+    'vehicles': """CREATE TABLE IF NOT EXISTS vehicles (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         make TEXT NOT NULL, model TEXT NOT NULL, year INTEGER,
         type TEXT, color TEXT, price REAL,
         fuel_type TEXT, mileage INTEGER,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 19. Courses (online learning)
-    c.execute("""CREATE TABLE IF NOT EXISTS courses (
+    'courses': """CREATE TABLE IF NOT EXISTS courses (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL, instructor TEXT, category TEXT,
         level TEXT DEFAULT 'beginner', duration_hours REAL,
         price REAL, rating REAL DEFAULT 0, enrolled INTEGER DEFAULT 0,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )""")
+    )""",
 
     # 20. Pets (pet adoption)
-    c.execute("""CREATE TABLE IF NOT EXISTS pets (
+    'pets': """CREATE TABLE IF NOT EXISTS pets (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL, species TEXT NOT NULL, breed TEXT,
         age INTEGER, color TEXT, weight REAL,
         adopted INTEGER DEFAULT 0, shelter TEXT,
         is_frozen INTEGER DEFAULT 0, created_by_user INTEGER DEFAULT 0, created_by_key TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+}
+
+
+def _create_base_schema(conn, tables):
+    c = conn.cursor()
+    for table, ddl in BASE_TABLES.items():
+        if table in tables:
+            c.execute(ddl)
+
+    if 'api_keys' in tables:
+        # Migration: add key_type if missing
+        try:
+            c.execute("SELECT key_type FROM api_keys LIMIT 1")
+        except sqlite3.OperationalError:
+            c.execute("ALTER TABLE api_keys ADD COLUMN key_type TEXT NOT NULL DEFAULT 'standard'")
+
+    if 'user_modifications' in tables:
+        # Migration: add user_id to user_modifications
+        try:
+            c.execute("SELECT user_id FROM user_modifications LIMIT 1")
+        except sqlite3.OperationalError:
+            c.execute("ALTER TABLE user_modifications ADD COLUMN user_id INTEGER")
+
+
+def _normalize_expires_at(conn, tables):
+    if 'user_modifications' in tables:
+        # Older rows were written with isoformat() ('T', microseconds), which sorts wrong against CURRENT_TIMESTAMP text
+        conn.execute("UPDATE user_modifications SET expires_at = replace(substr(expires_at, 1, 19), 'T', ' ') "
+                     "WHERE expires_at LIKE '%T%'")
+
+
+def _add_requests_reserved(conn, tables):
+    if 'api_keys' in tables:
+        # request_count is now requests served; blocks held by workers' quota leases are counted apart
+        conn.execute("ALTER TABLE api_keys ADD COLUMN requests_reserved INTEGER NOT NULL DEFAULT 0")
+
+
+def _add_quota_leases(conn, tables):
+    if 'api_keys' in tables:
+        # One row per (key, worker): reservations of a worker that stops heartbeating expire and go back.
+        # What requests_reserved still holds belongs to no worker and is dropped with it.
+        conn.execute("""CREATE TABLE IF NOT EXISTS quota_leases (
+            key_id INTEGER NOT NULL,
+            holder TEXT NOT NULL,
+            reserved INTEGER NOT NULL DEFAULT 0,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (key_id, holder)
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_quota_leases_expires ON quota_leases(expires_at)")
+        conn.execute("ALTER TABLE api_keys DROP COLUMN requests_reserved")
+
+
+MODULE_SHARD_TABLES = [t for t in BASE_TABLES if t not in MAIN_TABLES + TELEMETRY_TABLES]
+SHARDS = ['main', 'telemetry'] + MODULE_SHARD_TABLES if SHARDED else ['main']
+
+
+# ============ SCHEMA VERSIONING ============
+# Ordered and append-only: each entry runs once, in its own write transaction.
+# Add new DDL as a new migration rather than editing an applied one.
+MIGRATIONS = [
+    # migrate(conn, tables): `tables` are the base tables living in the shard being migrated
+    (1, 'base schema: platform tables + 20 module tables', _create_base_schema),
+    (2, 'user_modifications.expires_at as YYYY-MM-DD HH:MM:SS', _normalize_expires_at),
+    (3, 'api_keys.requests_reserved: quota leases counted apart from requests served', _add_requests_reserved),
+    (4, 'quota_leases: per-worker reservations that expire without a heartbeat', _add_quota_leases),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# component -> (version, fingerprint) as recorded in the main schema_version, read once by init_db().
+# Each shard file also keeps its own 'schema' / 'seed' rows, so its data and its state travel together.
+_schema_state = {}
+
+
+def fingerprint(obj):
+    return hashlib.sha256(repr(obj).encode()).hexdigest()[:16]
+
+def _load_schema_state(conn):
+    try:
+        rows = conn.execute("SELECT component, version, fingerprint FROM schema_version").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {r['component']: (r['version'], r['fingerprint']) for r in rows}
+
+def schema_state(component):
+    """(version, fingerprint) last recorded for a startup component ('schema', 'seed', 'indexes', ...)"""
+    return _schema_state.get(component, (0, None))
+
+def mark_schema_state(conn, component, version=0, fingerprint=None):
+    """Record a component as current; commits with the caller's transaction."""
+    conn.execute(
+        "INSERT OR REPLACE INTO schema_version (component, version, fingerprint, applied_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+        (component, version, fingerprint)
+    )
+    if conn.pool is None or conn.pool.shard == 'main':
+        _schema_state[component] = (version, fingerprint)
+
+
+def init_db():
+    """
+    Apply pending migrations and seed baseline data in every shard.
+    A warm start (schema at SCHEMA_VERSION, seed fingerprint unchanged) costs one query per shard.
+    Returns True when anything had to be applied.
+    """
+    _schema_state.clear()
+    applied = False
+    for shard in SHARDS:
+        applied = _init_shard(shard) or applied
+    return applied
+
+def _init_shard(shard):
+    tables = shard_tables(shard)
+    seed_fp = seed_fingerprint(tables)
+    conn = get_db(shard=shard)
+    state = _load_schema_state(conn)
+    if shard == 'main':
+        _schema_state.update(state)
+    if state.get('schema', (0,))[0] >= SCHEMA_VERSION and state.get('seed', (0, None))[1] == seed_fp:
+        conn.close()
+        return False
+
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        component TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        fingerprint TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )""")
+    label = '' if shard == 'main' else f' [{shard}]'
+    for version, description, migrate in MIGRATIONS:
+        # Re-read under the write lock: another worker may have migrated meanwhile
+        conn.execute("BEGIN IMMEDIATE")
+        if _load_schema_state(conn).get('schema', (0,))[0] >= version:
+            conn.rollback()
+            continue
+        migrate(conn, tables)
+        mark_schema_state(conn, 'schema', version, description)
+        conn.commit()
+        print(f"[DB] Migrated schema{label} to v{version}: {description}")
+
+    if shard != 'main' and 'seed' not in state:
+        # A shard file never seeded: rows an unsharded install kept in DB_PATH move in first
+        _adopt_unsharded_rows(conn, shard, tables)
 
+    conn.execute("BEGIN IMMEDIATE")
+    if _load_schema_state(conn).get('seed', (0, None))[1] != seed_fp:
+        _seed_data(conn, tables)
+        mark_schema_state(conn, 'seed', fingerprint=seed_fp)
     conn.commit()
-    _seed_data(conn)
     conn.close()
+    return True
 
 
-def _seed_data(conn):
-    c = conn.cursor()
+def _adopt_unsharded_rows(conn, shard, tables):
+    """
+    Copy `shard`'s tables, and their pending user_modifications, out of DB_PATH into the new shard file
+    (ATTACH + INSERT ... SELECT, one transaction), then drop those user_modifications from DB_PATH so
+    they are not reverted twice. The old tables stay in DB_PATH, untouched. Raises RuntimeError when
+    the rows cannot be moved: starting on freshly seeded shards would hide the existing data.
+    """
+    if not os.path.exists(DB_PATH):
+        return
+    own = [t for t in tables if t not in SHARD_LOCAL_TABLES]
+    label = f"[DB] DB_SHARDING=module: moving {', '.join(own)} from {DB_PATH} into {shard_path(shard)}"
+    conn.execute("ATTACH DATABASE ? AS unsharded", (DB_PATH,))
+    try:
+        present = {r[0] for r in conn.execute("SELECT name FROM unsharded.sqlite_master WHERE type = 'table'")}
+        conn.execute("BEGIN IMMEDIATE")
+        # Only into tables still empty here: another worker, or a retry after a failed start, never copies twice
+        copy = [t for t in own + [t for t in ('user_modifications',) if t in tables] if t in present
+                and not conn.execute(f"SELECT 1 FROM main.{t} LIMIT 1").fetchone()]
+        if not any(conn.execute(f"SELECT 1 FROM unsharded.{t} LIMIT 1").fetchone() for t in copy if t in own):
+            conn.rollback()
+            return
+        moved = {}
+        for table in copy:
+            cols = [r[1] for r in conn.execute(f"PRAGMA main.table_info({table})")]
+            old_cols = {r[1] for r in conn.execute(f"PRAGMA unsharded.table_info({table})")}
+            # Columns the old table lacks take their defaults
+            cols = ', '.join(c for c in cols if c in old_cols)
+            where, params = ((f"WHERE table_name IN ({', '.join('?' * len(own))})", own)
+                             if table == 'user_modifications' else ('', ()))
+            moved[table] = conn.execute(
+                f"INSERT INTO main.{table} ({cols}) SELECT {cols} FROM unsharded.{table} {where}", params).rowcount
+        conn.commit()
+        if 'user_modifications' in moved:
+            conn.execute(f"DELETE FROM unsharded.user_modifications WHERE table_name IN ({', '.join('?' * len(own))})",
+                         own)
+            conn.commit()
+        print(f"{label}: " + ', '.join(f"{n} {t}" for t, n in moved.items()))
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.rollback()
+        raise RuntimeError(f"{label} failed ({e}). Fix the cause and restart (the move is retried), "
+                           f"or run with DB_SHARDING=off") from e
+    finally:
+        conn.execute("DETACH DATABASE unsharded")
+
 
+# ================================================================
+# SEED DATA — baseline rows, inserted with is_frozen = 1
+# ================================================================
+SEED_DATA = {
     # ---- Books (15) ----
-    if c.execute("SELECT COUNT(*) FROM books").fetchone()[0] == 0:
-        books = [
-            ('The Great Gatsby','F. Scott Fitzgerald','978-0743273565','Fiction',1925,1),
-            ('1984','George Orwell','978-0451524935','Dystopian',1949,1),
-            ('To Kill a Mockingbird','Harper Lee','978-0446310789','Fiction',1960,1),
-            ('Clean Code','Robert C. Martin','978-0132350884','Technology',2008,1),
-            ('The Pragmatic Programmer','David Thomas','978-0135957059','Technology',2019,1),
-            ('Python Crash Course','Eric Matthes','978-1593279288','Technology',2019,1),
-            ('A Brief History of Time','Stephen Hawking','978-0553380163','Science',1988,1),
-            ('Sapiens','Yuval Noah Harari','978-0062316097','History',2014,1),
-            ('Dune','Frank Herbert','978-0441172719','Science Fiction',1965,1),
-            ('The Art of War','Sun Tzu','978-1599869773','Philosophy',500,1),
-            ('Atomic Habits','James Clear','978-0735211292','Self-Help',2018,1),
-            ('Deep Work','Cal Newport','978-1455586691','Self-Help',2016,1),
-            ('The Lean Startup','Eric Ries','978-0307887894','Business',2011,1),
-            ('Brave New World','Aldous Huxley','978-0060850524','Dystopian',1932,1),
-            ('Think and Grow Rich','Napoleon Hill','978-1585424337','Business',1937,1),
-        ]
-        c.executemany("INSERT INTO books (title,author,isbn,genre,year,available,is_frozen) VALUES (?,?,?,?,?,?,1)", books)
+    'books': (('title', 'author', 'isbn', 'genre', 'year', 'available'), [
+        ('The Great Gatsby','F. Scott Fitzgerald','978-0743273565','Fiction',1925,1),
+        ('1984','George Orwell','978-0451524935','Dystopian',1949,1),
+        ('To Kill a Mockingbird','Harper Lee','978-0446310789','Fiction',1960,1),
+        ('Clean Code','Robert C. Martin','978-0132350884','Technology',2008,1),
+        ('The Pragmatic Programmer','David Thomas','978-0135957059','Technology',2019,1),
+        ('Python Crash Course','Eric Matthes','978-1593279288','Technology',2019,1),
+        ('A Brief History of Time','Stephen Hawking','978-0553380163','Science',1988,1),
+        ('Sapiens','Yuval Noah Harari','978-0062316097','History',2014,1),
+        ('Dune','Frank Herbert','978-0441172719','Science Fiction',1965,1),
+        ('The Art of War','Sun Tzu','978-1599869773','Philosophy',500,1),
+        ('Atomic Habits','James Clear','978-0735211292','Self-Help',2018,1),
+        ('Deep Work','Cal Newport','978-1455586691','Self-Help',2016,1),
+        ('The Lean Startup','Eric Ries','978-0307887894','Business',2011,1),
+        ('Brave New World','Aldous Huxley','978-0060850524','Dystopian',1932,1),
+        ('Think and Grow Rich','Napoleon Hill','978-1585424337','Business',1937,1),
+    ]),
 
     # ---- Menu Items (15) ----
-    if c.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0] == 0:
-        menu = [
-            ('Grilled Salmon','Fresh Atlantic salmon with herbs',28.99,'Main Course',1),
-            ('Caesar Salad','Crispy romaine with parmesan',12.99,'Appetizer',1),
-            ('Chocolate Lava Cake','Warm molten chocolate center',9.99,'Dessert',1),
-            ('Margherita Pizza','Classic tomato and mozzarella',16.99,'Main Course',1),
-            ('Tiramisu','Italian coffee-flavored dessert',8.99,'Dessert',1),
-            ('Beef Burger','Angus beef with cheddar',14.99,'Main Course',1),
-            ('Mango Smoothie','Fresh tropical mango blend',6.99,'Beverage',1),
-            ('Garlic Bread','Toasted with herb butter',5.99,'Appetizer',1),
-            ('Grilled Chicken','Herb-marinated chicken breast',18.99,'Main Course',1),
-            ('French Fries','Crispy golden fries',4.99,'Sides',1),
-            ('Mushroom Soup','Creamy wild mushroom',7.99,'Appetizer',1),
-            ('Iced Latte','Cold brew with milk',5.49,'Beverage',1),
-            ('Pad Thai','Stir-fried rice noodles',15.99,'Main Course',1),
-            ('Apple Pie','Classic American dessert',7.49,'Dessert',1),
-            ('Fresh Orange Juice','Freshly squeezed',4.99,'Beverage',1),
-        ]
-        c.executemany("INSERT INTO menu_items (name,description,price,category,is_available,is_frozen) VALUES (?,?,?,?,?,1)", menu)
+    'menu_items': (('name', 'description', 'price', 'category', 'is_available'), [
+        ('Grilled Salmon','Fresh Atlantic salmon with herbs',28.99,'Main Course',1),
+        ('Caesar Salad','Crispy romaine with parmesan',12.99,'Appetizer',1),
+        ('Chocolate Lava Cake','Warm molten chocolate center',9.99,'Dessert',1),
+        ('Margherita Pizza','Classic tomato and mozzarella',16.99,'Main Course',1),
+        ('Tiramisu','Italian coffee-flavored dessert',8.99,'Dessert',1),
+        ('Beef Burger','Angus beef with cheddar',14.99,'Main Course',1),
+        ('Mango Smoothie','Fresh tropical mango blend',6.99,'Beverage',1),
+        ('Garlic Bread','Toasted with herb butter',5.99,'Appetizer',1),
+        ('Grilled Chicken','Herb-marinated chicken breast',18.99,'Main Course',1),
+        ('French Fries','Crispy golden fries',4.99,'Sides',1),
+        ('Mushroom Soup','Creamy wild mushroom',7.99,'Appetizer',1),
+        ('Iced Latte','Cold brew with milk',5.49,'Beverage',1),
+        ('Pad Thai','Stir-fried rice noodles',15.99,'Main Course',1),
+        ('Apple Pie','Classic American dessert',7.49,'Dessert',1),
+        ('Fresh Orange Juice','Freshly squeezed',4.99,'Beverage',1),
+    ]),
 
     # ---- Tasks (12) ----
-    if c.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0:
-        tasks = [
-            ('Learn HTTP Methods','Understand GET, POST, PUT, DELETE','completed','high','2026-01-15','Student'),
-            ('Practice CURL Commands','Run 10 CURL examples','in_progress','high','2026-02-01','Student'),
-            ('Build REST API','Create a simple API with Flask','pending','medium','2026-03-01','Developer'),
-            ('Study Authentication','Learn JWT and API keys','pending','high','2026-02-15','Student'),
-            ('Database Design','Design schema for a web app','completed','medium','2026-01-20','Developer'),
-            ('Write Unit Tests','Cover all endpoints','pending','medium','2026-03-10','Developer'),
-            ('Deploy to Production','Set up server and domain','pending','high','2026-03-15','DevOps'),
-            ('API Documentation','Write OpenAPI spec','in_progress','medium','2026-02-28','Developer'),
-            ('Security Audit','Review all endpoints','pending','high','2026-03-20','Security'),
-            ('Performance Testing','Load test the API','pending','low','2026-04-01','DevOps'),
-            ('Code Review','Review pull requests','in_progress','medium','2026-02-25','Developer'),
-            ('CI/CD Pipeline','Set up automated deployment','pending','medium','2026-03-25','DevOps'),
-        ]
-        c.executemany("INSERT INTO tasks (title,description,status,priority,due_date,assigned_to,is_frozen) VALUES (?,?,?,?,?,?,1)", tasks)
+    'tasks': (('title', 'description', 'status', 'priority', 'due_date', 'assigned_to'), [
+        ('Learn HTTP Methods','Understand GET, POST, PUT, DELETE','completed','high','2026-01-15','Student'),
+        ('Practice CURL Commands','Run 10 CURL examples','in_progress','high','2026-02-01','Student'),
+        ('Build REST API','Create a simple API with Flask','pending','medium','2026-03-01','Developer'),
+        ('Study Authentication','Learn JWT and API keys','pending','high','2026-02-15','Student'),
+        ('Database Design','Design schema for a web app','completed','medium','2026-01-20','Developer'),
+        ('Write Unit Tests','Cover all endpoints','pending','medium','2026-03-10','Developer'),
+        ('Deploy to Production','Set up server and domain','pending','high','2026-03-15','DevOps'),
+        ('API Documentation','Write OpenAPI spec','in_progress','medium','2026-02-28','Developer'),
+        ('Security Audit','Review all endpoints','pending','high','2026-03-20','Security'),
+        ('Performance Testing','Load test the API','pending','low','2026-04-01','DevOps'),
+        ('Code Review','Review pull requests','in_progress','medium','2026-02-25','Developer'),
+        ('CI/CD Pipeline','Set up automated deployment','pending','medium','2026-03-25','DevOps'),
+    ]),
 
     # ---- Students (10) ----
-    if c.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0:
-        students = [
-            ('Ahmed Al-Rashid','ahmed@uni.edu','STU-2024-001','Computer Science',3.85,2024),
-            ('Sara Johnson','sara.j@uni.edu','STU-2023-015','Data Science',3.92,2023),
-            ('Omar Hassan','omar.h@uni.edu','STU-2024-008','Software Engineering',3.45,2024),
-            ('Fatima Al-Zahra','fatima@uni.edu','STU-2022-030','Cybersecurity',3.78,2022),
-            ('John Smith','john.s@uni.edu','STU-2023-022','Computer Science',3.60,2023),
-            ('Layla Ibrahim','layla@uni.edu','STU-2024-011','AI & ML',3.95,2024),
-            ('Carlos Rodriguez','carlos@uni.edu','STU-2023-045','Web Development',3.50,2023),
-            ('Aisha Patel','aisha@uni.edu','STU-2024-003','Database Systems',3.70,2024),
-            ('Wei Zhang','wei.z@uni.edu','STU-2022-018','Cloud Computing',3.88,2022),
-            ('Emma Wilson','emma.w@uni.edu','STU-2024-025','Network Security',3.65,2024),
-        ]
-        c.executemany("INSERT INTO students (name,email,student_id,major,gpa,enrollment_year,is_frozen) VALUES (?,?,?,?,?,?,1)", students)
+    'students': (('name', 'email', 'student_id', 'major', 'gpa', 'enrollment_year'), [
+        ('Ahmed Al-Rashid','ahmed@uni.edu','STU-2024-001','Computer Science',3.85,2024),
+        ('Sara Johnson','sara.j@uni.edu','STU-2023-015','Data Science',3.92,2023),
+        ('Omar Hassan','omar.h@uni.edu','STU-2024-008','Software Engineering',3.45,2024),
+        ('Fatima Al-Zahra','fatima@uni.edu','STU-2022-030','Cybersecurity',3.78,2022),
+        ('John Smith','john.s@uni.edu','STU-2023-022','Computer Science',3.60,2023),
+        ('Layla Ibrahim','layla@uni.edu','STU-2024-011','AI & ML',3.95,2024),
+        ('Carlos Rodriguez','carlos@uni.edu','STU-2023-045','Web Development',3.50,2023),
+        ('Aisha Patel','aisha@uni.edu','STU-2024-003','Database Systems',3.70,2024),
+        ('Wei Zhang','wei.z@uni.edu','STU-2022-018','Cloud Computing',3.88,2022),
+        ('Emma Wilson','emma.w@uni.edu','STU-2024-025','Network Security',3.65,2024),
+    ]),
 
     # ---- Notes (8) ----
-    if c.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 0:
-        notes = [
-            ('HTTP Methods Overview','GET=Read, POST=Create, PUT=Update, DELETE=Remove','Learning',1),
-            ('REST API Best Practices','Use nouns for resources, HTTP verbs for actions','Work',1),
-            ('CURL Cheat Sheet','curl -X POST -H header -d data URL','Learning',0),
-            ('Status Codes','200=OK, 201=Created, 400=Bad Request, 401=Unauthorized, 404=Not Found, 500=Server Error','Learning',1),
-            ('Authentication Types','Basic Auth, Bearer Token, API Key, OAuth2','Learning',0),
-            ('JSON Format','Key-value pairs with strings, numbers, arrays, objects','Learning',0),
-            ('Project Ideas','Build a todo API, weather dashboard, blog platform','Ideas',0),
-            ('Security Notes','Always validate input, use HTTPS, sanitize data','Work',1),
-        ]
-        c.executemany("INSERT INTO notes (title,content,category,is_pinned,is_frozen) VALUES (?,?,?,?,1)", notes)
+    'notes': (('title', 'content', 'category', 'is_pinned'), [
+        ('HTTP Methods Overview','GET=Read, POST=Create, PUT=Update, DELETE=Remove','Learning',1),
+        ('REST API Best Practices','Use nouns for resources, HTTP verbs for actions','Work',1),
+        ('CURL Cheat Sheet','curl -X POST -H header -d data URL','Learning',0),
+        ('Status Codes','200=OK, 201=Created, 400=Bad Request, 401=Unauthorized, 404=Not Found, 500=Server Error','Learning',1),
+        ('Authentication Types','Basic Auth, Bearer Token, API Key, OAuth2','Learning',0),
+        ('JSON Format','Key-value pairs with strings, numbers, arrays, objects','Learning',0),
+        ('Project Ideas','Build a todo API, weather dashboard, blog platform','Ideas',0),
+        ('Security Notes','Always validate input, use HTTPS, sanitize data','Work',1),
+    ]),
 
     # ---- Blog Posts (6) ----
-    if c.execute("SELECT COUNT(*) FROM blog_posts").fetchone()[0] == 0:
-        posts = [
-            ('Getting Started with REST APIs','REST APIs use HTTP methods to perform CRUD operations on resources. This guide covers the basics of building and consuming RESTful services.','Tech Team','api,rest,beginner',1),
-            ('CURL for Beginners','CURL is a command-line tool for making HTTP requests. Learn how to use it for testing APIs with practical examples.','Tech Team','curl,tutorial,http',1),
-            ('Understanding HTTP Status Codes','Status codes tell you what happened with your request. Learn the difference between 2xx, 3xx, 4xx, and 5xx responses.','Tech Team','http,status-codes,tutorial',1),
-            ('API Authentication Deep Dive','Compare different authentication methods: API keys, JWT tokens, OAuth2, and when to use each one.','Tech Team','security,auth,api-keys',1),
-            ('Building Your First API','Step-by-step guide to building a REST API with Flask, including routing, error handling, and data validation.','Tech Team','flask,python,tutorial',1),
-            ('API Security Best Practices','Protect your APIs with rate limiting, input validation, CORS, and proper authentication.','Tech Team','security,best-practices',1),
-        ]
-        c.executemany("INSERT INTO blog_posts (title,content,author,tags,is_published,is_frozen) VALUES (?,?,?,?,?,1)", posts)
+    'blog_posts': (('title', 'content', 'author', 'tags', 'is_published'), [
+        ('Getting Started with REST APIs','REST APIs use HTTP methods to perform CRUD operations on resources. This guide covers the basics of building and consuming RESTful services.','Tech Team','api,rest,beginner',1),
+        ('CURL for Beginners','CURL is a command-line tool for making HTTP requests. Learn how to use it for testing APIs with practical examples.','Tech Team','curl,tutorial,http',1),
+        ('Understanding HTTP Status Codes','Status codes tell you what happened with your request. Learn the difference between 2xx, 3xx, 4xx, and 5xx responses.','Tech Team','http,status-codes,tutorial',1),
+        ('API Authentication Deep Dive','Compare different authentication methods: API keys, JWT tokens, OAuth2, and when to use each one.','Tech Team','security,auth,api-keys',1),
+        ('Building Your First API','Step-by-step guide to building a REST API with Flask, including routing, error handling, and data validation.','Tech Team','flask,python,tutorial',1),
+        ('API Security Best Practices','Protect your APIs with rate limiting, input validation, CORS, and proper authentication.','Tech Team','security,best-practices',1),
+    ]),
 
     # ---- Inventory (12) ----
-    if c.execute("SELECT COUNT(*) FROM inventory").fetchone()[0] == 0:
-        inv = [
-            ('Mechanical Keyboard','KB-001',150,89.99,'Electronics','Warehouse A'),
-            ('Wireless Mouse','MS-002',200,34.99,'Electronics','Warehouse A'),
-            ('USB-C Hub','HB-003',75,49.99,'Electronics','Warehouse B'),
-            ('Monitor Stand','ST-004',50,29.99,'Furniture','Warehouse B'),
-            ('Webcam HD 1080p','WC-005',100,59.99,'Electronics','Warehouse A'),
-            ('Desk Lamp LED','LM-006',80,24.99,'Furniture','Warehouse C'),
-            ('Laptop Sleeve 15"','SL-007',200,19.99,'Accessories','Warehouse C'),
-            ('Ethernet Cable 2m','EC-008',500,7.99,'Cables','Warehouse A'),
-            ('Power Strip 6-port','PS-009',120,15.99,'Electronics','Warehouse B'),
-            ('Screen Cleaner Kit','CL-010',300,9.99,'Accessories','Warehouse C'),
-            ('HDMI Cable 3m','HD-011',250,12.99,'Cables','Warehouse A'),
-            ('Mouse Pad XL','MP-012',180,14.99,'Accessories','Warehouse B'),
-        ]
-        c.executemany("INSERT INTO inventory (name,sku,quantity,price,category,warehouse,is_frozen) VALUES (?,?,?,?,?,?,1)", inv)
+    'inventory': (('name', 'sku', 'quantity', 'price', 'category', 'warehouse'), [
+        ('Mechanical Keyboard','KB-001',150,89.99,'Electronics','Warehouse A'),
+        ('Wireless Mouse','MS-002',200,34.99,'Electronics','Warehouse A'),
+        ('USB-C Hub','HB-003',75,49.99,'Electronics','Warehouse B'),
+        ('Monitor Stand','ST-004',50,29.99,'Furniture','Warehouse B'),
+        ('Webcam HD 1080p','WC-005',100,59.99,'Electronics','Warehouse A'),
+        ('Desk Lamp LED','LM-006',80,24.99,'Furniture','Warehouse C'),
+        ('Laptop Sleeve 15"','SL-007',200,19.99,'Accessories','Warehouse C'),
+        ('Ethernet Cable 2m','EC-008',500,7.99,'Cables','Warehouse A'),
+        ('Power Strip 6-port','PS-009',120,15.99,'Electronics','Warehouse B'),
+        ('Screen Cleaner Kit','CL-010',300,9.99,'Accessories','Warehouse C'),
+        ('HDMI Cable 3m','HD-011',250,12.99,'Cables','Warehouse A'),
+        ('Mouse Pad XL','MP-012',180,14.99,'Accessories','Warehouse B'),
+    ]),
 
     # ---- Products (10) ----
-    if c.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
-        products = [
-            ('Wireless Earbuds Pro','Active noise cancellation, 30h battery',79.99,'Audio','SoundMax',4.7,500,None),
-            ('Smart Watch X','Heart rate, GPS, water resistant',199.99,'Wearables','TechWear',4.5,300,None),
-            ('Bluetooth Speaker','360° surround, IPX7 waterproof',49.99,'Audio','SoundMax',4.3,800,None),
-            ('Laptop Backpack','Anti-theft, USB charging port',39.99,'Bags','TravelPro',4.6,600,None),
-            ('Portable Charger 20K','Fast charging, dual USB-C',29.99,'Electronics','PowerUp',4.4,1000,None),
-            ('Yoga Mat Premium','Non-slip, eco-friendly, 6mm',24.99,'Fitness','FitLife',4.8,400,None),
-            ('LED Desk Lamp','Touch control, adjustable brightness',34.99,'Home','BrightLight',4.2,350,None),
-            ('Mechanical Pencil Set','0.5mm, 0.7mm with leads',12.99,'Stationery','WriteWell',4.1,900,None),
-            ('Water Bottle 1L','Insulated, keeps cold 24h',19.99,'Accessories','HydroFlow',4.5,700,None),
-            ('Phone Stand','Adjustable, foldable, aluminum',15.99,'Electronics','TechGear',4.3,1200,None),
-        ]
-        c.executemany("INSERT INTO products (name,description,price,category,brand,rating,stock,image_url,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", products)
+    'products': (('name', 'description', 'price', 'category', 'brand', 'rating', 'stock', 'image_url'), [
+        ('Wireless Earbuds Pro','Active noise cancellation, 30h battery',79.99,'Audio','SoundMax',4.7,500,None),
+        ('Smart Watch X','Heart rate, GPS, water resistant',199.99,'Wearables','TechWear',4.5,300,None),
+        ('Bluetooth Speaker','360° surround, IPX7 waterproof',49.99,'Audio','SoundMax',4.3,800,None),
+        ('Laptop Backpack','Anti-theft, USB charging port',39.99,'Bags','TravelPro',4.6,600,None),
+        ('Portable Charger 20K','Fast charging, dual USB-C',29.99,'Electronics','PowerUp',4.4,1000,None),
+        ('Yoga Mat Premium','Non-slip, eco-friendly, 6mm',24.99,'Fitness','FitLife',4.8,400,None),
+        ('LED Desk Lamp','Touch control, adjustable brightness',34.99,'Home','BrightLight',4.2,350,None),
+        ('Mechanical Pencil Set','0.5mm, 0.7mm with leads',12.99,'Stationery','WriteWell',4.1,900,None),
+        ('Water Bottle 1L','Insulated, keeps cold 24h',19.99,'Accessories','HydroFlow',4.5,700,None),
+        ('Phone Stand','Adjustable, foldable, aluminum',15.99,'Electronics','TechGear',4.3,1200,None),
+    ]),
 
     # ---- Movies (10) ----
-    if c.execute("SELECT COUNT(*) FROM movies").fetchone()[0] == 0:
-        movies = [
-            ('The Shawshank Redemption','Frank Darabont','Drama',1994,9.3,142,'English'),
-            ('Inception','Christopher Nolan','Sci-Fi',2010,8.8,148,'English'),
-            ('Parasite','Bong Joon-ho','Thriller',2019,8.5,132,'Korean'),
-            ('The Dark Knight','Christopher Nolan','Action',2008,9.0,152,'English'),
-            ('Spirited Away','Hayao Miyazaki','Animation',2001,8.6,125,'Japanese'),
-            ('Interstellar','Christopher Nolan','Sci-Fi',2014,8.7,169,'English'),
-            ('The Godfather','Francis Ford Coppola','Crime',1972,9.2,175,'English'),
-            ('Pulp Fiction','Quentin Tarantino','Crime',1994,8.9,154,'English'),
-            ('Coco','Lee Unkrich','Animation',2017,8.4,105,'English'),
-            ('The Matrix','The Wachowskis','Sci-Fi',1999,8.7,136,'English'),
-        ]
-        c.executemany("INSERT INTO movies (title,director,genre,year,rating,runtime,language,is_frozen) VALUES (?,?,?,?,?,?,?,1)", movies)
+    'movies': (('title', 'director', 'genre', 'year', 'rating', 'runtime', 'language'), [
+        ('The Shawshank Redemption','Frank Darabont','Drama',1994,9.3,142,'English'),
+        ('Inception','Christopher Nolan','Sci-Fi',2010,8.8,148,'English'),
+        ('Parasite','Bong Joon-ho','Thriller',2019,8.5,132,'Korean'),
+        ('The Dark Knight','Christopher Nolan','Action',2008,9.0,152,'English'),
+        ('Spirited Away','Hayao Miyazaki','Animation',2001,8.6,125,'Japanese'),
+        ('Interstellar','Christopher Nolan','Sci-Fi',2014,8.7,169,'English'),
+        ('The Godfather','Francis Ford Coppola','Crime',1972,9.2,175,'English'),
+        ('Pulp Fiction','Quentin Tarantino','Crime',1994,8.9,154,'English'),
+        ('Coco','Lee Unkrich','Animation',2017,8.4,105,'English'),
+        ('The Matrix','The Wachowskis','Sci-Fi',1999,8.7,136,'English'),
+    ]),
 
     # ---- Recipes (8) ----
-    if c.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 0:
-        recipes = [
-            ('Spaghetti Carbonara','Classic Italian pasta with egg and bacon','Italian','easy',10,20,4,'spaghetti,eggs,bacon,parmesan,black pepper'),
-            ('Chicken Stir Fry','Quick and healthy Asian-style dish','Asian','easy',15,10,2,'chicken,soy sauce,vegetables,rice,ginger'),
-            ('Beef Tacos','Mexican street-style tacos','Mexican','easy',15,15,4,'beef,tortillas,salsa,onion,cilantro'),
-            ('Mushroom Risotto','Creamy Italian rice dish','Italian','medium',10,30,3,'arborio rice,mushrooms,parmesan,butter,broth'),
-            ('Greek Salad','Fresh Mediterranean salad','Mediterranean','easy',10,0,2,'tomatoes,cucumber,feta,olives,olive oil'),
-            ('Pad Thai','Thai stir-fried noodles','Thai','medium',20,15,3,'rice noodles,shrimp,peanuts,bean sprouts,lime'),
-            ('Banana Pancakes','Fluffy breakfast pancakes','American','easy',5,15,2,'bananas,eggs,flour,butter,maple syrup'),
-            ('Tom Kha Gai','Thai coconut chicken soup','Thai','medium',15,25,4,'chicken,coconut milk,galangal,lemongrass,mushrooms'),
-        ]
-        c.executemany("INSERT INTO recipes (title,description,cuisine,difficulty,prep_time,cook_time,servings,ingredients,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", recipes)
+    'recipes': (('title', 'description', 'cuisine', 'difficulty', 'prep_time', 'cook_time', 'servings', 'ingredients'), [
+        ('Spaghetti Carbonara','Classic Italian pasta with egg and bacon','Italian','easy',10,20,4,'spaghetti,eggs,bacon,parmesan,black pepper'),
+        ('Chicken Stir Fry','Quick and healthy Asian-style dish','Asian','easy',15,10,2,'chicken,soy sauce,vegetables,rice,ginger'),
+        ('Beef Tacos','Mexican street-style tacos','Mexican','easy',15,15,4,'beef,tortillas,salsa,onion,cilantro'),
+        ('Mushroom Risotto','Creamy Italian rice dish','Italian','medium',10,30,3,'arborio rice,mushrooms,parmesan,butter,broth'),
+        ('Greek Salad','Fresh Mediterranean salad','Mediterranean','easy',10,0,2,'tomatoes,cucumber,feta,olives,olive oil'),
+        ('Pad Thai','Thai stir-fried noodles','Thai','medium',20,15,3,'rice noodles,shrimp,peanuts,bean sprouts,lime'),
+        ('Banana Pancakes','Fluffy breakfast pancakes','American','easy',5,15,2,'bananas,eggs,flour,butter,maple syrup'),
+        ('Tom Kha Gai','Thai coconut chicken soup','Thai','medium',15,25,4,'chicken,coconut milk,galangal,lemongrass,mushrooms'),
+    ]),
 
     # ---- Events (8) ----
-    if c.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0:
-        events = [
-            ('Tech Conference 2026','Annual technology summit','Convention Center','2026-06-15','09:00','Technology',500,'TechOrg'),
-            ('Web Dev Workshop','Hands-on Flask & React workshop','Room 204','2026-04-10','14:00','Workshop',30,'CodeAcademy'),
-            ('AI Hackathon','24-hour AI challenge','Innovation Hub','2026-05-20','08:00','Hackathon',100,'AI Society'),
-            ('Networking Mixer','Meet fellow developers','Rooftop Lounge','2026-03-28','18:00','Social',75,'DevCommunity'),
-            ('Security Seminar','Cybersecurity best practices','Auditorium B','2026-04-25','10:00','Seminar',200,'SecureIT'),
-            ('Open Source Day','Contributing to open source','Lab 3','2026-05-05','09:00','Workshop',40,'OSS Foundation'),
-            ('Career Fair','Tech companies recruiting','Main Hall','2026-06-01','10:00','Career',300,'University'),
-            ('API Design Masterclass','RESTful API design patterns','Online','2026-04-18','16:00','Masterclass',50,'APIguru'),
-        ]
-        c.executemany("INSERT INTO events (title,description,location,event_date,event_time,category,capacity,organizer,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", events)
+    'events': (('title', 'description', 'location', 'event_date', 'event_time', 'category', 'capacity', 'organizer'), [
+        ('Tech Conference 2026','Annual technology summit','Convention Center','2026-06-15','09:00','Technology',500,'TechOrg'),
+        ('Web Dev Workshop','Hands-on Flask & React workshop','Room 204','2026-04-10','14:00','Workshop',30,'CodeAcademy'),
+        ('AI Hackathon','24-hour AI challenge','Innovation Hub','2026-05-20','08:00','Hackathon',100,'AI Society'),
+        ('Networking Mixer','Meet fellow developers','Rooftop Lounge','2026-03-28','18:00','Social',75,'DevCommunity'),
+        ('Security Seminar','Cybersecurity best practices','Auditorium B','2026-04-25','10:00','Seminar',200,'SecureIT'),
+        ('Open Source Day','Contributing to open source','Lab 3','2026-05-05','09:00','Workshop',40,'OSS Foundation'),
+        ('Career Fair','Tech companies recruiting','Main Hall','2026-06-01','10:00','Career',300,'University'),
+        ('API Design Masterclass','RESTful API design patterns','Online','2026-04-18','16:00','Masterclass',50,'APIguru'),
+    ]),
 
     # ---- Contacts (10) ----
-    if c.execute("SELECT COUNT(*) FROM contacts").fetchone()[0] == 0:
-        contacts = [
-            ('Alice','Johnson','alice@example.com','+1-555-0101','Google','Software Engineer','San Francisco','USA'),
-            ('Bob','Smith','bob@example.com','+44-20-7946-0958','Microsoft','Product Manager','London','UK'),
-            ('Yuki','Tanaka','yuki@example.com','+81-3-1234-5678','Sony','Designer','Tokyo','Japan'),
-            ('Ahmed','Hassan','ahmed@example.com','+971-50-123-4567','Emirates','Data Analyst','Dubai','UAE'),
-            ('Maria','Garcia','maria@example.com','+34-91-123-4567','Telefonica','Developer','Madrid','Spain'),
-            ('Chen','Wei','chen@example.com','+86-10-1234-5678','Alibaba','CTO','Beijing','China'),
-            ('Fatima','Al-Sayed','fatima@example.com','+966-50-123-4567','Aramco','Engineer','Riyadh','Saudi Arabia'),
-            ('James','Wilson','james@example.com','+61-2-1234-5678','Canva','Frontend Dev','Sydney','Australia'),
-            ('Priya','Sharma','priya@example.com','+91-98-1234-5678','Infosys','Backend Dev','Mumbai','India'),
-            ('Lucas','Mueller','lucas@example.com','+49-30-1234-5678','SAP','DevOps','Berlin','Germany'),
-        ]
-        c.executemany("INSERT INTO contacts (first_name,last_name,email,phone,company,job_title,city,country,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", contacts)
+    'contacts': (('first_name', 'last_name', 'email', 'phone', 'company', 'job_title', 'city', 'country'), [
+        ('Alice','Johnson','alice@example.com','+1-555-0101','Google','Software Engineer','San Francisco','USA'),
+        ('Bob','Smith','bob@example.com','+44-20-7946-0958','Microsoft','Product Manager','London','UK'),
+        ('Yuki','Tanaka','yuki@example.com','+81-3-1234-5678','Sony','Designer','Tokyo','Japan'),
+        ('Ahmed','Hassan','ahmed@example.com','+971-50-123-4567','Emirates','Data Analyst','Dubai','UAE'),
+        ('Maria','Garcia','maria@example.com','+34-91-123-4567','Telefonica','Developer','Madrid','Spain'),
+        ('Chen','Wei','chen@example.com','+86-10-1234-5678','Alibaba','CTO','Beijing','China'),
+        ('Fatima','Al-Sayed','fatima@example.com','+966-50-123-4567','Aramco','Engineer','Riyadh','Saudi Arabia'),
+        ('James','Wilson','james@example.com','+61-2-1234-5678','Canva','Frontend Dev','Sydney','Australia'),
+        ('Priya','Sharma','priya@example.com','+91-98-1234-5678','Infosys','Backend Dev','Mumbai','India'),
+        ('Lucas','Mueller','lucas@example.com','+49-30-1234-5678','SAP','DevOps','Berlin','Germany'),
+    ]),
 
     # ---- Songs (10) ----
-    if c.execute("SELECT COUNT(*) FROM songs").fetchone()[0] == 0:
-        songs = [
-            ('Bohemian Rhapsody','Queen','A Night at the Opera','Rock',354,1975,0),
-            ('Blinding Lights','The Weeknd','After Hours','Pop',200,2020,0),
-            ('Shape of You','Ed Sheeran','÷ (Divide)','Pop',234,2017,0),
-            ('Lose Yourself','Eminem','8 Mile OST','Hip Hop',326,2002,1),
-            ('Hotel California','Eagles','Hotel California','Rock',391,1977,0),
-            ('Billie Jean','Michael Jackson','Thriller','Pop',294,1983,0),
-            ('Despacito','Luis Fonsi','Vida','Latin Pop',228,2017,0),
-            ('Stairway to Heaven','Led Zeppelin','Led Zeppelin IV','Rock',482,1971,0),
-            ('Rolling in the Deep','Adele','21','Soul',228,2011,0),
-            ('Imagine','John Lennon','Imagine','Rock',187,1971,0),
-        ]
-        c.executemany("INSERT INTO songs (title,artist,album,genre,duration,year,is_explicit,is_frozen) VALUES (?,?,?,?,?,?,?,1)", songs)
+    'songs': (('title', 'artist', 'album', 'genre', 'duration', 'year', 'is_explicit'), [
+        ('Bohemian Rhapsody','Queen','A Night at the Opera','Rock',354,1975,0),
+        ('Blinding Lights','The Weeknd','After Hours','Pop',200,2020,0),
+        ('Shape of You','Ed Sheeran','÷ (Divide)','Pop',234,2017,0),
+        ('Lose Yourself','Eminem','8 Mile OST','Hip Hop',326,2002,1),
+        ('Hotel California','Eagles','Hotel California','Rock',391,1977,0),
+        ('Billie Jean','Michael Jackson','Thriller','Pop',294,1983,0),
+        ('Despacito','Luis Fonsi','Vida','Latin Pop',228,2017,0),
+        ('Stairway to Heaven','Led Zeppelin','Led Zeppelin IV','Rock',482,1971,0),
+        ('Rolling in the Deep','Adele','21','Soul',228,2011,0),
+        ('Imagine','John Lennon','Imagine','Rock',187,1971,0),
+    ]),
 
     # ---- Quotes (10) ----
-    if c.execute("SELECT COUNT(*) FROM quotes").fetchone()[0] == 0:
-        quotes = [
-            ('The only way to do great work is to love what you do.','Steve Jobs','Motivation','English'),
-            ('Talk is cheap. Show me the code.','Linus Torvalds','Programming','English'),
-            ('First, solve the problem. Then, write the code.','John Johnson','Programming','English'),
-            ('Any fool can write code that a computer can understand. Good programmers write code that humans can understand.','Martin Fowler','Programming','English'),
-            ('The best time to plant a tree was 20 years ago. The second best time is now.','Chinese Proverb','Wisdom','English'),
-            ('In the middle of difficulty lies opportunity.','Albert Einstein','Motivation','English'),
-            ('Simplicity is the soul of efficiency.','Austin Freeman','Programming','English'),
-            ('Code is like humor. When you have to explain it, it is bad.','Cory House','Programming','English'),
-            ('The function of good software is to make the complex appear to be simple.','Grady Booch','Programming','English'),
-            ('It always seems impossible until it is done.','Nelson Mandela','Motivation','English'),
-        ]
-        c.executemany("INSERT INTO quotes (text,author,category,language,is_frozen) VALUES (?,?,?,?,1)", quotes)
+    'quotes': (('text', 'author', 'category', 'language'), [
+        ('The only way to do great work is to love what you do.','Steve Jobs','Motivation','English'),
+        ('Talk is cheap. Show me the code.','Linus Torvalds','Programming','English'),
+        ('First, solve the problem. Then, write the code.','John Johnson','Programming','English'),
+        ('Any fool can write code that a computer can understand. Good programmers write code that humans can understand.','Martin Fowler','Programming','English'),
+        ('The best time to plant a tree was 20 years ago. The second best time is now.','Chinese Proverb','Wisdom','English'),
+        ('In the middle of difficulty lies opportunity.','Albert Einstein','Motivation','English'),
+        ('Simplicity is the soul of efficiency.','Austin Freeman','Programming','English'),
+        ('Code is like humor. When you have to explain it, it is bad.','Cory House','Programming','English'),
+        ('The function of good software is to make the complex appear to be simple.','Grady Booch','Programming','English'),
+        ('It always seems impossible until it is done.','Nelson Mandela','Motivation','English'),
+    ]),
 
     # ---- Countries (10) ----
-    if c.execute("SELECT COUNT(*) FROM countries").fetchone()[0] == 0:
-        countries = [
-            ('United States','Washington D.C.','North America',331000000,9833520,'USD','English','+1'),
-            ('United Kingdom','London','Europe',67800000,242495,'GBP','English','+44'),
-            ('Japan','Tokyo','Asia',125700000,377975,'JPY','Japanese','+81'),
-            ('United Arab Emirates','Abu Dhabi','Asia',9900000,83600,'AED','Arabic','+971'),
-            ('Germany','Berlin','Europe',83200000,357022,'EUR','German','+49'),
-            ('Brazil','Brasilia','South America',212600000,8515767,'BRL','Portuguese','+55'),
-            ('Australia','Canberra','Oceania',25700000,7692024,'AUD','English','+61'),
-            ('India','New Delhi','Asia',1380000000,3287263,'INR','Hindi','+91'),
-            ('Saudi Arabia','Riyadh','Asia',34800000,2149690,'SAR','Arabic','+966'),
-            ('South Korea','Seoul','Asia',51800000,100210,'KRW','Korean','+82'),
-        ]
-        c.executemany("INSERT INTO countries (name,capital,continent,population,area_km2,currency,language,calling_code,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", countries)
+    'countries': (('name', 'capital', 'continent', 'population', 'area_km2', 'currency', 'language', 'calling_code'), [
+        ('United States','Washington D.C.','North America',331000000,9833520,'USD','English','+1'),
+        ('United Kingdom','London','Europe',67800000,242495,'GBP','English','+44'),
+        ('Japan','Tokyo','Asia',125700000,377975,'JPY','Japanese','+81'),
+        ('United Arab Emirates','Abu Dhabi','Asia',9900000,83600,'AED','Arabic','+971'),
+        ('Germany','Berlin','Europe',83200000,357022,'EUR','German','+49'),
+        ('Brazil','Brasilia','South America',212600000,8515767,'BRL','Portuguese','+55'),
+        ('Australia','Canberra','Oceania',25700000,7692024,'AUD','English','+61'),
+        ('India','New Delhi','Asia',1380000000,3287263,'INR','Hindi','+91'),
+        ('Saudi Arabia','Riyadh','Asia',34800000,2149690,'SAR','Arabic','+966'),
+        ('South Korea','Seoul','Asia',51800000,100210,'KRW','Korean','+82'),
+    ]),
 
     # ---- Jokes (8) ----
-    if c.execute("SELECT COUNT(*) FROM jokes").fetchone()[0] == 0:
-        jokes = [
-            ('Why do programmers prefer dark mode?','Because light attracts bugs!','programming',4.5),
-            ('What is a programmer\'s favorite hangout place?','Foo Bar!','programming',3.8),
-            ('Why was the JavaScript developer sad?','Because he didn\'t Node how to Express himself.','programming',4.2),
-            ('What did the server say to the client?','HTTP 200 — everything is OK!','programming',3.5),
-            ('Why do Java developers wear glasses?','Because they can\'t C#!','programming',4.0),
-            ('How many programmers does it take to change a light bulb?','None — that\'s a hardware problem!','programming',4.3),
-            ('What\'s a computer\'s favorite snack?','Microchips!','general',3.2),
-            ('Why did the API go to therapy?','It had too many unresolved issues.','programming',4.1),
-        ]
-        c.executemany("INSERT INTO jokes (setup,punchline,category,rating,is_frozen) VALUES (?,?,?,?,1)", jokes)
+    'jokes': (('setup', 'punchline', 'category', 'rating'), [
+        ('Why do programmers prefer dark mode?','Because light attracts bugs!','programming',4.5),
+        ('What is a programmer\'s favorite hangout place?','Foo Bar!','programming',3.8),
+        ('Why was the JavaScript developer sad?','Because he didn\'t Node how to Express himself.','programming',4.2),
+        ('What did the server say to the client?','HTTP 200 — everything is OK!','programming',3.5),
+        ('Why do Java developers wear glasses?','Because they can\'t C#!','programming',4.0),
+        ('How many programmers does it take to change a light bulb?','None — that\'s a hardware problem!','programming',4.3),
+        ('What\'s a computer\'s favorite snack?','Microchips!','general',3.2),
+        ('Why did the API go to therapy?','It had too many unresolved issues.','programming',4.1),
+    ]),
 
     # ---- Vehicles (8) ----
-    if c.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0] == 0:
-        vehicles = [
-            ('Toyota','Camry',2024,'Sedan','White',28000,'Gasoline',0),
-            ('Tesla','Model 3',2024,'Sedan','Black',42000,'Electric',0),
-            ('BMW','X5',2023,'SUV','Blue',62000,'Gasoline',35000),
-            ('Honda','Civic',2024,'Sedan','Silver',26000,'Gasoline',0),
-            ('Ford','F-150',2024,'Truck','Red',55000,'Gasoline',0),
-            ('Mercedes','C-Class',2023,'Sedan','Gray',45000,'Gasoline',20000),
-            ('Audi','Q7',2024,'SUV','Black',70000,'Gasoline',0),
-            ('Hyundai','Ioniq 5',2024,'SUV','Green',45000,'Electric',0),
-        ]
-        c.executemany("INSERT INTO vehicles (make,model,year,type,color,price,fuel_type,mileage,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", vehicles)
+    'vehicles': (('make', 'model', 'year', 'type', 'color', 'price', 'fuel_type', 'mileage'), [
+        ('Toyota','Camry',2024,'Sedan','White',28000,'Gasoline',0),
+        ('Tesla','Model 3',2024,'Sedan','Black',42000,'Electric',0),
+        ('BMW','X5',2023,'SUV','Blue',62000,'Gasoline',35000),
+        ('Honda','Civic',2024,'Sedan','Silver',26000,'Gasoline',0),
+        ('Ford','F-150',2024,'Truck','Red',55000,'Gasoline',0),
+        ('Mercedes','C-Class',2023,'Sedan','Gray',45000,'Gasoline',20000),
+        ('Audi','Q7',2024,'SUV','Black',70000,'Gasoline',0),
+        ('Hyundai','Ioniq 5',2024,'SUV','Green',45000,'Electric',0),
+    ]),
 
     # ---- Courses (8) ----
-    if c.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 0:
-        courses = [
-            ('Python for Beginners','Dr. Sarah Chen','Programming','beginner',12.5,0,4.8,5200),
-            ('Web Development Bootcamp','John Doe','Web Development','intermediate',48.0,49.99,4.7,12000),
-            ('Data Science with Python','Prof. Alex Kim','Data Science','intermediate',30.0,39.99,4.6,8500),
-            ('Machine Learning A-Z','Dr. Lisa Wang','AI & ML','advanced',40.0,59.99,4.9,15000),
-            ('JavaScript Mastery','Chris Brown','Programming','beginner',20.0,29.99,4.5,9800),
-            ('DevOps Engineering','Mike Johnson','DevOps','advanced',35.0,44.99,4.4,3200),
-            ('Cybersecurity Fundamentals','Prof. Omar Ali','Security','beginner',15.0,0,4.7,7600),
-            ('Cloud Computing with AWS','Emily Davis','Cloud','intermediate',25.0,34.99,4.3,4100),
-        ]
-        c.executemany("INSERT INTO courses (title,instructor,category,level,duration_hours,price,rating,enrolled,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", courses)
+    'courses': (('title', 'instructor', 'category', 'level', 'duration_hours', 'price', 'rating', 'enrolled'), [
+        ('Python for Beginners','Dr. Sarah Chen','Programming','beginner',12.5,0,4.8,5200),
+        ('Web Development Bootcamp','John Doe','Web Development','intermediate',48.0,49.99,4.7,12000),
+        ('Data Science with Python','Prof. Alex Kim','Data Science','intermediate',30.0,39.99,4.6,8500),
+        ('Machine Learning A-Z','Dr. Lisa Wang','AI & ML','advanced',40.0,59.99,4.9,15000),
+        ('JavaScript Mastery','Chris Brown','Programming','beginner',20.0,29.99,4.5,9800),
+        ('DevOps Engineering','Mike Johnson','DevOps','advanced',35.0,44.99,4.4,3200),
+        ('Cybersecurity Fundamentals','Prof. Omar Ali','Security','beginner',15.0,0,4.7,7600),
+        ('Cloud Computing with AWS','Emily Davis','Cloud','intermediate',25.0,34.99,4.3,4100),
+    ]),
 
     # ---- Pets (8) ----
-    if c.execute("SELECT COUNT(*) FROM pets").fetchone()[0] == 0:
-        pets = [
-            ('Buddy','Dog','Golden Retriever',3,'Golden',30.5,0,'Happy Paws Shelter'),
-            ('Whiskers','Cat','Persian',2,'White',4.2,0,'Cat Haven'),
-            ('Max','Dog','German Shepherd',5,'Black & Tan',35.0,1,'City Animal Rescue'),
-            ('Luna','Cat','Siamese',1,'Cream',3.5,0,'Cat Haven'),
-            ('Charlie','Dog','Labrador',4,'Chocolate',28.0,0,'Happy Paws Shelter'),
-            ('Bella','Cat','Maine Coon',3,'Tabby',5.8,1,'Feline Friends'),
-            ('Rocky','Dog','Bulldog',2,'Brindle',22.0,0,'City Animal Rescue'),
-            ('Milo','Cat','British Shorthair',1,'Gray',4.0,0,'Feline Friends'),
-        ]
-        c.executemany("INSERT INTO pets (name,species,breed,age,color,weight,adopted,shelter,is_frozen) VALUES (?,?,?,?,?,?,?,?,1)", pets)
+    'pets': (('name', 'species', 'breed', 'age', 'color', 'weight', 'adopted', 'shelter'), [
+        ('Buddy','Dog','Golden Retriever',3,'Golden',30.5,0,'Happy Paws Shelter'),
+        ('Whiskers','Cat','Persian',2,'White',4.2,0,'Cat Haven'),
+        ('Max','Dog','German Shepherd',5,'Black & Tan',35.0,1,'City Animal Rescue'),
+        ('Luna','Cat','Siamese',1,'Cream',3.5,0,'Cat Haven'),
+        ('Charlie','Dog','Labrador',4,'Chocolate',28.0,0,'Happy Paws Shelter'),
+        ('Bella','Cat','Maine Coon',3,'Tabby',5.8,1,'Feline Friends'),
+        ('Rocky','Dog','Bulldog',2,'Brindle',22.0,0,'City Animal Rescue'),
+        ('Milo','Cat','British Shorthair',1,'Gray',4.0,0,'Feline Friends'),
+    ]),
+}
 
-    conn.commit()
+def seed_fingerprint(tables):
+    """Changes whenever the seed rows for `tables` change, so a warm start can skip _seed_data"""
+    return fingerprint(sorted((t, SEED_DATA[t]) for t in tables if t in SEED_DATA))
+
+
+def _seed_data(conn, tables):
+    c = conn.cursor()
+    for table, (cols, rows) in SEED_DATA.items():
+        if table in tables and c.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0:
+            c.executemany(
+                f"INSERT INTO {table} ({','.join(cols)},is_frozen) VALUES ({','.join('?' * len(cols))},1)",
+                rows
+            )
@@ -7,172 +7,528 @@ Rules:
 - DELETE (user deletes) → item restored after 1 hour
 - Frozen (baseline) data is never permanently modified
 - Superadmin can add permanent frozen data
+
+The daemon keeps a min-heap of upcoming expirations and sleeps until the
+next one is due, instead of polling every shard once a minute. Every worker
+runs a candidate, but only the holder of the leader lease reverts. Expired
+entries are reverted newest first in pages of FREEZE_REVERT_BATCH, each its
+own short transaction, so a large backlog never holds the write lock for long.
 """
-import json
+import os
+import heapq
+import fcntl
+import atexit
+import secrets
+import calendar
 import threading
 import time
 from datetime import datetime, timedelta
-from database import get_db
-
-# Module table names for reference
-MODULE_TABLES = [
-    'books', 'menu_items', 'tasks', 'students', 'notes', 'files', 'blog_posts', 'inventory',
-    'products', 'movies', 'recipes', 'events', 'contacts', 'songs', 'quotes', 'countries',
-    'jokes', 'vehicles', 'courses', 'pets'
-]
-
-# Table column definitions for restoration
-TABLE_COLUMNS = {
-    'books': ['title', 'author', 'isbn', 'genre', 'year', 'available'],
-    'menu_items': ['name', 'description', 'price', 'category', 'is_available', 'image_url'],
-    'tasks': ['title', 'description', 'status', 'priority', 'due_date', 'assigned_to'],
-    'students': ['name', 'email', 'student_id', 'major', 'gpa', 'enrollment_year'],
-    'notes': ['title', 'content', 'category', 'is_pinned'],
-    'files': ['filename', 'original_name', 'file_type', 'file_size', 'uploaded_by'],
-    'blog_posts': ['title', 'content', 'author', 'tags', 'is_published'],
-    'inventory': ['name', 'sku', 'quantity', 'price', 'category', 'warehouse'],
-    'products': ['name', 'description', 'price', 'category', 'brand', 'rating', 'stock', 'image_url'],
-    'movies': ['title', 'director', 'genre', 'year', 'rating', 'runtime', 'language', 'plot'],
-    'recipes': ['title', 'description', 'cuisine', 'difficulty', 'prep_time', 'cook_time', 'servings', 'ingredients'],
-    'events': ['title', 'description', 'location', 'event_date', 'event_time', 'category', 'capacity', 'organizer'],
-    'contacts': ['first_name', 'last_name', 'email', 'phone', 'company', 'job_title', 'city', 'country'],
-    'songs': ['title', 'artist', 'album', 'genre', 'duration', 'year', 'explicit'],
-    'quotes': ['text', 'author', 'category', 'language'],
-    'countries': ['name', 'capital', 'continent', 'population', 'area_km2', 'currency', 'language'],
-    'jokes': ['setup', 'punchline', 'category', 'rating'],
-    'vehicles': ['make', 'model', 'year', 'type', 'color', 'price', 'fuel_type', 'mileage'],
-    'courses': ['title', 'instructor', 'category', 'level', 'duration_hours', 'price', 'rating', 'enrolled'],
-    'pets': ['name', 'species', 'breed', 'age', 'color', 'weight', 'shelter', 'adopted'],
-}
-
-
-def track_modification(table_name, record_id, action, original_data=None, user_id=None, api_key_id=None):
-    """
-    Track a user's modification for deep freeze auto-revert.
-    action: 'create', 'update', 'delete'
-    """
-    db = get_db()
-    if action == 'create':
-        expires = datetime.utcnow() + timedelta(hours=2)
-    else:  # update or delete
-        expires = datetime.utcnow() + timedelta(hours=1)
-
-    original_json = json.dumps(original_data) if original_data else None
-
-    db.execute(
-        """INSERT INTO user_modifications
-           (user_id, api_key_id, table_name, record_id, action, original_data, expires_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (user_id, api_key_id, table_name, record_id, action, original_json, expires.strftime('%Y-%m-%d %H:%M:%S'))
-    )
-    db.commit()
-    db.close()
+from database import get_db, shards_with, shard_for, shard_path
+from state import get_state
+from overlay import overlay_table, overlay_tables, purge_expired
+from codec import decode_snapshot, SnapshotUnreadable
+from registry import MODULE_TABLES as REGISTRY_TABLES, MODULES_BY_TABLE, TABLE_MODULES, INTERNAL_COLUMNS
+
+# Module table names and restorable columns, both derived from the module registry
+MODULE_TABLES = list(REGISTRY_TABLES)
+TABLE_COLUMNS = {m.table: list(m.columns) for m in TABLE_MODULES}
+
+# import: started when app.py is imported; worker: by gunicorn.conf.py in each worker; off: never in this instance
+FREEZE_DAEMON = os.getenv('FREEZE_DAEMON', 'import')
+FREEZE_RECONCILE_SECONDS = float(os.getenv('FREEZE_RECONCILE_SECONDS', 30))
+FREEZE_LEASE_SECONDS = float(os.getenv('FREEZE_LEASE_SECONDS', 9))
+FREEZE_MAX_LAG_SECONDS = int(os.getenv('FREEZE_MAX_LAG_SECONDS', 60))
+FREEZE_REVERT_BATCH = int(os.getenv('FREEZE_REVERT_BATCH', 200))
+FREEZE_REVERT_PAUSE_MS = float(os.getenv('FREEZE_REVERT_PAUSE_MS', 10))
+FREEZE_REVERT_MAX_RUN_SECONDS = float(os.getenv('FREEZE_REVERT_MAX_RUN_SECONDS', 5))
+# Entries whose original_data cannot be decoded are kept and retried this much later
+FREEZE_UNREADABLE_RETRY_SECONDS = int(os.getenv('FREEZE_UNREADABLE_RETRY_SECONDS', 3600))
 
 
 def get_record_snapshot(table_name, record_id):
     """Get a snapshot of a record's current data for later restoration."""
-    db = get_db()
-    row = db.execute(f"SELECT * FROM {table_name} WHERE id = ?", (record_id,)).fetchone()
+    db = get_db(table_name)
+    row = db.execute(MODULES_BY_TABLE[table_name].select_by_id_sql, (record_id,)).fetchone()
     db.close()
     if not row:
         return None
     data = dict(row)
     # Remove internal columns
-    for key in ['id', 'is_frozen', 'created_by_user', 'created_by_key', 'created_at', 'updated_at']:
+    for key in INTERNAL_COLUMNS:
         data.pop(key, None)
     return data
 
 
-def freeze_cleanup():
+# ============ LEADER ELECTION ============
+class StateLease:
+    """Leader lease in the shared state backend (every worker on the host with sqlite, every node with redis).
+
+    One integer, (holder token << 32) | last heartbeat epoch, stored with a
+    ttl of FREEZE_LEASE_SECONDS. The holder renews it; anyone may take it
+    once it has expired.
     """
-    Background cleanup task — runs every 60 seconds.
-    Reverts expired user modifications:
-    - Deletes user-created records (POST) after 2h
-    - Reverts user-modified records (PUT) after 1h
-    - Restores user-deleted records (DELETE) after 1h
+    kind = 'state'
+
+    def __init__(self, key='freeze:leader', ttl=FREEZE_LEASE_SECONDS):
+        self.key = key
+        self.ttl = ttl
+        self._token = None
+        self._pid = None
+
+    def token(self):
+        # Per process: a forked worker must not inherit its parent's claim
+        if self._pid != os.getpid():
+            self._token, self._pid = secrets.randbits(30) or 1, os.getpid()
+        return self._token
+
+    def acquire(self):
+        """Take the lease if it is free, renew it if it is ours. True while this process holds it."""
+        token, now = self.token(), int(time.time())
+
+        def step(value):
+            if value is None or value >> 32 == token:
+                return (token << 32) | now, True
+            return None, False
+        return get_state().update(self.key, step, ttl=self.ttl)
+
+    def release(self):
+        # Check-then-delete: at worst this drops a lease someone took in between, who renews it
+        state = get_state()
+        value = state.get(self.key)
+        if value is not None and value >> 32 == self.token():
+            state.delete(self.key)
+
+    def status(self):
+        value = get_state().get(self.key)
+        if value is None:
+            return None
+        return {'holder': value >> 32, 'heartbeat_age_s': int(time.time()) - (value & 0xffffffff)}
+
+
+class FileLease:
+    """flock on a file next to the database, for backends that are not shared (one host only).
+
+    The kernel drops the lock when the holder dies; the holder writes its pid
+    into the file and touches it on every heartbeat.
     """
-    while True:
+    kind = 'file'
+
+    def __init__(self, path=None, ttl=FREEZE_LEASE_SECONDS):
+        self.path = path or shard_path('main') + '.freeze-leader'
+        self.ttl = ttl
+        self._fd = None
+        self._pid = None
+
+    def acquire(self):
+        if self._fd is not None and self._pid == os.getpid():
+            os.utime(self.path)
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd, self._pid = fd, os.getpid()
+        return True
+
+    def release(self):
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+            self._fd = None
+
+    def status(self):
+        try:
+            with open(self.path) as f:
+                holder = int(f.read() or 0)
+            age = int(time.time() - os.path.getmtime(self.path))
+        except (OSError, ValueError):
+            return None
+        # Nobody touched it for a whole lease: the holder is gone and no candidate took over
+        return {'holder': holder, 'heartbeat_age_s': age} if age <= self.ttl else None
+
+
+# ============ EXPIRY SCHEDULER ============
+class FreezeScheduler:
+    """Min-heap of (due epoch, shard). The daemon sleeps until the earliest one.
+
+    Fed in-process by schedule() from track_modification. A cheap reconcile
+    (MIN(expires_at) per shard, on the expires_at index) every
+    FREEZE_RECONCILE_SECONDS picks up entries written by other processes.
+    Entries live an hour or more, so a reconcile finds them long before they
+    are due. After each revert the shard's next expiry is read and queued.
+
+    Every worker runs a candidate that heartbeats the leader lease every
+    third of its ttl; only the holder keeps a heap and reverts. A new leader
+    reconciles at once, so failover takes at most a lease plus a heartbeat.
+    """
+
+    def __init__(self, reconcile_every=FREEZE_RECONCILE_SECONDS):
+        self.reconcile_every = reconcile_every
+        self.lease = None
+        self.leading = False
+        self._heap = []
+        self._queued = {}  # shard -> earliest due time in the heap
+        self._next_reconcile = 0
+        self._cond = threading.Condition()
+        self._pid = None
+        self.stats = {'runs': 0, 'reconciles': 0, 'errors': 0, 'last_run_at': None, 'last_lag_ms': 0, 'max_lag_ms': 0,
+                      'elections_won': 0, 'lease_errors': 0}
+
+    def schedule(self, shard, due):
+        # Only the leader keeps a heap; other processes are covered by its reconcile
+        if self._pid != os.getpid() or not self.leading:
+            return
+        with self._cond:
+            if due < self._queued.get(shard, float('inf')):
+                self._queued[shard] = due
+                heapq.heappush(self._heap, (due, shard))
+                self._cond.notify()
+
+    def reconcile(self):
+        for shard in shards_with('user_modifications'):
+            due = next_expiry(shard)
+            if due is not None:
+                self.schedule(shard, due)
+        self.stats['reconciles'] += 1
+
+    def _set_leading(self, leading):
+        with self._cond:
+            if leading == self.leading:
+                return
+            self.leading = leading
+            self._heap, self._queued = [], {}
+            self._next_reconcile = 0
+            self._cond.notify()
+        if leading:
+            self.stats['elections_won'] += 1
+            print(f"[Deep Freeze] 👑 Worker {os.getpid()} is now the revert leader ({self.lease.kind} lease)")
+        else:
+            print(f"[Deep Freeze] Worker {os.getpid()} lost the revert lease")
+
+    def campaign(self):
+        """Candidate loop: take or renew the lease every third of its ttl."""
+        while True:
+            try:
+                leading = self.lease.acquire()
+            except Exception as e:
+                # Cannot prove we still hold it: stand down rather than risk two leaders
+                self.stats['lease_errors'] += 1
+                print(f"[Deep Freeze] Leader lease error: {e}")
+                leading = False
+            self._set_leading(leading)
+            time.sleep(self.lease.ttl / 3)
+
+    def _due_shards(self):
+        """Block until this worker leads and something is due; returns the shards to revert."""
+        with self._cond:
+            while True:
+                now = time.time()
+                if not self.leading:
+                    self._cond.wait()
+                    continue
+                wake = min(self._heap[0][0] if self._heap else float('inf'), self._next_reconcile)
+                if wake <= now:
+                    break
+                self._cond.wait(wake - now)
+            due = {}
+            while self._heap and self._heap[0][0] <= now:
+                at, shard = heapq.heappop(self._heap)
+                due.setdefault(shard, at)
+                if self._queued.get(shard) == at:
+                    del self._queued[shard]
+            return due
+
+    def run(self):
+        while True:
+            due = self._due_shards()
+            if time.time() >= self._next_reconcile:
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    print(f"[Deep Freeze] Reconcile error: {e}")
+                self._next_reconcile = time.time() + self.reconcile_every
+            for shard, at in due.items():
+                if not self.leading:
+                    break
+                self._revert(shard, at)
+
+    def start(self):
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        self.leading = False
+        self.lease = StateLease() if get_state().shared else FileLease()
+        threading.Thread(target=self.campaign, daemon=True, name='deep-freeze-leader').start()
+        threading.Thread(target=self.run, daemon=True, name='deep-freeze-daemon').start()
+        atexit.register(self.stop)
+        return True
+
+    def stop(self):
+        # Hand the lease over now instead of making the next leader wait out the ttl
+        if self._pid == os.getpid() and self.leading:
+            try:
+                self.lease.release()
+            except Exception:
+                pass
+
+    def _revert(self, shard, at):
+        started = time.time()
         try:
-            db = get_db()
             now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            _, complete = revert_expired(shard, now)
+            complete = purge_overlays(shard, now) and complete
+            # A backlog cut short resumes after the other due shards have had their turn
+            due = next_expiry(shard) if complete else time.time() + FREEZE_REVERT_PAUSE_MS / 1000.0
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[Deep Freeze] Cleanup error ({shard}): {e}")
+            due = time.time() + 5  # retry shortly
+        if due is not None:
+            self.schedule(shard, due)
+        lag = round((started - at) * 1000, 1)
+        self.stats.update(runs=self.stats['runs'] + 1, last_lag_ms=lag,
+                          max_lag_ms=max(self.stats['max_lag_ms'], lag),
+                          last_run_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
 
-            # Get all expired modifications
-            expired = db.execute(
-                "SELECT * FROM user_modifications WHERE expires_at <= ?",
-                (now,)
-            ).fetchall()
+    def metrics(self):
+        with self._cond:
+            next_due = self._heap[0][0] if self._heap else None
+            queued = len(self._heap)
+        return dict(self.stats, running=self._pid == os.getpid(), leader=self.leading and self._pid == os.getpid(),
+                    lease=self.lease.kind if self.lease else None, queued=queued,
+                    next_due_in_s=round(next_due - time.time(), 1) if next_due is not None else None,
+                    reconcile_every_s=self.reconcile_every)
+
+
+def next_expiry(shard):
+    """Epoch seconds of the earliest pending modification or overlay row in `shard`, or None."""
+    sources = ["SELECT MIN(expires_at) AS e FROM user_modifications"]
+    sources += [f"SELECT MIN(expires_at) FROM {overlay_table(t)}" for t in overlay_tables(shard)]
+    db = get_db(shard=shard)
+    try:
+        row = db.execute(f"SELECT MIN(e) FROM ({' UNION ALL '.join(sources)})").fetchone()
+    finally:
+        db.close()
+    if not row or row[0] is None:
+        return None
+    return calendar.timegm(datetime.strptime(row[0][:19], '%Y-%m-%d %H:%M:%S').timetuple())
+
+
+_scheduler = FreezeScheduler()
+
+
+def schedule_revert(table_name, expires):
+    """Tell the daemon about a modification of `table_name` that expires at `expires` (naive UTC datetime)."""
+    _scheduler.schedule(shard_for(table_name), calendar.timegm(expires.timetuple()))
 
-            for mod in expired:
-                table = mod['table_name']
-                record_id = mod['record_id']
-                action = mod['action']
-
-                if action == 'create':
-                    # Delete user-created record
-                    db.execute(f"DELETE FROM {table} WHERE id = ? AND is_frozen = 0", (record_id,))
-
-                elif action == 'update':
-                    # Revert to original data
-                    if mod['original_data']:
-                        original = json.loads(mod['original_data'])
-                        cols = TABLE_COLUMNS.get(table, [])
-                        set_parts = []
-                        values = []
-                        for col in cols:
-                            if col in original:
-                                set_parts.append(f"{col} = ?")
-                                values.append(original[col])
-                        if set_parts:
-                            values.append(record_id)
-                            db.execute(
-                                f"UPDATE {table} SET {', '.join(set_parts)} WHERE id = ?",
-                                values
-                            )
-
-                elif action == 'delete':
-                    # Restore deleted frozen record
-                    if mod['original_data']:
-                        original = json.loads(mod['original_data'])
-                        cols = TABLE_COLUMNS.get(table, [])
-                        available_cols = [c for c in cols if c in original]
-                        placeholders = ', '.join(['?'] * (len(available_cols) + 2))
-                        col_names = ', '.join(available_cols + ['id', 'is_frozen'])
-                        values = [original[c] for c in available_cols] + [record_id, 1]
-                        # Only restore if not already existing
-                        exists = db.execute(f"SELECT id FROM {table} WHERE id = ?", (record_id,)).fetchone()
-                        if not exists:
-                            db.execute(
-                                f"INSERT OR IGNORE INTO {table} ({col_names}) VALUES ({placeholders})",
-                                values
-                            )
-
-                # Remove the processed modification
-                db.execute("DELETE FROM user_modifications WHERE id = ?", (mod['id'],))
 
+# ============ REVERT ENGINE ============
+# Restores run before update reverts, and those before deleting user-created rows:
+# the reverse of the order a record's own modifications can have been made in
+REVERT_PHASES = {'delete': 0, 'update': 1, 'create': 2}
+
+_revert_stats = {'reverted': 0, 'purged': 0, 'batches': 0, 'batch_ms_total': 0.0, 'last_batch_ms': 0, 'max_batch_ms': 0,
+                 'last_batch_rows': 0, 'cut_short': 0, 'unreadable': 0}
+
+
+def _revert_statements(mods, kept):
+    """
+    [(sql, [params, ...]), ...] for one page of modifications (newest first), same SQL coalesced.
+    Ids of entries whose snapshot cannot be decoded are appended to `kept`: they must not be deleted.
+    """
+    ops = []
+    for mod in mods:
+        module = MODULES_BY_TABLE.get(mod['table_name'])
+        action = mod['action']
+        if module is None or action not in REVERT_PHASES:
+            print(f"[Deep Freeze] Cannot revert {action!r} on {mod['table_name']!r}, dropping modification {mod['id']}")
+            continue
+        if action == 'create':
+            # Delete user-created record
+            ops.append((REVERT_PHASES[action], module.delete_user_created_sql, (mod['record_id'],)))
+            continue
+        if not mod['original_data']:
+            continue
+        try:
+            original = decode_snapshot(module, mod['original_data'])
+        except SnapshotUnreadable as e:
+            print(f"[Deep Freeze] Cannot decode modification {mod['id']} of {mod['table_name']} ({e}), keeping it")
+            kept.append(mod['id'])
+            continue
+        cols = module.snapshot_columns(original)
+        if not cols:
+            continue
+        values = [original[c] for c in cols] + [mod['record_id']]
+        if action == 'update':
+            # Revert to original data
+            ops.append((REVERT_PHASES[action], module.update_for(cols), values))
+        else:
+            # Re-create the deleted record as it was (INSERT OR IGNORE: never over a live row)
+            ops.append((REVERT_PHASES[action], module.restore_for(cols), values + [original.get('is_frozen', 1)]))
+    # Stable sort keeps newest-first order within a phase, so a record's oldest snapshot is applied last
+    ops.sort(key=lambda op: op[0])
+    statements = []
+    for _, sql, params in ops:
+        if statements and statements[-1][0] == sql:
+            statements[-1][1].append(params)
+        else:
+            statements.append((sql, [params]))
+    return statements
+
+
+def revert_expired(shard, now, batch_size=None, max_seconds=None):
+    """
+    Revert every modification in `shard` that expired before `now`, newest first.
+    Pages of FREEZE_REVERT_BATCH entries are applied with executemany, one short
+    write transaction each, with a pause in between so request writers get the
+    lock. Returns (reverted, complete); complete is False when max_seconds ran out.
+    """
+    batch_size = batch_size or FREEZE_REVERT_BATCH
+    deadline = time.time() + (max_seconds or FREEZE_REVERT_MAX_RUN_SECONDS)
+    pause = FREEZE_REVERT_PAUSE_MS / 1000.0
+    reverted = 0
+    before = None  # keyset cursor: lowest id handled so far
+    db = get_db(shard=shard)
+    try:
+        while True:
+            started = time.perf_counter()
+            db.execute("BEGIN IMMEDIATE")
+            mods = db.execute(
+                "SELECT id, table_name, record_id, action, original_data FROM user_modifications "
+                "WHERE expires_at <= ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (now, before if before is not None else 1 << 62, batch_size)
+            ).fetchall()
+            if not mods:
+                db.rollback()
+                return reverted, True
+            kept = []
+            for sql, params in _revert_statements(mods, kept):
+                db.executemany(sql, params)
+            # Remove the processed modifications; undecodable ones wait for a retry instead
+            db.executemany("DELETE FROM user_modifications WHERE id = ?", [(m['id'],) for m in mods if m['id'] not in kept])
+            if kept:
+                retry = (datetime.utcnow() + timedelta(seconds=FREEZE_UNREADABLE_RETRY_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+                db.executemany("UPDATE user_modifications SET expires_at = ? WHERE id = ?", [(retry, i) for i in kept])
+                _revert_stats['unreadable'] += len(kept)
             db.commit()
-            db.close()
-        except Exception as e:
-            print(f"[Deep Freeze] Cleanup error: {e}")
+            elapsed = round((time.perf_counter() - started) * 1000, 2)
+            before = mods[-1]['id']
+            reverted += len(mods) - len(kept)
+            _revert_stats['reverted'] += len(mods) - len(kept)
+            _revert_stats['batches'] += 1
+            _revert_stats['batch_ms_total'] += elapsed
+            _revert_stats.update(last_batch_ms=elapsed, last_batch_rows=len(mods),
+                                 max_batch_ms=max(_revert_stats['max_batch_ms'], elapsed))
+            if len(mods) < batch_size:
+                return reverted, True
+            if time.time() >= deadline:
+                _revert_stats['cut_short'] += 1
+                return reverted, False
+            time.sleep(pause)
+    finally:
+        # An error leaves the transaction open; releasing the lease rolls it back
+        db.close()
+
+
+def purge_overlays(shard, now, batch_size=None, max_seconds=None):
+    """Range-delete expired overlay rows in `shard`, a batch per transaction. False when max_seconds ran out."""
+    batch_size = batch_size or FREEZE_REVERT_BATCH
+    deadline = time.time() + (max_seconds or FREEZE_REVERT_MAX_RUN_SECONDS)
+    db = get_db(shard=shard)
+    try:
+        for table in overlay_tables(shard):
+            while True:
+                started = time.perf_counter()
+                deleted = purge_expired(db, table, now, batch_size)
+                if not deleted:
+                    break
+                elapsed = round((time.perf_counter() - started) * 1000, 2)
+                _revert_stats['purged'] += deleted
+                _revert_stats['batches'] += 1
+                _revert_stats['batch_ms_total'] += elapsed
+                _revert_stats.update(last_batch_ms=elapsed, last_batch_rows=deleted,
+                                     max_batch_ms=max(_revert_stats['max_batch_ms'], elapsed))
+                if deleted < batch_size:
+                    break
+                if time.time() >= deadline:
+                    _revert_stats['cut_short'] += 1
+                    return False
+                time.sleep(FREEZE_REVERT_PAUSE_MS / 1000.0)
+        return True
+    finally:
+        db.close()
 
-        time.sleep(60)  # Run every 60 seconds
+
+def revert_stats():
+    batches = _revert_stats['batches']
+    return dict(_revert_stats, batch_ms_total=round(_revert_stats['batch_ms_total'], 1),
+                avg_batch_ms=round(_revert_stats['batch_ms_total'] / batches, 2) if batches else 0,
+                batch_size=FREEZE_REVERT_BATCH, pause_ms=FREEZE_REVERT_PAUSE_MS)
 
 
 def start_freeze_daemon():
-    """Start the deep freeze cleanup as a background daemon thread."""
-    thread = threading.Thread(target=freeze_cleanup, daemon=True, name='deep-freeze-daemon')
-    thread.start()
-    print("[Deep Freeze] 🧊 Cleanup daemon started (checks every 60s)")
-    return thread
+    """Start this process's leader candidate and scheduler (once per process; FREEZE_DAEMON=off: never)."""
+    if FREEZE_DAEMON == 'off' or not _scheduler.start():
+        return None
+    print(f"[Deep Freeze] 🧊 Cleanup daemon candidate started in {os.getpid()} "
+          f"(expiry heap, reconcile every {FREEZE_RECONCILE_SECONDS:g}s, {_scheduler.lease.kind} lease)")
+    return _scheduler
+
+
+def pending_lag():
+    """Seconds the oldest expired-but-unreverted modification has been waiting (0 when none)."""
+    due = [d for d in (next_expiry(shard) for shard in shards_with('user_modifications')) if d is not None]
+    return max(0, int(time.time() - min(due))) if due else 0
+
+
+def freeze_health():
+    """Leader heartbeat and revert lag, answerable by any worker."""
+    lease = _scheduler.lease or (StateLease() if get_state().shared else FileLease())
+    try:
+        leader = lease.status()
+    except Exception as e:
+        leader = None
+        print(f"[Deep Freeze] Leader lease unreadable: {e}")
+    lag = pending_lag()
+    healthy = leader is not None and lag <= FREEZE_MAX_LAG_SECONDS
+    return {
+        'status': 'healthy' if healthy else 'unhealthy',
+        'leader': leader,
+        'lease': lease.kind,
+        'lease_seconds': lease.ttl,
+        'lag_seconds': lag,
+        'max_lag_seconds': FREEZE_MAX_LAG_SECONDS,
+        'this_worker': {'pid': os.getpid(), 'leader': _scheduler.leading and _scheduler._pid == os.getpid()},
+    }
+
+
+def freeze_stats():
+    return dict(_scheduler.metrics(), revert=revert_stats())
 
 
 def get_freeze_info():
     """Get stats about pending modifications."""
-    db = get_db()
-    stats = {
-        'pending_creates': db.execute("SELECT COUNT(*) FROM user_modifications WHERE action='create'").fetchone()[0],
-        'pending_updates': db.execute("SELECT COUNT(*) FROM user_modifications WHERE action='update'").fetchone()[0],
-        'pending_deletes': db.execute("SELECT COUNT(*) FROM user_modifications WHERE action='delete'").fetchone()[0],
-    }
-    db.close()
+    stats = {'pending_creates': 0, 'pending_updates': 0, 'pending_deletes': 0}
+    for shard in shards_with('user_modifications'):
+        db = get_db(shard=shard)
+        for row in db.execute("SELECT action, COUNT(*) FROM user_modifications GROUP BY action").fetchall():
+            key = f'pending_{row[0]}s'
+            if key in stats:
+                stats[key] += row[1]
+        db.close()
     stats['total_pending'] = sum(stats.values())
     return stats
+
+
+def count_pending_modifications():
+    """Modifications not yet due for revert, across every shard."""
+    total = 0
+    for shard in shards_with('user_modifications'):
+        db = get_db(shard=shard)
+        total += db.execute("SELECT COUNT(*) FROM user_modifications WHERE expires_at > datetime('now')").fetchone()[0]
+        db.close()
+    return total
@@ -0,0 +1,30 @@
+"""
+HTTP Playground v3.0 — Gunicorn hooks
+start.sh runs gevent workers with --preload, so app.py is imported once in
+the master and the workers are forked from it:
+
+- gevent is patched here, before that import, so the locks and conditions
+  the modules create at import time are gevent-aware in every worker.
+- Threads started in the master are not carried into the workers, so the
+  Deep Freeze and retention daemons are started in each worker once it has
+  initialised; the workers elect one leader for each (see freeze.py,
+  retention.py).
+"""
+import os
+
+try:
+    from gevent import monkey
+    monkey.patch_all()
+except ImportError:
+    pass
+
+# Read by freeze.py and retention.py when app.py is imported: leave the daemons to post_worker_init
+os.environ.setdefault('FREEZE_DAEMON', 'worker')
+os.environ.setdefault('RETENTION_DAEMON', 'worker')
+
+
+def post_worker_init(worker):
+    from freeze import start_freeze_daemon
+    from retention import start_retention_daemon
+    start_freeze_daemon()
+    start_retention_daemon()
@@ -0,0 +1,168 @@
+"""
+HTTP Playground v3.0 — Password Hashing Pool
+PBKDF2 runs 100k+ SHA-256 rounds per call. Done inline it holds a gevent
+worker's event loop (every connection on it) for the whole hash, so it is
+handed to a pool instead:
+
+- HASH_POOL=thread (default): native OS threads. hashlib releases the GIL
+  while it hashes, so these run in parallel with the event loop. Under
+  gevent monkey-patching a gevent.threadpool.ThreadPool is used, since
+  patched threading would only give greenlets.
+- HASH_POOL=process: a ProcessPoolExecutor, for sync workers or when the
+  GIL is the bottleneck.
+- HASH_POOL=inline: the old behaviour.
+
+At most HASH_QUEUE_SIZE hashes may be queued or running per worker; past
+that (or after HASH_TIMEOUT seconds) callers get HashPoolBusy and should
+answer 503 instead of piling up.
+
+Stored format is pbkdf2_sha256$<iterations>$<salt>$<hex>. The original
+"<salt>:<hex>" hashes (100,000 iterations) still verify, and needs_rehash()
+tells login when a hash is below the current HASH_ITERATIONS.
+"""
+import os
+import hmac
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+HASH_POOL = os.getenv('HASH_POOL', 'thread')
+HASH_POOL_SIZE = int(os.getenv('HASH_POOL_SIZE', os.cpu_count() or 2))
+HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', 64))
+HASH_TIMEOUT = float(os.getenv('HASH_TIMEOUT', 10))
+HASH_ITERATIONS = int(os.getenv('HASH_ITERATIONS', 100000))
+POOL_KINDS = ('thread', 'process', 'inline')
+
+SCHEME = 'pbkdf2_sha256'
+LEGACY_ITERATIONS = 100000
+
+
+class HashPoolBusy(Exception):
+    """HASH_QUEUE_SIZE hashes are already waiting (or one timed out); shed the request."""
+
+
+# ---------- pure functions (run inside the pool, so module-level for pickling) ----------
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+
+
+def _make_hash(password, iterations):
+    salt = secrets.token_hex(16)
+    return f"{SCHEME}${iterations}${salt}${_pbkdf2(password, salt, iterations)}"
+
+
+def parse_hash(stored):
+    """(iterations, salt, hex digest) of a stored hash, either format. Raises ValueError."""
+    if stored.startswith(SCHEME + '$'):
+        _, iterations, salt, hashed = stored.split('$')
+        return int(iterations), salt, hashed
+    salt, hashed = stored.split(':')
+    return LEGACY_ITERATIONS, salt, hashed
+
+
+def _check(password, stored):
+    try:
+        iterations, salt, hashed = parse_hash(stored)
+        return hmac.compare_digest(_pbkdf2(password, salt, iterations), hashed)
+    except Exception:
+        return False
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class HashPool:
+    def __init__(self, kind=HASH_POOL, size=HASH_POOL_SIZE, queue_size=HASH_QUEUE_SIZE, timeout=HASH_TIMEOUT):
+        self.kind = kind if kind in POOL_KINDS else 'thread'
+        self.size = max(1, size)
+        self.queue_size = max(1, queue_size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._gevent = False
+        self._pending = 0
+        self.stats = {'hashed': 0, 'verified': 0, 'rejected': 0, 'timeouts': 0, 'max_pending': 0}
+
+    def _ensure_started(self):
+        # One pool per process: gunicorn --preload forks after import
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = 0
+            self._gevent = False
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.size)
+            elif self.kind == 'thread' and _gevent_patched():
+                from gevent.threadpool import ThreadPool
+                self._executor = ThreadPool(self.size)
+                self._gevent = True
+            elif self.kind == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='hash-pool')
+            self._pid = os.getpid()
+
+    def run(self, fn, *args):
+        """fn(*args) on the pool; the calling greenlet/thread waits, the event loop does not."""
+        self._ensure_started()
+        if self._executor is None:
+            return fn(*args)
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self.stats['rejected'] += 1
+                raise HashPoolBusy('password hashing queue full')
+            self._pending += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], self._pending)
+        try:
+            if self._gevent:
+                import gevent
+                try:
+                    return self._executor.spawn(fn, *args).get(timeout=self.timeout)
+                except gevent.Timeout:
+                    raise TimeoutError
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            self.stats['timeouts'] += 1
+            raise HashPoolBusy('password hashing timed out')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def metrics(self):
+        return dict(self.stats, pool=self.kind, gevent=self._gevent, size=self.size,
+                    queue_size=self.queue_size, pending=self._pending if self._pid == os.getpid() else 0,
+                    iterations=HASH_ITERATIONS)
+
+
+_pool = HashPool()
+
+
+def hash_password(password, iterations=None):
+    digest = _pool.run(_make_hash, password, iterations or HASH_ITERATIONS)
+    _pool.stats['hashed'] += 1
+    return digest
+
+
+def verify_password(password, stored):
+    ok = _pool.run(_check, password, stored)
+    _pool.stats['verified'] += 1
+    return ok
+
+
+def needs_rehash(stored):
+    """True when a stored hash was made with other than the current HASH_ITERATIONS."""
+    try:
+        return parse_hash(stored)[0] != HASH_ITERATIONS
+    except ValueError:
+        return False
+
+
+def hashing_stats():
+    return _pool.metrics()
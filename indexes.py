@@ -0,0 +1,89 @@
+"""
+HTTP Playground v3.0 — Index Planner
+Derives secondary indexes from module filter metadata and keeps them in sync at startup
+"""
+import sqlite3
+from database import get_db, fingerprint, schema_state, mark_schema_state, SHARDS, shard_tables
+
+AUTO_PREFIX = 'idx_auto_'
+
+# Lookups on platform tables made by auth, lockout and Deep Freeze code paths
+STATIC_INDEXES = {
+    'user_modifications': [('expires_at',)],
+    'login_attempts': [('identifier', 'created_at')],
+    'api_keys': [('key', 'key_type'), ('user_id',)],
+}
+
+
+def index_name(table, cols):
+    return f"{AUTO_PREFIX}{table}_{'_'.join(cols)}"
+
+
+def plan_indexes(modules):
+    """
+    Build {index_name: (table, columns)} from compiled registry modules.
+    Each filter field gets a single-column index (SQLite appends the rowid, so
+    `WHERE f = ? ORDER BY id DESC` is an ordered index scan); declared
+    composite_filters get a multi-column index for combined filters.
+    """
+    plan = {}
+    for table, combos in STATIC_INDEXES.items():
+        for cols in combos:
+            plan[index_name(table, cols)] = (table, tuple(cols))
+    for module in modules:
+        table = module.table
+        for field in module.filter_fields:
+            plan[index_name(table, (field,))] = (table, (field,))
+        for cols in module.composite_filters:
+            plan[index_name(table, cols)] = (table, tuple(cols))
+    return plan
+
+
+def ensure_indexes(modules):
+    """
+    Idempotently create planned indexes and drop auto-indexes that are no longer
+    planned (e.g. a filter field was removed). Hand-made indexes are never touched.
+    Each shard file gets the indexes of the tables it holds.
+    """
+    plan = plan_indexes(modules)
+    plan_fp = fingerprint((sorted(plan.items()), SHARDS))
+    if schema_state('indexes')[1] == plan_fp:
+        return {'planned': len(plan), 'created': [], 'dropped': []}
+    created, dropped, skipped = [], [], []
+    for shard in SHARDS:
+        tables = shard_tables(shard)
+        conn = get_db(shard=shard)
+        existing = {
+            r['name']: r['tbl_name'] for r in conn.execute(
+                "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND name LIKE ?",
+                (AUTO_PREFIX + '%',)
+            ).fetchall()
+        }
+        wanted = {name: spec for name, spec in plan.items() if spec[0] in tables}
+        changed = False
+        for name, (table, cols) in wanted.items():
+            if name in existing:
+                continue
+            try:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})")
+                created.append(name)
+                changed = True
+            except sqlite3.OperationalError as e:
+                # Registered filter that does not exist as a column — leave the table unindexed
+                skipped.append(f'{name}: {e}')
+        for name in existing:
+            if name not in wanted:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+                dropped.append(name)
+                changed = True
+        if changed:
+            conn.execute("PRAGMA optimize")
+        conn.commit()
+        conn.close()
+    conn = get_db()
+    mark_schema_state(conn, 'indexes', fingerprint=plan_fp)
+    conn.commit()
+    conn.close()
+    for msg in skipped:
+        print(f"[Indexes] skipped {msg}")
+    return {'planned': len(plan), 'created': created, 'dropped': dropped}
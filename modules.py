@@ -4,12 +4,20 @@ HTTP Playground v3.0 — All 20 API Module Endpoints
 """
 import os
 import json
+import base64
 import bleach
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, g, send_from_directory
 from werkzeug.utils import secure_filename
 from auth import require_api_key, require_ai_key, get_current_user, STANDARD_KEY_LIMIT, AI_KEY_LIMIT
 from database import get_db
+from search import search_filter, ranked_join
+from counters import get_count
+from registry import CRUD_MODULES, MODULES_BY_TABLE
+from writer import WRITE_BATCH_ENABLED, WriteQueueFull, submit_write
+from freeze import schedule_revert
+from codec import encode_snapshot, changed_columns
+from overlay import OVERLAY_ENABLED, caller_owner, has_deltas, merged_view, count_delta, fetch, create_row, update_row, delete_row
 
 modules_bp = Blueprint('modules', __name__)
 
@@ -50,45 +58,141 @@ def validate_file_content(file_obj, ext):
     file_obj.seek(0)
     return any(header.startswith(sig) for sig in signatures)
 
-def track_modification(conn, table, record_id, action, original_data=None, hours=2):
-    """Track user modification for deep freeze auto-revert"""
-    user_key = g.get('api_key', request.remote_addr)
+def current_modifier():
+    """(user_key, user_id) of the caller, captured while the request context is alive"""
     user_id = None
     if hasattr(g, 'current_user') and g.current_user:
         user_id = g.current_user.get('id')
-    expires = datetime.utcnow() + timedelta(hours=hours)
+    return g.get('api_key', request.remote_addr), user_id
+
+def track_modification(conn, table, record_id, action, original_data=None, hours=2):
+    """Track user modification for deep freeze auto-revert"""
+    record_modification(conn, table, record_id, action, *current_modifier(), original_data=original_data, hours=hours)
+
+def record_modification(conn, table, record_id, action, user_key, user_id, original_data=None, hours=2):
+    """track_modification without the request context (used by the group-commit writer)"""
+    expires = (datetime.utcnow() + timedelta(hours=hours)).replace(microsecond=0)
+    original = encode_snapshot(MODULES_BY_TABLE[table], original_data) if original_data else None
+    # Same 'YYYY-MM-DD HH:MM:SS' format as CURRENT_TIMESTAMP, so expires_at compares as text
     conn.execute(
         "INSERT INTO user_modifications (table_name, record_id, action, original_data, user_key, user_id, expires_at) VALUES (?,?,?,?,?,?,?)",
-        (table, record_id, action, json.dumps(original_data) if original_data else None, user_key, user_id, expires.isoformat())
+        (table, record_id, action, original, user_key, user_id,
+         expires.strftime('%Y-%m-%d %H:%M:%S'))
     )
+    schedule_revert(table, expires)
+
+def encode_cursor(last_id, module):
+    """Opaque keyset cursor: the last id served, bound to the module it came from"""
+    raw = json.dumps({'v': 1, 'm': module, 'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, module):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data.get('v') != 1 or data.get('m') != module:
+            return None
+        return int(data['id'])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+def owner_view(conn, table):
+    """(WITH clause, params) to prepend to a query on `table` so it sees the caller's overlay; ('', []) when unchanged"""
+    if OVERLAY_ENABLED:
+        owner = caller_owner()
+        if has_deltas(conn, table, owner):
+            return merged_view(conn, table, owner)
+    return '', []
 
 def freeze_notice(action):
-    notices = {
-        'create': 'This record will be auto-deleted in 2 hours (Deep Freeze)',
-        'update': 'Changes will auto-revert in 1 hour (Deep Freeze)',
-        'delete': 'Record will be auto-restored in 1 hour (Deep Freeze)',
-    }
+    if OVERLAY_ENABLED:
+        notices = {
+            'create': 'Only you can see this record; it will be auto-deleted in 2 hours (Deep Freeze)',
+            'update': 'Only you see these changes; they will auto-revert in 1 hour (Deep Freeze)',
+            'delete': 'Hidden from you only; the record reappears in 1 hour (Deep Freeze)',
+            'remove': 'Your own record was permanently removed; it will not reappear (Deep Freeze)',
+        }
+    else:
+        notices = {
+            'create': 'This record will be auto-deleted in 2 hours (Deep Freeze)',
+            'update': 'Changes will auto-revert in 1 hour (Deep Freeze)',
+            'delete': 'Record will be auto-restored in 1 hour (Deep Freeze)',
+        }
     return notices.get(action, '')
 
 
 # ============ GENERIC CRUD FACTORY ============
-def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None):
-    """Factory function to create GET/POST/PUT/DELETE routes for a module"""
+SANITIZERS = {'text': sanitize_str, 'content': sanitize_content}
+
+def make_crud_routes(module):
+    """Factory function to create GET/POST/PUT/DELETE routes for a compiled registry module"""
+    name, table = module.name, module.table
+    search_fields, filter_fields = module.search_fields, module.filter_fields
+    # (field, required, sanitizer) compiled once; numbers pass through unsanitized
+    validators = [(f, required, SANITIZERS.get(kind)) for f, required, kind in module.validators]
+
+    def insert_row(conn, cols, vals, user_key, user_id):
+        """INSERT + deep freeze tracking + re-SELECT; the caller (or the writer) commits"""
+        new_id = conn.execute(module.insert_for(cols), vals).lastrowid
+        record_modification(conn, table, new_id, 'create', user_key, user_id, hours=2)
+        return dict(conn.execute(module.select_by_id_sql, (new_id,)).fetchone())
+
+    def insert_overlay_row(conn, cols, vals, owner):
+        """Overlay-mode create: the row lives in the caller's overlay only"""
+        row, expires = create_row(conn, table, owner, cols, vals, hours=2)
+        schedule_revert(table, expires)
+        return row
 
     # GET all + GET by id
     @modules_bp.route(f'/api/{name}', methods=['GET'], endpoint=f'get_{name}')
     def get_all():
-        conn = get_db()
-        query = f"SELECT * FROM {table}"
+        # Pagination: keyset (?cursor= / ?after_id= / ?paging=cursor) or legacy OFFSET (?page=)
+        page = request.args.get('page', type=int)
+        per_page = request.args.get('per_page', 50, type=int)
+        per_page = max(1, min(per_page, 100))
+        after_id = request.args.get('after_id', type=int)
+        cursor = request.args.get('cursor')
+        if cursor:
+            after_id = decode_cursor(cursor, name)
+            if after_id is None:
+                return jsonify({'error': 'Invalid cursor', 'hint': 'Pass next_cursor from the previous page unchanged'}), 400
+        # Opt-in only: ?per_page= alone keeps the plain response it always had
+        keyset = not page and (after_id is not None or 'cursor' in request.args or request.args.get('paging') == 'cursor')
+        if keyset and request.args.get('sort') == 'relevance':
+            return jsonify({'error': 'Cursor pagination is not supported with sort=relevance, use page instead'}), 400
+
+        conn = get_db(table)
+        query = module.select_all_sql
         params = []
         conditions = []
-
-        # Search
+        order_by = "id DESC"
+        ranked_search = False
+        # Overlay mode: callers with changes of their own read the table through a merged view
+        view = None
+        if OVERLAY_ENABLED:
+            owner = caller_owner()
+            if has_deltas(conn, table, owner):
+                view = merged_view(conn, table, owner)
+
+        # Search (FTS5 when available, LIKE scan otherwise)
         search = request.args.get('search', '').strip()
         if search and search_fields:
-            search_conditions = [f"{sf} LIKE ?" for sf in search_fields]
-            conditions.append(f"({' OR '.join(search_conditions)})")
-            params.extend([f"%{search}%" for _ in search_fields])
+            mode = request.args.get('search_mode', 'substring')
+            # The FTS index covers base rows only, so merged views search with LIKE
+            ranked = ranked_join(table, search, mode) if request.args.get('sort') == 'relevance' and not view else None
+            fts = None if ranked or view else search_filter(table, search, mode)
+            if ranked:
+                query += f" {ranked[0]}"
+                params.extend(ranked[1])
+                ranked_search = True
+                order_by = "_fts._score, id DESC"
+            elif fts:
+                conditions.append(fts[0])
+                params.extend(fts[1])
+            else:
+                search_conditions = [f"{sf} LIKE ?" for sf in search_fields]
+                conditions.append(f"({' OR '.join(search_conditions)})")
+                params.extend([f"%{search}%" for _ in search_fields])
 
         # Filters
         if filter_fields:
@@ -98,35 +202,68 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
                     conditions.append(f"{ff} = ?")
                     params.append(val)
 
+        # Totals: the maintained counter when unfiltered, COUNT(*) only on ?with_total=1
+        total = None
+        if not conditions and not ranked_search:
+            total = get_count(conn, table) + (count_delta(conn, table, owner) if view else 0)
+        elif request.args.get('with_total', '').lower() in ('1', 'true', 'yes'):
+            count_query = query.replace(module.select_all_sql, f"SELECT COUNT(*) FROM {table}", 1)
+            if conditions:
+                count_query += " WHERE " + " AND ".join(conditions)
+            if view:
+                total = conn.execute(view[0] + count_query, view[1] + params).fetchone()[0]
+            else:
+                total = conn.execute(count_query, params).fetchone()[0]
+
+        if keyset and after_id is not None:
+            conditions.append(f"{table}.id < ?")
+            params.append(after_id)
+
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        query += " ORDER BY id DESC"
+        query += f" ORDER BY {order_by}"
 
-        # Pagination
-        page = request.args.get('page', type=int)
-        per_page = request.args.get('per_page', 50, type=int)
-        per_page = min(per_page, 100)
-        if page:
-            offset = (page - 1) * per_page
+        if keyset:
+            # One extra row tells us whether another page exists
+            query += f" LIMIT {per_page + 1}"
+        elif page:
+            offset = (max(page, 1) - 1) * per_page
             query += f" LIMIT {per_page} OFFSET {offset}"
 
+        if view:
+            query, params = view[0] + query, view[1] + params
         rows = conn.execute(query, params).fetchall()
         data = [dict(r) for r in rows]
-        total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         conn.close()
 
-        return jsonify({
+        result = {
             'data': data,
             'count': len(data),
             'total': total,
             'module': name,
             'message': 'Success'
-        })
+        }
+        if keyset:
+            has_more = len(data) > per_page
+            data = result['data'] = data[:per_page]
+            result['count'] = len(data)
+            last_id = data[-1]['id'] if data else None
+            result['pagination'] = {
+                'mode': 'cursor',
+                'per_page': per_page,
+                'has_more': has_more,
+                'after_id': last_id if has_more else None,
+                'next_cursor': encode_cursor(last_id, name) if has_more else None,
+            }
+        return jsonify(result)
 
     @modules_bp.route(f'/api/{name}/<int:item_id>', methods=['GET'], endpoint=f'get_{name}_by_id')
     def get_by_id(item_id):
-        conn = get_db()
-        row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)).fetchone()
+        conn = get_db(table)
+        if OVERLAY_ENABLED:
+            row, _ = fetch(conn, table, caller_owner(), item_id)
+        else:
+            row = conn.execute(module.select_by_id_sql, (item_id,)).fetchone()
         conn.close()
         if not row:
             return jsonify({'error': f'{name.title()} not found', 'id': item_id}), 404
@@ -142,34 +279,38 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
         # Validate required fields
         cols = []
         vals = []
-        for field_name, field_info in fields.items():
+        for field_name, required, sanitize in validators:
             val = data.get(field_name)
-            if field_info.get('required') and not val:
+            if required and not val:
                 return jsonify({'error': f'{field_name} is required'}), 400
             if val is not None:
-                if field_info.get('type') in ('text', 'content'):
-                    val = sanitize_content(val) if field_info.get('type') == 'content' else sanitize_str(val)
+                if sanitize:
+                    val = sanitize(val)
                 cols.append(field_name)
                 vals.append(val)
 
         # Add user tracking
-        cols.extend(['created_by_user', 'created_by_key'])
-        vals.extend([1, g.get('api_key', request.remote_addr)])
-
-        placeholders = ','.join(['?' for _ in vals])
-        col_names = ','.join(cols)
-
-        conn = get_db()
-        cursor = conn.execute(f"INSERT INTO {table} ({col_names}) VALUES ({placeholders})", vals)
-        new_id = cursor.lastrowid
-        track_modification(conn, table, new_id, 'create', hours=2)
-        conn.commit()
-        row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (new_id,)).fetchone()
-        conn.close()
+        user_key, user_id = current_modifier()
+        vals.extend([1, user_key])
+
+        if OVERLAY_ENABLED:
+            write, args = insert_overlay_row, (cols, vals, caller_owner())
+        else:
+            write, args = insert_row, (cols, vals, user_key, user_id)
+        if WRITE_BATCH_ENABLED:
+            try:
+                row = submit_write(table, write, *args)
+            except (WriteQueueFull, TimeoutError) as e:
+                return jsonify({'error': 'Server busy, please retry', 'detail': str(e)}), 503
+        else:
+            conn = get_db(table)
+            row = write(conn, *args)
+            conn.commit()
+            conn.close()
 
         return jsonify({
             'message': f'{name.title()} created successfully',
-            'data': dict(row),
+            'data': row,
             'deep_freeze': {'notice': freeze_notice('create'), 'expires_in': '2 hours'}
         }), 201
 
@@ -177,8 +318,12 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
     @modules_bp.route(f'/api/{name}/<int:item_id>', methods=['PUT'], endpoint=f'update_{name}')
     @require_api_key
     def update(item_id):
-        conn = get_db()
-        existing = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)).fetchone()
+        conn = get_db(table)
+        owner = caller_owner() if OVERLAY_ENABLED else None
+        if owner:
+            existing, op = fetch(conn, table, owner, item_id)
+        else:
+            existing = conn.execute(module.select_by_id_sql, (item_id,)).fetchone()
         if not existing:
             conn.close()
             return jsonify({'error': f'{name.title()} not found'}), 404
@@ -188,33 +333,40 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
             conn.close()
             return jsonify({'error': 'JSON body required'}), 400
 
-        # Save original for freeze revert
-        original = dict(existing)
-
         updates = []
         vals = []
-        for field_name in fields:
+        for field_name, _, sanitize in validators:
             if field_name in data:
                 val = data[field_name]
                 if isinstance(val, str):
-                    val = sanitize_str(val)
-                updates.append(f"{field_name} = ?")
+                    val = (sanitize or sanitize_str)(val)
+                updates.append(field_name)
                 vals.append(val)
 
         if not updates:
             conn.close()
             return jsonify({'error': 'No valid fields to update'}), 400
 
-        vals.append(item_id)
-        conn.execute(f"UPDATE {table} SET {', '.join(updates)} WHERE id = ?", vals)
-        track_modification(conn, table, item_id, 'update', original_data=original, hours=1)
-        conn.commit()
-        row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)).fetchone()
-        conn.close()
+        if owner:
+            row, expires = update_row(conn, table, owner, existing, op, dict(zip(updates, vals)), hours=1)
+            conn.commit()
+            conn.close()
+            if expires:
+                schedule_revert(table, expires)
+        else:
+            # Save the old values of the columns this PUT changes, for freeze revert
+            original = changed_columns(existing, dict(zip(updates, vals)))
+            vals.append(item_id)
+            conn.execute(module.update_for(updates), vals)
+            if original:
+                track_modification(conn, table, item_id, 'update', original_data=original, hours=1)
+            conn.commit()
+            row = dict(conn.execute(module.select_by_id_sql, (item_id,)).fetchone())
+            conn.close()
 
         return jsonify({
             'message': f'{name.title()} updated successfully',
-            'data': dict(row),
+            'data': row,
             'deep_freeze': {'notice': freeze_notice('update'), 'reverts_in': '1 hour'}
         })
 
@@ -222,8 +374,12 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
     @modules_bp.route(f'/api/{name}/<int:item_id>', methods=['DELETE'], endpoint=f'delete_{name}')
     @require_api_key
     def delete(item_id):
-        conn = get_db()
-        existing = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)).fetchone()
+        conn = get_db(table)
+        owner = caller_owner() if OVERLAY_ENABLED else None
+        if owner:
+            existing, op = fetch(conn, table, owner, item_id)
+        else:
+            existing = conn.execute(module.select_by_id_sql, (item_id,)).fetchone()
         if not existing:
             conn.close()
             return jsonify({'error': f'{name.title()} not found'}), 404
@@ -233,244 +389,115 @@ def make_crud_routes(name, table, fields, search_fields=None, filter_fields=None
             conn.close()
             return jsonify({'error': 'Cannot delete frozen baseline data', 'is_frozen': True}), 403
 
-        conn.execute(f"DELETE FROM {table} WHERE id = ?", (item_id,))
-        track_modification(conn, table, item_id, 'delete', original_data=existing_data, hours=1)
-        conn.commit()
-        conn.close()
+        deep_freeze = {'notice': freeze_notice('delete'), 'restores_in': '1 hour'}
+        if owner:
+            expires = delete_row(conn, table, owner, existing_data, op, hours=1)
+            conn.commit()
+            conn.close()
+            if expires:
+                schedule_revert(table, expires)
+            else:
+                # A record they created themselves: dropped for good, nothing to restore
+                deep_freeze = {'notice': freeze_notice('remove')}
+        else:
+            conn.execute(module.delete_by_id_sql, (item_id,))
+            track_modification(conn, table, item_id, 'delete', original_data=existing_data, hours=1)
+            conn.commit()
+            conn.close()
 
         return jsonify({
             'message': f'{name.title()} deleted',
             'id': item_id,
-            'deep_freeze': {'notice': freeze_notice('delete'), 'restores_in': '1 hour'}
+            'deep_freeze': deep_freeze
         })
 
 
 # ================================================================
-# REGISTER ALL 20 MODULES
+# REGISTER ALL 20 MODULES (declared in registry.py)
 # ================================================================
+for _module in CRUD_MODULES:
+    make_crud_routes(_module)
 
-# 1. Books
-make_crud_routes('books', 'books',
-    fields={'title': {'type': 'text', 'required': True}, 'author': {'type': 'text', 'required': True},
-            'isbn': {'type': 'text'}, 'genre': {'type': 'text'}, 'year': {'type': 'number'}, 'available': {'type': 'number'}},
-    search_fields=['title', 'author', 'isbn'],
-    filter_fields=['genre', 'year', 'available']
-)
-
-# 2. Menu
-make_crud_routes('menu', 'menu_items',
-    fields={'name': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
-            'price': {'type': 'number', 'required': True}, 'category': {'type': 'text'}, 'is_available': {'type': 'number'}},
-    search_fields=['name', 'description'],
-    filter_fields=['category', 'is_available']
-)
-
-# 3. Tasks
-make_crud_routes('tasks', 'tasks',
-    fields={'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
-            'status': {'type': 'text'}, 'priority': {'type': 'text'}, 'due_date': {'type': 'text'}, 'assigned_to': {'type': 'text'}},
-    search_fields=['title', 'description', 'assigned_to'],
-    filter_fields=['status', 'priority', 'assigned_to']
-)
-
-# 4. Students
-make_crud_routes('students', 'students',
-    fields={'name': {'type': 'text', 'required': True}, 'email': {'type': 'text'},
-            'student_id': {'type': 'text'}, 'major': {'type': 'text'}, 'gpa': {'type': 'number'}, 'enrollment_year': {'type': 'number'}},
-    search_fields=['name', 'email', 'student_id'],
-    filter_fields=['major', 'enrollment_year']
-)
-
-# 5. Notes
-make_crud_routes('notes', 'notes',
-    fields={'title': {'type': 'text', 'required': True}, 'content': {'type': 'content'},
-            'category': {'type': 'text'}, 'is_pinned': {'type': 'number'}},
-    search_fields=['title', 'content'],
-    filter_fields=['category', 'is_pinned']
-)
-
-# 6. Blog
-make_crud_routes('blog', 'blog_posts',
-    fields={'title': {'type': 'text', 'required': True}, 'content': {'type': 'content', 'required': True},
-            'author': {'type': 'text'}, 'tags': {'type': 'text'}, 'is_published': {'type': 'number'}},
-    search_fields=['title', 'content', 'author', 'tags'],
-    filter_fields=['author', 'is_published']
-)
-
-# 7. Inventory
-make_crud_routes('inventory', 'inventory',
-    fields={'name': {'type': 'text', 'required': True}, 'sku': {'type': 'text'},
-            'quantity': {'type': 'number'}, 'price': {'type': 'number'}, 'category': {'type': 'text'}, 'warehouse': {'type': 'text'}},
-    search_fields=['name', 'sku'],
-    filter_fields=['category', 'warehouse']
-)
-
+# Extra routes read through owner_view: in FREEZE_MODE=overlay they see the caller's own changes too
 # Extra inventory route: low stock
 @modules_bp.route('/api/inventory/low-stock', methods=['GET'])
 def inventory_low_stock():
     threshold = request.args.get('threshold', 20, type=int)
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM inventory WHERE quantity <= ? ORDER BY quantity ASC", (threshold,)).fetchall()
+    conn = get_db('inventory')
+    view, params = owner_view(conn, 'inventory')
+    rows = conn.execute(view + "SELECT * FROM inventory WHERE quantity <= ? ORDER BY quantity ASC",
+                        params + [threshold]).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows), 'threshold': threshold})
 
-# 8. Products
-make_crud_routes('products', 'products',
-    fields={'name': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
-            'price': {'type': 'number', 'required': True}, 'category': {'type': 'text'}, 'brand': {'type': 'text'},
-            'rating': {'type': 'number'}, 'stock': {'type': 'number'}, 'image_url': {'type': 'text'}},
-    search_fields=['name', 'description', 'brand'],
-    filter_fields=['category', 'brand']
-)
-
 # Extra products route: top rated
 @modules_bp.route('/api/products/top-rated', methods=['GET'])
 def products_top_rated():
     limit = request.args.get('limit', 5, type=int)
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM products ORDER BY rating DESC LIMIT ?", (min(limit, 20),)).fetchall()
+    conn = get_db('products')
+    view, params = owner_view(conn, 'products')
+    rows = conn.execute(view + "SELECT * FROM products ORDER BY rating DESC LIMIT ?", params + [min(limit, 20)]).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
-# 9. Movies
-make_crud_routes('movies', 'movies',
-    fields={'title': {'type': 'text', 'required': True}, 'director': {'type': 'text'},
-            'genre': {'type': 'text'}, 'year': {'type': 'number'}, 'rating': {'type': 'number'},
-            'runtime': {'type': 'number'}, 'language': {'type': 'text'}},
-    search_fields=['title', 'director'],
-    filter_fields=['genre', 'year', 'language']
-)
-
 # Extra movies route: top rated
 @modules_bp.route('/api/movies/top-rated', methods=['GET'])
 def movies_top_rated():
     limit = request.args.get('limit', 5, type=int)
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM movies ORDER BY rating DESC LIMIT ?", (min(limit, 20),)).fetchall()
+    conn = get_db('movies')
+    view, params = owner_view(conn, 'movies')
+    rows = conn.execute(view + "SELECT * FROM movies ORDER BY rating DESC LIMIT ?", params + [min(limit, 20)]).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
-# 10. Recipes
-make_crud_routes('recipes', 'recipes',
-    fields={'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
-            'cuisine': {'type': 'text'}, 'difficulty': {'type': 'text'}, 'prep_time': {'type': 'number'},
-            'cook_time': {'type': 'number'}, 'servings': {'type': 'number'}, 'ingredients': {'type': 'content'}},
-    search_fields=['title', 'description', 'cuisine', 'ingredients'],
-    filter_fields=['cuisine', 'difficulty']
-)
-
-# 11. Events
-make_crud_routes('events', 'events',
-    fields={'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
-            'location': {'type': 'text'}, 'event_date': {'type': 'text'}, 'event_time': {'type': 'text'},
-            'category': {'type': 'text'}, 'capacity': {'type': 'number'}, 'organizer': {'type': 'text'}},
-    search_fields=['title', 'description', 'location', 'organizer'],
-    filter_fields=['category', 'event_date']
-)
-
 # Extra events route: upcoming
 @modules_bp.route('/api/events/upcoming', methods=['GET'])
 def events_upcoming():
-    conn = get_db()
+    conn = get_db('events')
     today = datetime.utcnow().strftime('%Y-%m-%d')
-    rows = conn.execute("SELECT * FROM events WHERE event_date >= ? ORDER BY event_date ASC", (today,)).fetchall()
+    view, params = owner_view(conn, 'events')
+    rows = conn.execute(view + "SELECT * FROM events WHERE event_date >= ? ORDER BY event_date ASC", params + [today]).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
-# 12. Contacts
-make_crud_routes('contacts', 'contacts',
-    fields={'first_name': {'type': 'text', 'required': True}, 'last_name': {'type': 'text'},
-            'email': {'type': 'text'}, 'phone': {'type': 'text'}, 'company': {'type': 'text'},
-            'job_title': {'type': 'text'}, 'city': {'type': 'text'}, 'country': {'type': 'text'}},
-    search_fields=['first_name', 'last_name', 'email', 'company'],
-    filter_fields=['company', 'country', 'city']
-)
-
-# 13. Songs / Music
-make_crud_routes('songs', 'songs',
-    fields={'title': {'type': 'text', 'required': True}, 'artist': {'type': 'text', 'required': True},
-            'album': {'type': 'text'}, 'genre': {'type': 'text'}, 'duration': {'type': 'number'},
-            'year': {'type': 'number'}, 'is_explicit': {'type': 'number'}},
-    search_fields=['title', 'artist', 'album'],
-    filter_fields=['genre', 'year', 'is_explicit']
-)
-
-# 14. Quotes
-make_crud_routes('quotes', 'quotes',
-    fields={'text': {'type': 'content', 'required': True}, 'author': {'type': 'text', 'required': True},
-            'category': {'type': 'text'}, 'language': {'type': 'text'}},
-    search_fields=['text', 'author'],
-    filter_fields=['category', 'language']
-)
-
 # Extra quotes route: random
 @modules_bp.route('/api/quotes/random', methods=['GET'])
 def quotes_random():
-    conn = get_db()
-    row = conn.execute("SELECT * FROM quotes ORDER BY RANDOM() LIMIT 1").fetchone()
+    conn = get_db('quotes')
+    view, params = owner_view(conn, 'quotes')
+    row = conn.execute(view + "SELECT * FROM quotes ORDER BY RANDOM() LIMIT 1", params).fetchone()
     conn.close()
     if not row:
         return jsonify({'error': 'No quotes found'}), 404
     return jsonify({'data': dict(row)})
 
-# 15. Countries
-make_crud_routes('countries', 'countries',
-    fields={'name': {'type': 'text', 'required': True}, 'capital': {'type': 'text'},
-            'continent': {'type': 'text'}, 'population': {'type': 'number'}, 'area_km2': {'type': 'number'},
-            'currency': {'type': 'text'}, 'language': {'type': 'text'}, 'calling_code': {'type': 'text'}},
-    search_fields=['name', 'capital', 'currency'],
-    filter_fields=['continent', 'language']
-)
-
 # Extra countries route: by continent
 @modules_bp.route('/api/countries/by-continent', methods=['GET'])
 def countries_by_continent():
-    conn = get_db()
-    rows = conn.execute("SELECT continent, COUNT(*) as count FROM countries GROUP BY continent ORDER BY count DESC").fetchall()
+    conn = get_db('countries')
+    view, params = owner_view(conn, 'countries')
+    rows = conn.execute(view + "SELECT continent, COUNT(*) as count FROM countries GROUP BY continent ORDER BY count DESC",
+                        params).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows]})
 
-# 16. Jokes
-make_crud_routes('jokes', 'jokes',
-    fields={'setup': {'type': 'content', 'required': True}, 'punchline': {'type': 'content', 'required': True},
-            'category': {'type': 'text'}, 'rating': {'type': 'number'}},
-    search_fields=['setup', 'punchline'],
-    filter_fields=['category']
-)
-
 # Extra jokes route: random
 @modules_bp.route('/api/jokes/random', methods=['GET'])
 def jokes_random():
-    conn = get_db()
-    row = conn.execute("SELECT * FROM jokes ORDER BY RANDOM() LIMIT 1").fetchone()
+    conn = get_db('jokes')
+    view, params = owner_view(conn, 'jokes')
+    row = conn.execute(view + "SELECT * FROM jokes ORDER BY RANDOM() LIMIT 1", params).fetchone()
     conn.close()
     if not row:
         return jsonify({'error': 'No jokes found'}), 404
     return jsonify({'data': dict(row)})
 
-# 17. Vehicles
-make_crud_routes('vehicles', 'vehicles',
-    fields={'make': {'type': 'text', 'required': True}, 'model': {'type': 'text', 'required': True},
-            'year': {'type': 'number'}, 'type': {'type': 'text'}, 'color': {'type': 'text'},
-            'price': {'type': 'number'}, 'fuel_type': {'type': 'text'}, 'mileage': {'type': 'number'}},
-    search_fields=['make', 'model'],
-    filter_fields=['type', 'fuel_type', 'year', 'color']
-)
-
-# 18. Courses
-make_crud_routes('courses', 'courses',
-    fields={'title': {'type': 'text', 'required': True}, 'instructor': {'type': 'text'},
-            'category': {'type': 'text'}, 'level': {'type': 'text'}, 'duration_hours': {'type': 'number'},
-            'price': {'type': 'number'}, 'rating': {'type': 'number'}, 'enrolled': {'type': 'number'}},
-    search_fields=['title', 'instructor', 'category'],
-    filter_fields=['category', 'level']
-)
-
 # Extra courses route: free courses
 @modules_bp.route('/api/courses/free', methods=['GET'])
 def courses_free():
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM courses WHERE price = 0 OR price IS NULL ORDER BY rating DESC").fetchall()
+    conn = get_db('courses')
+    view, params = owner_view(conn, 'courses')
+    rows = conn.execute(view + "SELECT * FROM courses WHERE price = 0 OR price IS NULL ORDER BY rating DESC", params).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
@@ -478,25 +505,18 @@ def courses_free():
 @modules_bp.route('/api/courses/popular', methods=['GET'])
 def courses_popular():
     limit = request.args.get('limit', 5, type=int)
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM courses ORDER BY enrolled DESC LIMIT ?", (min(limit, 20),)).fetchall()
+    conn = get_db('courses')
+    view, params = owner_view(conn, 'courses')
+    rows = conn.execute(view + "SELECT * FROM courses ORDER BY enrolled DESC LIMIT ?", params + [min(limit, 20)]).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
-# 19. Pets
-make_crud_routes('pets', 'pets',
-    fields={'name': {'type': 'text', 'required': True}, 'species': {'type': 'text', 'required': True},
-            'breed': {'type': 'text'}, 'age': {'type': 'number'}, 'color': {'type': 'text'},
-            'weight': {'type': 'number'}, 'adopted': {'type': 'number'}, 'shelter': {'type': 'text'}},
-    search_fields=['name', 'breed', 'shelter'],
-    filter_fields=['species', 'adopted', 'shelter']
-)
-
 # Extra pets route: available for adoption
 @modules_bp.route('/api/pets/available', methods=['GET'])
 def pets_available():
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM pets WHERE adopted = 0 ORDER BY name ASC").fetchall()
+    conn = get_db('pets')
+    view, params = owner_view(conn, 'pets')
+    rows = conn.execute(view + "SELECT * FROM pets WHERE adopted = 0 ORDER BY name ASC", params).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows)})
 
@@ -504,21 +524,29 @@ def pets_available():
 # ================================================================
 # 20. FILES MODULE (special — multipart upload)
 # ================================================================
+def fetch_file(conn, file_id):
+    """(row, overlay op) of a file as the caller sees it; op is None outside overlay mode"""
+    if OVERLAY_ENABLED:
+        return fetch(conn, 'files', caller_owner(), file_id)
+    row = conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
+    return (dict(row) if row else None), None
+
 @modules_bp.route('/api/files', methods=['GET'])
 def list_files():
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM files ORDER BY id DESC").fetchall()
+    conn = get_db('files')
+    view, params = owner_view(conn, 'files')
+    rows = conn.execute(view + "SELECT * FROM files ORDER BY id DESC", params).fetchall()
     conn.close()
     return jsonify({'data': [dict(r) for r in rows], 'count': len(rows), 'module': 'files'})
 
 @modules_bp.route('/api/files/<int:file_id>', methods=['GET'])
 def get_file(file_id):
-    conn = get_db()
-    row = conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
+    conn = get_db('files')
+    row, _ = fetch_file(conn, file_id)
     conn.close()
     if not row:
         return jsonify({'error': 'File not found'}), 404
-    return jsonify({'data': dict(row), 'module': 'files'})
+    return jsonify({'data': row, 'module': 'files'})
 
 @modules_bp.route('/api/files/upload', methods=['POST'])
 def upload_file():
@@ -540,22 +568,29 @@ def upload_file():
     safe_name = secure_filename(f.filename)[:100]
     stored = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{safe_name}"
     f.save(os.path.join(UPLOAD_DIR, stored))
-    conn = get_db()
-    cursor = conn.execute(
-        "INSERT INTO files (original_name, stored_name, file_type, file_size, created_by_user, created_by_key) VALUES (?,?,?,?,1,?)",
-        (safe_name, stored, ext, size, request.remote_addr)
-    )
-    new_id = cursor.lastrowid
-    track_modification(conn, 'files', new_id, 'create', hours=2)
+    conn = get_db('files')
+    if OVERLAY_ENABLED:
+        row, expires = create_row(conn, 'files', caller_owner(), ('original_name', 'stored_name', 'file_type', 'file_size'),
+                                  (safe_name, stored, ext, size, 1, request.remote_addr), hours=2)
+        new_id = row['id']
+    else:
+        cursor = conn.execute(
+            "INSERT INTO files (original_name, stored_name, file_type, file_size, created_by_user, created_by_key) VALUES (?,?,?,?,1,?)",
+            (safe_name, stored, ext, size, request.remote_addr)
+        )
+        new_id = cursor.lastrowid
+        track_modification(conn, 'files', new_id, 'create', hours=2)
     conn.commit()
     conn.close()
+    if OVERLAY_ENABLED:
+        schedule_revert('files', expires)
     return jsonify({'message': 'File uploaded', 'data': {'id': new_id, 'name': safe_name, 'size': size, 'type': ext},
                     'deep_freeze': {'notice': freeze_notice('create')}}), 201
 
 @modules_bp.route('/api/files/download/<int:file_id>', methods=['GET'])
 def download_file(file_id):
-    conn = get_db()
-    row = conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
+    conn = get_db('files')
+    row, _ = fetch_file(conn, file_id)
     conn.close()
     if not row:
         return jsonify({'error': 'File not found'}), 404
@@ -564,20 +599,29 @@ def download_file(file_id):
 @modules_bp.route('/api/files/<int:file_id>', methods=['DELETE'])
 @require_api_key
 def delete_file(file_id):
-    conn = get_db()
-    row = conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
+    conn = get_db('files')
+    row, op = fetch_file(conn, file_id)
     if not row:
         conn.close()
         return jsonify({'error': 'File not found'}), 404
     if row['is_frozen']:
         conn.close()
         return jsonify({'error': 'Cannot delete frozen file'}), 403
-    file_data = dict(row)
-    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
-    track_modification(conn, 'files', file_id, 'delete', original_data=file_data, hours=1)
+    expires = None
+    if OVERLAY_ENABLED:
+        expires = delete_row(conn, 'files', caller_owner(), row, op, hours=1)
+    else:
+        conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        track_modification(conn, 'files', file_id, 'delete', original_data=row, hours=1)
     conn.commit()
     conn.close()
-    return jsonify({'message': 'File deleted', 'id': file_id, 'deep_freeze': {'notice': freeze_notice('delete')}})
+    notice = freeze_notice('delete')
+    if expires:
+        schedule_revert('files', expires)
+    elif OVERLAY_ENABLED:
+        # Their own upload: dropped for good, nothing to restore
+        notice = freeze_notice('remove')
+    return jsonify({'message': 'File deleted', 'id': file_id, 'deep_freeze': {'notice': notice}})
 
 
 # ================================================================
@@ -0,0 +1,234 @@
+"""
+HTTP Playground v3.0 — Deep Freeze Overlays
+With FREEZE_MODE=overlay, users never change the shared module tables. Each
+user's creates, updates and deletes are written to <table>_overlay in the
+same shard instead:
+
+- create: a new row with id OVERLAY_ID_BASE + n, so it never meets a baseline id
+- update: the whole row as that user now sees it
+- delete: a tombstone (no data columns)
+
+Rows are keyed by (owner, id). The owner is the user behind X-API-Key, or
+the caller's IP when no valid key is sent. Reads look up the caller's rows
+through the (owner, id) index. A caller without any deltas reads the base
+table directly. For a caller with deltas, the table name is shadowed by a
+CTE that merges the two, so every list query runs unchanged.
+
+There are no snapshots to restore: expiry is a range delete on expires_at.
+FREEZE_MODE=shared (the default) keeps mutating the shared rows and
+reverting them from user_modifications.
+"""
+import os
+from datetime import datetime, timedelta
+from flask import request, g
+from database import get_db, fingerprint, schema_state, mark_schema_state, SHARDS, shard_tables, BASE_TABLES
+from registry import MODULES_BY_TABLE
+
+FREEZE_MODE = os.getenv('FREEZE_MODE', 'shared')
+OVERLAY_ENABLED = FREEZE_MODE == 'overlay'
+OVERLAY_ID_BASE = 1000000000
+OVERLAY_COLUMNS = (('owner', 'TEXT NOT NULL'), ('op', 'TEXT NOT NULL'), ('expires_at', 'TIMESTAMP NOT NULL'))
+
+# table -> base column names in table order, read from the schema once per process
+_columns = {}
+
+
+def overlay_table(table):
+    return f"{table}_overlay"
+
+
+def overlay_tables(shard):
+    """Module tables with an overlay in `shard`."""
+    return [t for t in shard_tables(shard) if t in MODULES_BY_TABLE]
+
+
+def base_columns(conn, table):
+    cols = _columns.get(table)
+    if cols is None:
+        cols = _columns[table] = tuple(r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall())
+    return cols
+
+
+# ============ SCHEMA ============
+def _column_decl(col):
+    """'name TYPE [DEFAULT x]' from a PRAGMA table_info row, without NOT NULL / PRIMARY KEY: tombstones carry no data"""
+    _, name, decl_type, _, default, _ = col
+    return f"{name} {decl_type or ''}" + (f" DEFAULT {default}" if default is not None else '')
+
+
+def _overlay_ddl(table, info):
+    cols = [_column_decl(r) for r in info] + [f"{name} {decl}" for name, decl in OVERLAY_COLUMNS]
+    return f"CREATE TABLE {overlay_table(table)} (\n    " + ",\n    ".join(cols) + "\n)"
+
+
+def ensure_overlays(modules):
+    """Create each module's overlay table and indexes, and add any column its base table gained since."""
+    # The base tables' columns follow from their DDL and the migrations applied on top of it:
+    # while neither changed, neither did the overlays, and a warm start reads no table_info
+    plan_fp = fingerprint((schema_state('schema')[0], sorted((m.table, BASE_TABLES.get(m.table)) for m in modules), SHARDS))
+    if schema_state('overlays')[1] == plan_fp:
+        return []
+    plan = {}
+    for module in modules:
+        conn = get_db(module.table)
+        plan[module.table] = [tuple(r) for r in conn.execute(f"PRAGMA table_info({module.table})").fetchall()]
+        conn.close()
+    changed = []
+    for table, info in plan.items():
+        name = overlay_table(table)
+        conn = get_db(table)
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({name})").fetchall()}
+        if not existing:
+            conn.execute(_overlay_ddl(table, info))
+            changed.append(table)
+        else:
+            for r in info:
+                if r[1] not in existing:
+                    conn.execute(f"ALTER TABLE {name} ADD COLUMN {_column_decl(r)}")
+                    changed.append(table)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{name}_owner ON {name} (owner, id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_expires ON {name} (expires_at)")
+        conn.commit()
+        conn.close()
+        _columns.pop(table, None)
+    conn = get_db()
+    mark_schema_state(conn, 'overlays', fingerprint=plan_fp)
+    conn.commit()
+    conn.close()
+    return changed
+
+
+# ============ CALLER ============
+def caller_owner():
+    """Overlay owner of the current request: u:<user id> for a valid standard key, else ip:<address>."""
+    user = g.get('current_user')
+    if user and user.get('id'):
+        return f"u:{user['id']}"
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        # Identity only: no quota is spent and an exhausted key still sees its own changes
+        from auth import check_api_key_format
+        from quota import lookup_key
+        key = lookup_key(api_key, 'standard') if check_api_key_format(api_key, 'standard') else None
+        if key:
+            return f"u:{key['user_id']}"
+    return f"ip:{request.remote_addr}"
+
+
+def _expiry(hours):
+    return (datetime.utcnow() + timedelta(hours=hours)).replace(microsecond=0)
+
+
+# ============ READS ============
+def has_deltas(conn, table, owner):
+    return conn.execute(f"SELECT 1 FROM {overlay_table(table)} WHERE owner = ? LIMIT 1", (owner,)).fetchone() is not None
+
+
+def merged_view(conn, table, owner):
+    """(WITH clause, params) shadowing `table` with `owner`'s view of it; prepend to any query on the table."""
+    cols = ', '.join(base_columns(conn, table))
+    name = overlay_table(table)
+    return (f"WITH {table} AS (SELECT {cols} FROM main.{table} "
+            f"WHERE id NOT IN (SELECT id FROM {name} WHERE owner = ?) "
+            f"UNION ALL SELECT {cols} FROM {name} WHERE owner = ? AND op != 'delete') "), [owner, owner]
+
+
+def count_delta(conn, table, owner):
+    """Rows `owner` added minus rows they deleted, to adjust the base table's counter."""
+    row = conn.execute(
+        f"SELECT COALESCE(SUM(op = 'create'), 0) - COALESCE(SUM(op = 'delete'), 0) FROM {overlay_table(table)} WHERE owner = ?",
+        (owner,)
+    ).fetchone()
+    return row[0]
+
+
+def fetch(conn, table, owner, record_id):
+    """(row, op) of a record as `owner` sees it. op is None for an untouched base row; row is None if gone."""
+    cols = ', '.join(base_columns(conn, table))
+    row = conn.execute(f"SELECT {cols}, op FROM {overlay_table(table)} WHERE owner = ? AND id = ?",
+                       (owner, record_id)).fetchone()
+    if row is not None:
+        data = dict(row)
+        op = data.pop('op')
+        return (None if op == 'delete' else data), op
+    row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (record_id,)).fetchone()
+    return (dict(row) if row else None), None
+
+
+# ============ WRITES (the caller commits) ============
+def create_row(conn, table, owner, cols, vals, hours=2):
+    """Insert a user-created row carrying `cols` (+ created_by_user, created_by_key). Returns (row, expires)."""
+    name = overlay_table(table)
+    expires = _expiry(hours)
+    names = ', '.join(tuple(cols) + ('created_by_user', 'created_by_key', 'owner', 'op', 'expires_at'))
+    rowid = conn.execute(
+        f"INSERT INTO {name} ({names}) VALUES ({', '.join('?' * (len(cols) + 5))})",
+        list(vals) + [owner, 'create', expires.strftime('%Y-%m-%d %H:%M:%S')]
+    ).lastrowid
+    # rowids only grow while a row exists, so the id is unique among the owner's live rows
+    conn.execute(f"UPDATE {name} SET id = ? WHERE rowid = ?", (OVERLAY_ID_BASE + rowid, rowid))
+    cols_sql = ', '.join(base_columns(conn, table))
+    return dict(conn.execute(f"SELECT {cols_sql} FROM {name} WHERE rowid = ?", (rowid,)).fetchone()), expires
+
+
+def update_row(conn, table, owner, row, op, changes, hours=1):
+    """Apply `changes` to `row` (as returned by fetch) for `owner` only. Returns (row, expires or None)."""
+    name = overlay_table(table)
+    new = dict(row, **changes)
+    if op is not None:
+        # Already the owner's copy; an update restarts the hour, a create keeps its own expiry
+        expires = _expiry(hours) if op == 'update' else None
+        sets = ', '.join(f"{c} = ?" for c in changes) + (", expires_at = ?" if expires else '')
+        conn.execute(f"UPDATE {name} SET {sets} WHERE owner = ? AND id = ?",
+                     list(changes.values()) + ([expires.strftime('%Y-%m-%d %H:%M:%S')] if expires else [])
+                     + [owner, row['id']])
+        return new, expires
+    expires = _expiry(hours)
+    cols = base_columns(conn, table)
+    conn.execute(
+        f"INSERT INTO {name} ({', '.join(cols)}, owner, op, expires_at) VALUES ({', '.join('?' * (len(cols) + 3))})",
+        [new.get(c) for c in cols] + [owner, 'update', expires.strftime('%Y-%m-%d %H:%M:%S')]
+    )
+    return new, expires
+
+
+def delete_row(conn, table, owner, row, op, hours=1):
+    """Hide `row` from `owner`. Their own creations are dropped outright. Returns expires or None."""
+    name = overlay_table(table)
+    if op == 'create':
+        conn.execute(f"DELETE FROM {name} WHERE owner = ? AND id = ?", (owner, row['id']))
+        return None
+    expires = _expiry(hours)
+    conn.execute(f"INSERT OR REPLACE INTO {name} (id, owner, op, expires_at) VALUES (?, ?, 'delete', ?)",
+                 (row['id'], owner, expires.strftime('%Y-%m-%d %H:%M:%S')))
+    return expires
+
+
+# ============ EXPIRY ============
+def purge_expired(conn, table, now, batch_size):
+    """Delete one batch of expired overlay rows of `table`; returns how many went."""
+    name = overlay_table(table)
+    cur = conn.execute(
+        f"DELETE FROM {name} WHERE rowid IN (SELECT rowid FROM {name} WHERE expires_at <= ? LIMIT ?)",
+        (now, batch_size)
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def overlay_stats():
+    """Live overlay rows per module table."""
+    rows = {}
+    for shard in SHARDS:
+        tables = overlay_tables(shard)
+        if not tables:
+            continue
+        conn = get_db(shard=shard)
+        try:
+            for table in tables:
+                n = conn.execute(f"SELECT COUNT(*) FROM {overlay_table(table)}").fetchone()[0]
+                if n:
+                    rows[table] = rows.get(table, 0) + n
+        finally:
+            conn.close()
+    return {'mode': FREEZE_MODE, 'rows': rows, 'total': sum(rows.values())}
@@ -0,0 +1,487 @@
+"""
+HTTP Playground v3.0 — API Key Quota Ledger
+Key metadata and request quotas for the X-API-Key decorators, held in memory.
+
+Quota is claimed from api_keys in blocks: one write transaction reserves up to
+QUOTA_BLOCK_SIZE requests (never past max_requests), and the worker then spends
+them from memory. Served and reserved requests are counted apart:
+request_count is what has been served, quota_leases what each worker holds,
+one row per (key, holder) with holder = host:pid. Blocks shrink as the quota runs low (room / QUOTA_WORKERS), so a few
+workers cannot strand the last requests of a key between them.
+
+A key is deactivated only once request_count reaches max_requests. When
+its remaining requests are all held by other workers' leases, take() raises
+QuotaBusy (a retryable 429) and asks those workers to hand them back on their
+next flush.
+
+Write-behind: a flusher moves requests served from reserved to request_count,
+hands back unspent requests of idle leases and writes last_used in batches.
+Each flush also pushes the expires_at of the worker's rows QUOTA_LEASE_TTL
+ahead. Rows of a worker that died stop being renewed: claims and flushes
+delete them once expired, and a worker restarted under the same host:pid
+drops its old rows on startup. Requests the dead worker served but never
+flushed are not counted, so a crash can let a key serve up to one block
+past its limit.
+
+With a shared state backend (state.py) the same two counts live in the store:
+quota:<key id> (served + reserved) and quota:<key id>:served, both seeded once
+from api_keys. The flusher mirrors the served count back into api_keys.
+quota:<key id> carries a QUOTA_LEASE_TTL that every worker holding a block
+renews on each flush; once no live worker holds one it expires and is seeded
+again from what was served, dropping what dead workers still held.
+"""
+import os
+import atexit
+import socket
+import threading
+import time
+from datetime import datetime
+from database import get_db
+from state import get_state, StateUnavailable
+
+QUOTA_BLOCK_SIZE = int(os.getenv('QUOTA_BLOCK_SIZE', 5))
+QUOTA_META_TTL = float(os.getenv('QUOTA_META_TTL', 30))
+QUOTA_FLUSH_INTERVAL = float(os.getenv('QUOTA_FLUSH_INTERVAL', 2))
+QUOTA_LEASE_IDLE = float(os.getenv('QUOTA_LEASE_IDLE', 10))
+# Reservations not renewed by a flush for this long belong to a dead worker and go back
+QUOTA_LEASE_TTL = float(os.getenv('QUOTA_LEASE_TTL', 30))
+# Processes sharing the quota; blocks shrink to room / QUOTA_WORKERS near the limit
+QUOTA_WORKERS = int(os.getenv('QUOTA_WORKERS', os.getenv('WEB_CONCURRENCY', 4)))
+
+# revoke() pushes the shared claim counter past any limit
+REVOKED = 1 << 30
+
+KEY_LOOKUP_SQL = ("SELECT ak.*, u.username, u.role, u.status FROM api_keys ak "
+                  "JOIN users u ON ak.user_id = u.id WHERE ak.key = ? AND ak.key_type = ?")
+
+
+class QuotaBusy(Exception):
+    """The key has requests left, but other workers hold them in leases; retry after QUOTA_FLUSH_INTERVAL."""
+
+
+class QuotaLedger:
+    def __init__(self, block_size=QUOTA_BLOCK_SIZE, meta_ttl=QUOTA_META_TTL, workers=QUOTA_WORKERS,
+                 lease_ttl=QUOTA_LEASE_TTL, holder=None):
+        self.block_size = max(1, block_size)
+        self.meta_ttl = meta_ttl
+        self.workers = max(1, workers)
+        self.lease_ttl = lease_ttl
+        self._holder = holder
+        self._lock = threading.Lock()
+        # Claims for one key are serialized; striped so the lock table stays fixed-size
+        self._claim_locks = [threading.Lock() for _ in range(64)]
+        self._meta = {}     # (key, key_type) -> (expires_at, key row)
+        # key id -> {'left', 'spent', 'base', 'max', 'user_id', 'touched', 'shared'}
+        # spent: served here, not flushed yet; base: served count last read from the store
+        self._leases = {}
+        self._dirty = {}    # key id -> last_used timestamp not yet written
+        self._returns = []  # (unspent, spent, key id, shared) from dropped leases, settled on next flush
+        self._resync = set()  # keys claimed from api_keys while the shared store was down
+        self._pid = None
+        self.stats = {'meta_hits': 0, 'meta_misses': 0, 'served_from_lease': 0, 'claims': 0,
+                      'exhausted': 0, 'busy': 0, 'released': 0, 'reclaimed': 0, 'flushes': 0, 'flush_errors': 0}
+
+    @property
+    def holder(self):
+        """Owner of this worker's quota_leases rows; stable across a restart under the same pid."""
+        return self._holder or f"{socket.gethostname()}:{os.getpid()}"
+
+    def _ensure_started(self):
+        # One flusher per process: gunicorn --preload forks after import
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._meta.clear()
+            self._leases.clear()
+            self._dirty.clear()
+            self._returns = []
+            self._resync = set()
+            self._settle_leftovers()
+            threading.Thread(target=self._run, daemon=True, name='quota-flusher').start()
+            self._pid = os.getpid()
+
+    def _settle_leftovers(self):
+        """Drop reservations an earlier process with this holder never handed back, and any expired ones."""
+        conn = get_db(write=True)
+        try:
+            dropped = conn.execute("DELETE FROM quota_leases WHERE holder = ? OR expires_at <= ? RETURNING reserved",
+                                   (self.holder, time.time())).fetchall()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"[Quota] Could not settle leftover reservations: {e}")
+            return
+        finally:
+            conn.close()
+        if dropped:
+            self.stats['reclaimed'] += sum(r['reserved'] for r in dropped)
+            print(f"[Quota] Reclaimed {len(dropped)} reservation(s) left by stopped workers")
+
+    # ---------- key metadata ----------
+    def lookup(self, key, key_type):
+        """Key row joined with its user (username, role, status), or None for an unknown key."""
+        self._ensure_started()
+        now = time.time()
+        with self._lock:
+            entry = self._meta.get((key, key_type))
+            if entry and entry[0] > now:
+                self.stats['meta_hits'] += 1
+                return dict(entry[1])
+            self.stats['meta_misses'] += 1
+        conn = get_db()
+        row = conn.execute(KEY_LOOKUP_SQL, (key, key_type)).fetchone()
+        conn.close()
+        if not row:
+            return None
+        data = dict(row)
+        with self._lock:
+            self._meta[(key, key_type)] = (now + self.meta_ttl, data)
+        return dict(data)
+
+    def invalidate_user(self, user_id):
+        """Drop cached metadata and leases of a user's keys (status change, key regenerated)."""
+        with self._lock:
+            for cache_key in [k for k, (_, data) in self._meta.items() if data['user_id'] == user_id]:
+                del self._meta[cache_key]
+            for key_id in [k for k, lease in self._leases.items() if lease['user_id'] == user_id]:
+                lease = self._leases.pop(key_id)
+                if lease['left'] > 0 or lease['spent'] > 0:
+                    self._returns.append((lease['left'], lease['spent'], key_id, lease['shared']))
+
+    def _mark_inactive(self, key_id):
+        for _, data in self._meta.values():
+            if data['id'] == key_id:
+                data['is_active'] = 0
+
+    # ---------- quota ----------
+    def _spend(self, key_id):
+        """Take one request from this worker's lease; caller holds self._lock."""
+        lease = self._leases.get(key_id)
+        if not lease or lease['left'] <= 0:
+            return None
+        lease['left'] -= 1
+        lease['spent'] += 1
+        lease['touched'] = time.time()
+        self._dirty[key_id] = lease['touched']
+        # Requests other workers served since the last flush show up within QUOTA_FLUSH_INTERVAL
+        return lease['max'] - lease['base'] - lease['spent']
+
+    def take(self, key_data):
+        """
+        Spend one request of a looked-up key. Returns requests remaining, or None when exhausted.
+        Raises QuotaBusy when what is left is held by other workers.
+        """
+        key_id = key_data['id']
+        with self._lock:
+            remaining = self._spend(key_id)
+            if remaining is not None:
+                self.stats['served_from_lease'] += 1
+                return remaining
+        with self._claim_locks[key_id % len(self._claim_locks)]:
+            with self._lock:
+                # Another request may have claimed a block while we waited
+                remaining = self._spend(key_id)
+                if remaining is not None:
+                    self.stats['served_from_lease'] += 1
+                    return remaining
+                lease = self._leases.get(key_id)
+                unflushed = lease['spent'] if lease else 0
+            try:
+                granted, served, max_requests, shared = self._claim(key_data, unflushed)
+            except QuotaBusy:
+                with self._lock:
+                    self.stats['busy'] += 1
+                raise
+            with self._lock:
+                if not granted:
+                    self._mark_inactive(key_id)
+                    self.stats['exhausted'] += 1
+                    return None
+                self.stats['claims'] += 1
+                lease = self._leases.setdefault(key_id, {'left': 0, 'spent': 0, 'user_id': key_data['user_id']})
+                if lease.get('shared', shared) != shared:
+                    # The store went down or came back: settle what the old lease holds against its own counter
+                    self._returns.append((lease['left'], lease['spent'], key_id, lease['shared']))
+                    lease.update(left=0, spent=0)
+                lease.update(left=lease['left'] + granted, base=served, max=max_requests, shared=shared)
+                return self._spend(key_id)
+
+    def _block(self, room):
+        """Block to reserve with `room` requests unclaimed: shrinks near the limit, never below one."""
+        return max(0, min(self.block_size, max(1, room // self.workers), room))
+
+    def _claim(self, key_data, unflushed):
+        """Reserve a block. Returns (granted, served, max_requests, shared); granted 0 = exhausted."""
+        state = get_state()
+        if state.shared:
+            try:
+                return self._claim_shared(state, key_data, unflushed) + (True,)
+            except StateUnavailable as e:
+                print(f"[Quota] State backend unavailable, claiming from api_keys: {e}")
+                self._resync.add(key_data['id'])
+        return self._claim_db(key_data['id'], unflushed) + (False,)
+
+    def _deactivate(self, key_id):
+        conn = get_db(write=True)
+        try:
+            conn.execute("UPDATE api_keys SET is_active = 0 WHERE id = ?", (key_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _reserved(self, conn, key_id):
+        """Requests of a key held in live leases; expired rows are deleted first (caller is in a transaction)."""
+        expired = conn.execute("DELETE FROM quota_leases WHERE key_id = ? AND expires_at <= ? RETURNING reserved",
+                               (key_id, time.time())).fetchall()
+        self.stats['reclaimed'] += sum(r['reserved'] for r in expired)
+        return conn.execute("SELECT COALESCE(SUM(reserved), 0) FROM quota_leases WHERE key_id = ?",
+                            (key_id,)).fetchone()[0]
+
+    def _claim_db(self, key_id, unflushed):
+        conn = get_db(write=True)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT request_count, max_requests, is_active FROM api_keys WHERE id = ?", (key_id,)
+            ).fetchone()
+            if not row or not row['is_active']:
+                conn.rollback()
+                return 0, 0, 0
+            served, max_requests = row['request_count'], row['max_requests']
+            granted = self._block(max_requests - served - self._reserved(conn, key_id))
+            if not granted:
+                if served + unflushed >= max_requests:
+                    conn.execute("UPDATE api_keys SET is_active = 0 WHERE id = ?", (key_id,))
+                    conn.commit()
+                    return 0, served, max_requests
+                # Reserved, not served: other workers hand idle leases back within QUOTA_LEASE_IDLE
+                conn.commit()
+                raise QuotaBusy(key_id)
+            conn.execute(
+                "INSERT INTO quota_leases (key_id, holder, reserved, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key_id, holder) DO UPDATE SET reserved = reserved + excluded.reserved, "
+                "expires_at = excluded.expires_at",
+                (key_id, self.holder, granted, time.time() + self.lease_ttl)
+            )
+            conn.execute("UPDATE api_keys SET last_used = CURRENT_TIMESTAMP WHERE id = ?", (key_id,))
+            conn.commit()
+            return granted, served, max_requests
+        finally:
+            conn.close()
+
+    def _seed_shared(self, state, key_id):
+        """Create (or catch up) the shared counters from api_keys; False if the key is inactive."""
+        conn = get_db()
+        row = conn.execute("SELECT request_count, is_active, (SELECT COALESCE(SUM(reserved), 0) FROM quota_leases "
+                           "WHERE key_id = ? AND expires_at > ?) AS reserved FROM api_keys WHERE id = ?",
+                           (key_id, time.time(), key_id)).fetchone()
+        conn.close()
+        if not row or not row['is_active']:
+            return False
+        for counter, value, ttl in ((f"quota:{key_id}", row['request_count'] + row['reserved'], self.lease_ttl),
+                                    (f"quota:{key_id}:served", row['request_count'], None)):
+            if not state.add(counter, value, ttl=ttl):
+                # Claims made against api_keys while the store was down must count here too
+                behind = value - (state.get(counter) or 0)
+                if behind > 0:
+                    state.incr(counter, behind)
+        self._resync.discard(key_id)
+        return True
+
+    def _claim_shared(self, state, key_data, unflushed):
+        """Same reservation against the shared counters quota:<id> and quota:<id>:served."""
+        key_id, max_requests = key_data['id'], key_data['max_requests']
+        counter = f"quota:{key_id}"
+        if key_id in self._resync or state.get(counter) is None:
+            if not self._seed_shared(state, key_id):
+                return 0, 0, max_requests
+
+        def reserve(claimed):
+            granted = self._block(max_requests - (claimed or 0))
+            return ((claimed or 0) + granted if granted else None), (granted, claimed or 0)
+
+        granted, claimed = state.update(counter, reserve, ttl=self.lease_ttl)
+        served = state.get(f"{counter}:served") or 0
+        if granted:
+            return granted, served, max_requests
+        if claimed >= REVOKED:
+            return 0, served, max_requests
+        if served + unflushed >= max_requests:
+            self._deactivate(key_id)
+            return 0, served, max_requests
+        # Ask the workers holding the rest to hand it back on their next flush
+        state.add(f"{counter}:drain", 1, ttl=max(1, int(QUOTA_FLUSH_INTERVAL * 3)))
+        raise QuotaBusy(key_id)
+
+    def revoke(self, key_ids):
+        """Exhaust keys on every worker at once (shared backend); api_keys.is_active is set by the caller."""
+        state = get_state()
+        if not state.shared:
+            return
+        for key_id in key_ids:
+            try:
+                state.incr(f"quota:{key_id}", REVOKED)
+            except StateUnavailable:
+                pass
+
+    # ---------- write-behind ----------
+    def flush(self, release_all=False):
+        """
+        Settle served requests, hand back unspent requests of idle (or drained) leases, and
+        write last_used. With release_all every lease is handed back.
+        """
+        state = get_state()
+        cutoff = time.time() - QUOTA_LEASE_IDLE
+        drain = set()
+        with self._lock:
+            held = [k for k, lease in self._leases.items() if lease['shared'] and lease['left'] > 0]
+        if state.shared and held:
+            try:
+                drain = {k for k in held if state.get(f"quota:{k}:drain")}
+            except StateUnavailable:
+                pass
+        with self._lock:
+            idle = [k for k, lease in self._leases.items()
+                    if release_all or k in drain or lease.get('touched', 0) < cutoff]
+            settle = self._returns
+            self._returns = []
+            for k in idle:
+                lease = self._leases.pop(k)
+                settle.append((lease['left'], lease['spent'], k, lease['shared']))
+            renew = [k for k, lease in self._leases.items() if lease['shared'] and lease['left'] > 0]
+            holding_db = any(not lease['shared'] and lease['left'] > 0 for lease in self._leases.values())
+            for k, lease in self._leases.items():
+                if lease['spent']:
+                    settle.append((0, lease['spent'], k, lease['shared']))
+                    lease['base'] += lease['spent']
+                    lease['spent'] = 0
+            touched = [(datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'), k) for k, ts in self._dirty.items()]
+            self._dirty.clear()
+        counts = []
+        if state.shared:
+            pending = [entry for entry in settle if entry[3]]
+            try:
+                while pending:
+                    left, spent, key_id, _ = pending[0]
+                    if spent:
+                        counts.append((state.incr(f"quota:{key_id}:served", spent), key_id))
+                    if left:
+                        self._hand_back(state, key_id, left)
+                    pending.pop(0)
+                for key_id in renew:
+                    # Heartbeat: quota:<id> lives as long as some worker still holds part of it
+                    state.update(f"quota:{key_id}", lambda claimed: (claimed, None), ttl=self.lease_ttl)
+            except StateUnavailable as e:
+                # Keep what could not be settled for the next flush
+                print(f"[Quota] State backend unavailable during flush: {e}")
+                with self._lock:
+                    self._returns.extend(pending)
+        settle_db = [(spent, spent + left, key_id) for left, spent, key_id, shared in settle if not shared]
+        if not settle_db and not touched and not counts and not holding_db:
+            self._refresh(state)
+            return 0
+        now, holder = time.time(), self.holder
+        conn = get_db(write=True)
+        try:
+            conn.executemany("UPDATE api_keys SET request_count = request_count + ? WHERE id = ?",
+                             [(spent, key_id) for spent, _, key_id in settle_db])
+            conn.executemany("UPDATE quota_leases SET reserved = reserved - ? WHERE key_id = ? AND holder = ?",
+                             [(held, key_id, holder) for _, held, key_id in settle_db])
+            # Renew what this worker still holds; reclaim what dead workers stopped renewing
+            conn.execute("DELETE FROM quota_leases WHERE (holder = ? AND reserved <= 0) OR expires_at <= ?",
+                         (holder, now))
+            conn.execute("UPDATE quota_leases SET expires_at = ? WHERE holder = ?", (now + self.lease_ttl, holder))
+            # Mirror the shared served counters into api_keys for the key listings
+            conn.executemany("UPDATE api_keys SET request_count = MIN(max_requests, ?) WHERE id = ?", counts)
+            # Only requests actually served exhaust a key
+            conn.executemany("UPDATE api_keys SET is_active = 0 WHERE id = ? AND request_count >= max_requests",
+                             [(key_id,) for _, _, key_id in settle_db] + [(key_id,) for _, key_id in counts])
+            conn.executemany("UPDATE api_keys SET last_used = ? WHERE id = ?", touched)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.stats['flush_errors'] += 1
+            raise
+        finally:
+            conn.close()
+        self.stats['flushes'] += 1
+        self.stats['released'] += sum(left for left, _, _, _ in settle)
+        self._refresh(state)
+        return len(settle) + len(touched)
+
+    def _hand_back(self, state, key_id, left):
+        """Return unspent requests to quota:<id>, unless it expired and was seeded again without them."""
+        state.update(f"quota:{key_id}",
+                     lambda claimed: (None if claimed is None else max(0, claimed - left), None), ttl=self.lease_ttl)
+
+    def _refresh(self, state):
+        """Re-read the served count of every held lease, so remaining reflects what other workers served."""
+        with self._lock:
+            held = [(k, lease['shared']) for k, lease in self._leases.items()]
+        if not held:
+            return
+        served = {}
+        db_ids = [k for k, shared in held if not shared]
+        if db_ids:
+            conn = get_db()
+            served.update(conn.execute(f"SELECT id, request_count FROM api_keys WHERE id IN ({', '.join('?' * len(db_ids))})",
+                                       db_ids).fetchall())
+            conn.close()
+        try:
+            for k, shared in held:
+                if shared:
+                    served[k] = state.get(f"quota:{k}:served") or 0
+        except StateUnavailable:
+            pass
+        with self._lock:
+            for k, count in served.items():
+                lease = self._leases.get(k)
+                if lease:
+                    # Requests spent here since the snapshot above are in lease['spent'] and not in count
+                    lease['base'] = count
+
+    def _run(self):
+        while True:
+            time.sleep(QUOTA_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Quota] Flush error: {e}")
+
+    def shutdown(self):
+        if self._pid == os.getpid():
+            self.flush(release_all=True)
+
+    def metrics(self):
+        with self._lock:
+            leases = len(self._leases)
+            reserved = sum(lease['left'] for lease in self._leases.values())
+            cached = len(self._meta)
+        return dict(self.stats, block_size=self.block_size, leases=leases,
+                    reserved_unspent=reserved, cached_keys=cached)
+
+
+_ledger = QuotaLedger()
+atexit.register(_ledger.shutdown)
+
+
+def lookup_key(key, key_type):
+    return _ledger.lookup(key, key_type)
+
+
+def take_request(key_data):
+    return _ledger.take(key_data)
+
+
+def invalidate_user_keys(user_id):
+    _ledger.invalidate_user(user_id)
+
+
+def revoke_keys(key_ids):
+    _ledger.revoke(key_ids)
+
+
+def quota_stats():
+    return _ledger.metrics()
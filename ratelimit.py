@@ -0,0 +1,207 @@
+"""
+HTTP Playground v3.0 — Rate Limiting (GCRA)
+Every /api request is limited by the policy of its route class:
+
+    RATE_LIMIT_PUBLIC  module routes, echo, files, weather, ...
+    RATE_LIMIT_AUTH    /api/auth/*
+    RATE_LIMIT_ADMIN   /api/admin/*
+    RATE_LIMIT_AI      /api/ai/*
+
+Policies are written "<count>/<period>", e.g. 30/minute or 5/10seconds.
+Callers are identified by their X-API-Key (when it passes the signature
+check and names an active key), then the user of a verified bearer token,
+then their IP address: a made-up key or token is limited by IP, not given
+a fresh bucket. register and login also keep their own stricter per-IP
+limits through @rate_limit.
+
+GCRA (the generic cell rate algorithm) keeps one number per caller, the
+theoretical arrival time (TAT). It lives in the shared state backend, so
+limits hold across workers, and expires once the caller's bucket has
+refilled. A caller may burst up to the full count, then gets one request
+every period/count. Responses carry RateLimit-Limit, RateLimit-Remaining,
+RateLimit-Reset and RateLimit-Policy, and a 429 also carries Retry-After.
+"""
+import os
+import re
+import math
+import time
+import hashlib
+from functools import wraps
+from flask import request, jsonify, g
+from state import get_state, StateUnavailable, StateConflict
+from auth import check_api_key_format, decode_token, API_KEY_PREFIXES
+from quota import lookup_key
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+PERIODS = {'second': 1, 'sec': 1, 's': 1, 'minute': 60, 'min': 60, 'm': 60,
+           'hour': 3600, 'h': 3600, 'day': 86400, 'd': 86400}
+
+# First matching path prefix wins; paths matching none (pages, static files) are not limited
+ROUTE_CLASSES = (
+    ('/api/ai/', 'ai'),
+    ('/api/admin/', 'admin'),
+    ('/api/auth/', 'auth'),
+    ('/api/', 'public'),
+)
+EXEMPT_PATHS = ('/api/health', '/api/health/freeze')
+
+
+class Policy:
+    """count requests per period seconds."""
+
+    def __init__(self, count, period):
+        if count < 1 or period <= 0:
+            raise ValueError('rate limit count and period must be positive')
+        self.count = count
+        self.period = period
+        self.interval_ms = period * 1000.0 / count       # emission interval T
+        self.burst_ms = self.interval_ms * (count - 1)   # tolerance tau: a full burst of `count`
+
+    @classmethod
+    def parse(cls, text):
+        """'30/minute', '100 per hour', '5/10s' -> Policy"""
+        match = re.fullmatch(r'\s*(\d+)\s*(?:/|per)\s*(\d*)\s*([a-z]+?)s?\s*', text.lower())
+        if not match or match.group(3) not in PERIODS:
+            raise ValueError(f'bad rate limit policy {text!r}')
+        return cls(int(match.group(1)), int(match.group(2) or 1) * PERIODS[match.group(3)])
+
+    def header(self):
+        return f'{self.count};w={self.period:g}'
+
+
+def _load_policy(name, default):
+    text = os.getenv(f'RATE_LIMIT_{name.upper()}', default)
+    try:
+        return Policy.parse(text)
+    except ValueError as e:
+        print(f"[RateLimit] {e}; using {default}")
+        return Policy.parse(default)
+
+
+POLICIES = {
+    'public': _load_policy('public', '30/minute'),
+    'auth': _load_policy('auth', '100/minute'),
+    'admin': _load_policy('admin', '300/minute'),
+    'ai': _load_policy('ai', '10/minute'),
+}
+
+_stats = {'allowed': 0, 'limited': 0, 'store_errors': 0, 'conflicts': 0}
+
+
+def gcra(key, policy, now_ms=None):
+    """Take one request from key's allowance. Returns (allowed, remaining, reset_s, retry_after_s)."""
+    now = now_ms if now_ms is not None else time.time() * 1000
+
+    def step(tat):
+        tat = max(tat or 0, now)
+        if tat - now > policy.burst_ms:
+            return None, (False, tat)
+        return int(math.ceil(tat + policy.interval_ms)), (True, tat + policy.interval_ms)
+
+    # The TAT is only worth keeping until it has passed
+    allowed, tat = get_state().update(f"gcra:{key}", step, ttl=policy.period + 1)
+    remaining = max(0, int((policy.burst_ms + policy.interval_ms - (tat - now)) // policy.interval_ms))
+    reset = max(0.0, (tat - now) / 1000)
+    retry_after = 0.0 if allowed else (tat - policy.burst_ms - now) / 1000
+    return allowed, remaining, reset, retry_after
+
+
+def caller_identity():
+    """Bucket for this request: an existing active API key, a verified user, or the client IP."""
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        key_type = 'ai' if api_key.startswith(API_KEY_PREFIXES['ai']) else 'standard'
+        # The format check is one HMAC; only keys passing it cost a (cached) lookup
+        key_data = lookup_key(api_key, key_type) if check_api_key_format(api_key, key_type) else None
+        if key_data and key_data['is_active']:
+            return 'key:' + hashlib.sha256(api_key.encode()).hexdigest()[:24]
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        payload = decode_token(auth[7:])
+        if payload and payload.get('type') == 'access':
+            return f"user:{payload['user_id']}"
+    return 'ip:' + (request.remote_addr or '-')
+
+
+def route_class(path):
+    if path in EXEMPT_PATHS:
+        return None
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+def _apply(key, policy):
+    """Run the limiter and remember the tightest result for the response headers; None if allowed."""
+    try:
+        allowed, remaining, reset, retry_after = gcra(key, policy)
+    except StateConflict:
+        # The store is up but this caller's bucket is too contended to update: that is a flood, not an outage
+        _stats['limited'] += 1
+        _stats['conflicts'] += 1
+        resp = jsonify({'error': 'Rate limit exceeded', 'retry_after': 1,
+                        'policy': f'{policy.count} per {policy.period:g}s'})
+        resp.headers['Retry-After'] = '1'
+        return resp, 429
+    except StateUnavailable as e:
+        # Fail open: an unreachable store must not take the API down with it
+        _stats['store_errors'] += 1
+        print(f"[RateLimit] State backend unavailable: {e}")
+        return None
+    current = g.get('rate_limit')
+    if current is None or remaining < current[1]:
+        g.rate_limit = (policy, remaining, reset)
+    if allowed:
+        _stats['allowed'] += 1
+        return None
+    _stats['limited'] += 1
+    resp = jsonify({'error': 'Rate limit exceeded', 'retry_after': math.ceil(retry_after),
+                    'policy': f'{policy.count} per {policy.period:g}s'})
+    resp.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return resp, 429
+
+
+# ============ HOOKS ============
+def check_rate_limit():
+    """before_request: limit /api requests by route class and caller."""
+    if not RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+        return None
+    name = route_class(request.path)
+    if name is None:
+        return None
+    return _apply(f"{name}:{caller_identity()}", POLICIES[name])
+
+
+def add_rate_limit_headers(response):
+    """after_request: RateLimit-* headers for the tightest policy this request was checked against."""
+    limit = g.get('rate_limit')
+    if limit is not None:
+        policy, remaining, reset = limit
+        response.headers['RateLimit-Limit'] = str(policy.count)
+        response.headers['RateLimit-Remaining'] = str(remaining)
+        response.headers['RateLimit-Reset'] = str(math.ceil(reset))
+        response.headers['RateLimit-Policy'] = policy.header()
+    return response
+
+
+def rate_limit(max_calls, window_seconds):
+    """Extra per-IP limit for one endpoint (register, login), on top of its route class."""
+    policy = Policy(max_calls, window_seconds)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                limited = _apply(f"{f.__name__}:ip:{request.remote_addr}", policy)
+                if limited is not None:
+                    return limited
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def rate_limit_stats():
+    return dict(_stats, enabled=RATE_LIMIT_ENABLED,
+                policies={name: p.header() for name, p in POLICIES.items()})
@@ -0,0 +1,203 @@
+"""
+HTTP Playground v3.0 — Module Registry
+One declarative list of every module. Routes (modules.py), page metadata (app.py),
+Deep Freeze (freeze.py) and the startup planners (indexes, search, counters) all read it.
+SQL statements, column lists and field validators are compiled once at import time.
+"""
+
+# ================================================================
+# MODULE SPECS (order = order shown on the site and in /api/info)
+# ================================================================
+MODULE_SPECS = [
+    {'name': 'books', 'table': 'books', 'title': 'Library System', 'icon': '📚',
+     'fields': {'title': {'type': 'text', 'required': True}, 'author': {'type': 'text', 'required': True},
+                'isbn': {'type': 'text'}, 'genre': {'type': 'text'}, 'year': {'type': 'number'}, 'available': {'type': 'number'}},
+     'search_fields': ['title', 'author', 'isbn'],
+     'filter_fields': ['genre', 'year', 'available'],
+     'composite_filters': [('genre', 'year')]},
+    {'name': 'menu', 'table': 'menu_items', 'title': 'Restaurant Menu', 'icon': '🍽️',
+     'fields': {'name': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
+                'price': {'type': 'number', 'required': True}, 'category': {'type': 'text'}, 'is_available': {'type': 'number'}},
+     'search_fields': ['name', 'description'],
+     'filter_fields': ['category', 'is_available']},
+    {'name': 'tasks', 'table': 'tasks', 'title': 'Task Manager', 'icon': '✅',
+     'fields': {'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
+                'status': {'type': 'text'}, 'priority': {'type': 'text'}, 'due_date': {'type': 'text'}, 'assigned_to': {'type': 'text'}},
+     'search_fields': ['title', 'description', 'assigned_to'],
+     'filter_fields': ['status', 'priority', 'assigned_to'],
+     'composite_filters': [('status', 'priority')]},
+    {'name': 'students', 'table': 'students', 'title': 'Student Management', 'icon': '🎓',
+     'fields': {'name': {'type': 'text', 'required': True}, 'email': {'type': 'text'},
+                'student_id': {'type': 'text'}, 'major': {'type': 'text'}, 'gpa': {'type': 'number'}, 'enrollment_year': {'type': 'number'}},
+     'search_fields': ['name', 'email', 'student_id'],
+     'filter_fields': ['major', 'enrollment_year']},
+    {'name': 'notes', 'table': 'notes', 'title': 'Notes System', 'icon': '📝',
+     'fields': {'title': {'type': 'text', 'required': True}, 'content': {'type': 'content'},
+                'category': {'type': 'text'}, 'is_pinned': {'type': 'number'}},
+     'search_fields': ['title', 'content'],
+     'filter_fields': ['category', 'is_pinned']},
+    {'name': 'files', 'table': 'files', 'title': 'File Manager', 'icon': '📁', 'crud': False,
+     # multipart upload routes are hand-written in modules.py; columns used by Deep Freeze restores
+     'columns': ['original_name', 'stored_name', 'file_type', 'file_size']},
+    {'name': 'blog', 'table': 'blog_posts', 'title': 'Blog Platform', 'icon': '✍️',
+     'fields': {'title': {'type': 'text', 'required': True}, 'content': {'type': 'content', 'required': True},
+                'author': {'type': 'text'}, 'tags': {'type': 'text'}, 'is_published': {'type': 'number'}},
+     'search_fields': ['title', 'content', 'author', 'tags'],
+     'filter_fields': ['author', 'is_published']},
+    {'name': 'inventory', 'table': 'inventory', 'title': 'Inventory System', 'icon': '📦',
+     'fields': {'name': {'type': 'text', 'required': True}, 'sku': {'type': 'text'},
+                'quantity': {'type': 'number'}, 'price': {'type': 'number'}, 'category': {'type': 'text'}, 'warehouse': {'type': 'text'}},
+     'search_fields': ['name', 'sku'],
+     'filter_fields': ['category', 'warehouse']},
+    {'name': 'products', 'table': 'products', 'title': 'Product Store', 'icon': '🛍️',
+     'fields': {'name': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
+                'price': {'type': 'number', 'required': True}, 'category': {'type': 'text'}, 'brand': {'type': 'text'},
+                'rating': {'type': 'number'}, 'stock': {'type': 'number'}, 'image_url': {'type': 'text'}},
+     'search_fields': ['name', 'description', 'brand'],
+     'filter_fields': ['category', 'brand']},
+    {'name': 'movies', 'table': 'movies', 'title': 'Movie Database', 'icon': '🎬',
+     'fields': {'title': {'type': 'text', 'required': True}, 'director': {'type': 'text'},
+                'genre': {'type': 'text'}, 'year': {'type': 'number'}, 'rating': {'type': 'number'},
+                'runtime': {'type': 'number'}, 'language': {'type': 'text'}},
+     'search_fields': ['title', 'director'],
+     'filter_fields': ['genre', 'year', 'language'],
+     'composite_filters': [('genre', 'year')]},
+    {'name': 'recipes', 'table': 'recipes', 'title': 'Recipe Book', 'icon': '🧑‍🍳',
+     'fields': {'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
+                'cuisine': {'type': 'text'}, 'difficulty': {'type': 'text'}, 'prep_time': {'type': 'number'},
+                'cook_time': {'type': 'number'}, 'servings': {'type': 'number'}, 'ingredients': {'type': 'content'}},
+     'search_fields': ['title', 'description', 'cuisine', 'ingredients'],
+     'filter_fields': ['cuisine', 'difficulty']},
+    {'name': 'events', 'table': 'events', 'title': 'Event Calendar', 'icon': '📅',
+     'fields': {'title': {'type': 'text', 'required': True}, 'description': {'type': 'content'},
+                'location': {'type': 'text'}, 'event_date': {'type': 'text'}, 'event_time': {'type': 'text'},
+                'category': {'type': 'text'}, 'capacity': {'type': 'number'}, 'organizer': {'type': 'text'}},
+     'search_fields': ['title', 'description', 'location', 'organizer'],
+     'filter_fields': ['category', 'event_date']},
+    {'name': 'contacts', 'table': 'contacts', 'title': 'Address Book', 'icon': '📇',
+     'fields': {'first_name': {'type': 'text', 'required': True}, 'last_name': {'type': 'text'},
+                'email': {'type': 'text'}, 'phone': {'type': 'text'}, 'company': {'type': 'text'},
+                'job_title': {'type': 'text'}, 'city': {'type': 'text'}, 'country': {'type': 'text'}},
+     'search_fields': ['first_name', 'last_name', 'email', 'company'],
+     'filter_fields': ['company', 'country', 'city'],
+     'composite_filters': [('country', 'city')]},
+    {'name': 'songs', 'table': 'songs', 'title': 'Music Library', 'icon': '🎵',
+     'fields': {'title': {'type': 'text', 'required': True}, 'artist': {'type': 'text', 'required': True},
+                'album': {'type': 'text'}, 'genre': {'type': 'text'}, 'duration': {'type': 'number'},
+                'year': {'type': 'number'}, 'is_explicit': {'type': 'number'}},
+     'search_fields': ['title', 'artist', 'album'],
+     'filter_fields': ['genre', 'year', 'is_explicit'],
+     'composite_filters': [('genre', 'year')]},
+    {'name': 'quotes', 'table': 'quotes', 'title': 'Quotes Collection', 'icon': '💬',
+     'fields': {'text': {'type': 'content', 'required': True}, 'author': {'type': 'text', 'required': True},
+                'category': {'type': 'text'}, 'language': {'type': 'text'}},
+     'search_fields': ['text', 'author'],
+     'filter_fields': ['category', 'language']},
+    {'name': 'countries', 'table': 'countries', 'title': 'World Countries', 'icon': '🌍',
+     'fields': {'name': {'type': 'text', 'required': True}, 'capital': {'type': 'text'},
+                'continent': {'type': 'text'}, 'population': {'type': 'number'}, 'area_km2': {'type': 'number'},
+                'currency': {'type': 'text'}, 'language': {'type': 'text'}, 'calling_code': {'type': 'text'}},
+     'search_fields': ['name', 'capital', 'currency'],
+     'filter_fields': ['continent', 'language']},
+    {'name': 'jokes', 'table': 'jokes', 'title': 'Joke API', 'icon': '😂',
+     'fields': {'setup': {'type': 'content', 'required': True}, 'punchline': {'type': 'content', 'required': True},
+                'category': {'type': 'text'}, 'rating': {'type': 'number'}},
+     'search_fields': ['setup', 'punchline'],
+     'filter_fields': ['category']},
+    {'name': 'vehicles', 'table': 'vehicles', 'title': 'Vehicle Market', 'icon': '🚗',
+     'fields': {'make': {'type': 'text', 'required': True}, 'model': {'type': 'text', 'required': True},
+                'year': {'type': 'number'}, 'type': {'type': 'text'}, 'color': {'type': 'text'},
+                'price': {'type': 'number'}, 'fuel_type': {'type': 'text'}, 'mileage': {'type': 'number'}},
+     'search_fields': ['make', 'model'],
+     'filter_fields': ['type', 'fuel_type', 'year', 'color'],
+     'composite_filters': [('type', 'fuel_type')]},
+    {'name': 'courses', 'table': 'courses', 'title': 'Online Courses', 'icon': '🎓',
+     'fields': {'title': {'type': 'text', 'required': True}, 'instructor': {'type': 'text'},
+                'category': {'type': 'text'}, 'level': {'type': 'text'}, 'duration_hours': {'type': 'number'},
+                'price': {'type': 'number'}, 'rating': {'type': 'number'}, 'enrolled': {'type': 'number'}},
+     'search_fields': ['title', 'instructor', 'category'],
+     'filter_fields': ['category', 'level']},
+    {'name': 'pets', 'table': 'pets', 'title': 'Pet Adoption', 'icon': '🐾',
+     'fields': {'name': {'type': 'text', 'required': True}, 'species': {'type': 'text', 'required': True},
+                'breed': {'type': 'text'}, 'age': {'type': 'number'}, 'color': {'type': 'text'},
+                'weight': {'type': 'number'}, 'adopted': {'type': 'number'}, 'shelter': {'type': 'text'}},
+     'search_fields': ['name', 'breed', 'shelter'],
+     'filter_fields': ['species', 'adopted', 'shelter']},
+    {'name': 'weather', 'table': None, 'title': 'Weather API', 'icon': '🌤️', 'crud': False},
+    {'name': 'ai', 'table': None, 'title': 'AI Assistant', 'icon': '🤖', 'crud': False},
+]
+
+# Bookkeeping columns every module table carries besides its data columns
+INTERNAL_COLUMNS = ('id', 'is_frozen', 'created_by_user', 'created_by_key', 'created_at')
+
+
+class CompiledModule:
+    """A module spec with its SQL and column lists built once, so handlers only bind parameters."""
+
+    def __init__(self, spec):
+        self.name = spec['name']
+        self.table = spec.get('table')
+        self.title = spec['title']
+        self.icon = spec['icon']
+        self.endpoint = f"/api/{self.name}"
+        self.crud = spec.get('crud', True)
+        self.fields = dict(spec.get('fields', {}))
+        self.columns = tuple(spec.get('columns') or self.fields)
+        self.search_fields = tuple(spec.get('search_fields', ()))
+        self.filter_fields = tuple(spec.get('filter_fields', ()))
+        self.composite_filters = tuple(tuple(c) for c in spec.get('composite_filters', ()))
+        # (field, required, type) in declaration order, consumed by the request validators
+        self.validators = tuple((f, bool(info.get('required')), info.get('type', 'text')) for f, info in self.fields.items())
+        # Column-subset statements (partial POST/PUT bodies, old snapshots) are built once per shape
+        self._insert_sql = {}
+        self._update_sql = {}
+        self._restore_sql = {}
+        if self.table:
+            t = self.table
+            self.select_all_sql = f"SELECT {t}.* FROM {t}"
+            self.select_by_id_sql = f"SELECT * FROM {t} WHERE id = ?"
+            self.exists_sql = f"SELECT id FROM {t} WHERE id = ?"
+            self.delete_by_id_sql = f"DELETE FROM {t} WHERE id = ?"
+            self.delete_user_created_sql = f"DELETE FROM {t} WHERE id = ? AND is_frozen = 0"
+            self.insert_sql = self.insert_for(self.columns)
+            self.update_sql = self.update_for(self.columns)
+            self.restore_sql = self.restore_for(self.columns)
+
+    def insert_for(self, cols):
+        """INSERT of a user-created row carrying `cols`; omitted columns keep their DB defaults."""
+        key = tuple(cols)
+        sql = self._insert_sql.get(key)
+        if sql is None:
+            names = ','.join(key + ('created_by_user', 'created_by_key'))
+            sql = self._insert_sql[key] = f"INSERT INTO {self.table} ({names}) VALUES ({','.join('?' * (len(key) + 2))})"
+        return sql
+
+    def update_for(self, cols):
+        """UPDATE of `cols` by id — used by PUT and by Deep Freeze update reverts."""
+        key = tuple(cols)
+        sql = self._update_sql.get(key)
+        if sql is None:
+            sql = self._update_sql[key] = f"UPDATE {self.table} SET {', '.join(f'{c} = ?' for c in key)} WHERE id = ?"
+        return sql
+
+    def restore_for(self, cols):
+        """INSERT OR IGNORE re-creating a deleted row (`cols` + id, is_frozen) for Deep Freeze restores."""
+        key = tuple(cols)
+        sql = self._restore_sql.get(key)
+        if sql is None:
+            names = ', '.join(key + ('id', 'is_frozen'))
+            sql = self._restore_sql[key] = f"INSERT OR IGNORE INTO {self.table} ({names}) VALUES ({', '.join('?' * (len(key) + 2))})"
+        return sql
+
+    def snapshot_columns(self, snapshot):
+        """Data columns present in a Deep Freeze snapshot, in table order."""
+        return tuple(c for c in self.columns if c in snapshot)
+
+
+MODULES = {spec['name']: CompiledModule(spec) for spec in MODULE_SPECS}
+
+# Modules backed by a table, and the subset served by the generic CRUD factory
+TABLE_MODULES = [m for m in MODULES.values() if m.table]
+CRUD_MODULES = [m for m in TABLE_MODULES if m.crud]
+MODULES_BY_TABLE = {m.table: m for m in TABLE_MODULES}
+MODULE_TABLES = [m.table for m in TABLE_MODULES]
@@ -0,0 +1,310 @@
+"""
+HTTP Playground v3.0 — Retention & Compaction
+Background job that keeps the log-style tables bounded:
+
+- audit_logs / login_attempts: dropped after an age limit and capped at a row count
+- rate_limits: legacy table, nothing writes it any more; old windows are pruned
+- user_modifications: only entries Deep Freeze failed to process, long past expiry
+
+Deletes run in small batches, each its own short transaction, with a pause in
+between so request writers can take the SQLite write lock. Freed pages are
+returned to the OS with incremental vacuum.
+
+Every worker runs a candidate (started after the fork under gunicorn, see
+gunicorn.conf.py); one of them holds a leader lease and prunes, the same way
+Deep Freeze picks its reverter. The time of the next pass and the run
+counters live in the state backend, so a new leader keeps the schedule and
+every worker reports the same stats.
+"""
+import os
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+from database import get_db, SHARDS, shards_with, shard_path
+from state import get_state, StateUnavailable
+from freeze import StateLease, FileLease
+
+RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'true').lower() in ('1', 'true', 'yes', 'on')
+RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 3600))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+RETENTION_PAUSE_MS = float(os.getenv('RETENTION_PAUSE_MS', 20))
+RETENTION_MAX_RUN_SECONDS = float(os.getenv('RETENTION_MAX_RUN_SECONDS', 30))
+RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 1000))
+# import: started when app.py is imported; worker: by gunicorn.conf.py in each worker; off: never here
+RETENTION_DAEMON = os.getenv('RETENTION_DAEMON', 'import')
+# Longer than a pass (RETENTION_MAX_RUN_SECONDS), so the lease never lapses mid-run
+RETENTION_LEASE_SECONDS = float(os.getenv('RETENTION_LEASE_SECONDS', max(60.0, RETENTION_MAX_RUN_SECONDS * 3)))
+
+# table -> time column, max age in days (None = no age limit), max rows (None = uncapped)
+RETENTION_POLICIES = {
+    'audit_logs': {
+        'column': 'created_at',
+        'max_age_days': int(os.getenv('RETENTION_AUDIT_DAYS', 90)),
+        'max_rows': int(os.getenv('RETENTION_AUDIT_MAX_ROWS', 200000)),
+    },
+    'login_attempts': {
+        'column': 'created_at',
+        'max_age_days': int(os.getenv('RETENTION_LOGIN_DAYS', 30)),
+        'max_rows': int(os.getenv('RETENTION_LOGIN_MAX_ROWS', 200000)),
+    },
+    'rate_limits': {
+        'column': 'window_start',
+        'max_age_days': 1,
+        'max_rows': None,
+    },
+    # Never capped by count: every row here is a pending revert
+    'user_modifications': {
+        'column': 'expires_at',
+        'max_age_days': int(os.getenv('RETENTION_MODIFICATIONS_GRACE_DAYS', 7)),
+        'max_rows': None,
+    },
+}
+
+_stats = {
+    'runs': 0,
+    'last_run_at': None,
+    'last_run_ms': 0,
+    'last_run_complete': True,
+    'batches': 0,
+    'deleted': {table: 0 for table in RETENTION_POLICIES},
+    'vacuumed_pages': 0,
+    'errors': 0,
+}
+
+
+def ensure_auto_vacuum():
+    """Switch every shard file to auto_vacuum=INCREMENTAL once (needs a one-off full VACUUM)."""
+    if not RETENTION_ENABLED:
+        return
+    for shard in SHARDS:
+        conn = get_db(shard=shard)
+        try:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode != 2:
+                started = time.time()
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                print(f"[Retention] Enabled incremental auto_vacuum on {shard} ({(time.time() - started) * 1000:.0f} ms VACUUM)")
+        except Exception as e:
+            print(f"[Retention] Could not enable auto_vacuum on {shard}: {e}")
+        finally:
+            conn.close()
+
+
+def _delete_batch(conn, table, where, params, limit):
+    cur = conn.execute(
+        f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT ?)",
+        (*params, limit)
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def _prune_plan(conn, table, policy, now):
+    """(where, params) predicates for this run, age first then row cap."""
+    plan = []
+    if policy['max_age_days'] is not None:
+        cutoff = (now - timedelta(days=policy['max_age_days'])).strftime('%Y-%m-%d %H:%M:%S')
+        plan.append((f"{policy['column']} < ?", (cutoff,)))
+    if policy['max_rows']:
+        # Highest id that falls outside the newest max_rows rows
+        row = conn.execute(
+            f"SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?", (policy['max_rows'],)
+        ).fetchone()
+        if row:
+            plan.append(("id <= ?", (row[0],)))
+    return plan
+
+
+def run_retention(batch_size=RETENTION_BATCH_SIZE, max_seconds=RETENTION_MAX_RUN_SECONDS):
+    """One pruning pass over every policy. Stops early once max_seconds is spent."""
+    started = time.time()
+    deadline = started + max_seconds
+    pause = RETENTION_PAUSE_MS / 1000.0
+    now = datetime.utcnow()
+    complete = True
+    run = {'batches': 0, 'vacuumed_pages': 0, 'errors': 0, 'deleted': {table: 0 for table in RETENTION_POLICIES}}
+    for table, policy in RETENTION_POLICIES.items():
+        for shard in shards_with(table):
+            conn = get_db(shard=shard)
+            try:
+                for where, params in _prune_plan(conn, table, policy, now):
+                    while True:
+                        if time.time() >= deadline:
+                            complete = False
+                            break
+                        deleted = _delete_batch(conn, table, where, params, batch_size)
+                        run['batches'] += 1
+                        run['deleted'][table] += deleted
+                        if deleted < batch_size:
+                            break
+                        time.sleep(pause)
+            except Exception as e:
+                run['errors'] += 1
+                complete = False
+                print(f"[Retention] {table} ({shard}) error: {e}")
+            finally:
+                conn.close()
+    for shard in SHARDS:
+        conn = get_db(shard=shard)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free:
+                    pages = min(free, RETENTION_VACUUM_PAGES)
+                    conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+                    run['vacuumed_pages'] += pages
+        except Exception as e:
+            run['errors'] += 1
+            print(f"[Retention] Vacuum error ({shard}): {e}")
+        finally:
+            conn.close()
+    _record_run(run, started, complete)
+    return complete
+
+
+# ============ RUN STATS ============
+# Kept in the state backend when it is shared (retention:<counter>), so any worker can report them
+_COUNTERS = ('runs', 'batches', 'vacuumed_pages', 'errors')
+
+
+def _set(state, key, value):
+    state.update(key, lambda _: (value, None))
+
+
+def _record_run(run, started, complete):
+    elapsed_ms = round((time.time() - started) * 1000, 1)
+    _stats['runs'] += 1
+    for name in _COUNTERS[1:]:
+        _stats[name] += run[name]
+    for table, n in run['deleted'].items():
+        _stats['deleted'][table] += n
+    _stats.update(last_run_at=datetime.utcfromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'),
+                  last_run_ms=elapsed_ms, last_run_complete=complete)
+    state = get_state()
+    if not state.shared:
+        return
+    try:
+        state.incr('retention:runs', 1)
+        for name in _COUNTERS[1:]:
+            if run[name]:
+                state.incr(f'retention:{name}', run[name])
+        for table, n in run['deleted'].items():
+            if n:
+                state.incr(f'retention:deleted:{table}', n)
+        _set(state, 'retention:last_run_at', int(started))
+        _set(state, 'retention:last_run_ms', int(elapsed_ms))
+        _set(state, 'retention:last_run_complete', int(complete))
+    except StateUnavailable as e:
+        print(f"[Retention] Could not record run stats: {e}")
+
+
+def _shared_stats():
+    """_stats as recorded in the state backend by whichever worker ran the passes; None if unavailable."""
+    state = get_state()
+    if not state.shared:
+        return None
+    try:
+        stats = {name: state.get(f'retention:{name}') or 0 for name in _COUNTERS}
+        stats['deleted'] = {table: state.get(f'retention:deleted:{table}') or 0 for table in RETENTION_POLICIES}
+        last = state.get('retention:last_run_at')
+        complete = state.get('retention:last_run_complete')
+        stats.update(last_run_at=datetime.utcfromtimestamp(last).strftime('%Y-%m-%d %H:%M:%S') if last else None,
+                     last_run_ms=state.get('retention:last_run_ms') or 0,
+                     last_run_complete=bool(complete) if complete is not None else True)
+    except StateUnavailable:
+        return None
+    return stats
+
+
+# ============ DAEMON ============
+class RetentionDaemon:
+    """Leader candidate: heartbeats the lease every third of its ttl and, while it holds it, prunes when due."""
+
+    def __init__(self):
+        self.lease = None
+        self.leading = False
+        self._pid = None
+        self._next_run = 0  # used when the state backend is not shared
+
+    def _due(self, state):
+        if state.shared:
+            return time.time() >= (state.get('retention:next_run') or 0)
+        return time.time() >= self._next_run
+
+    def _schedule(self, state, complete):
+        # A pass cut short by the time budget resumes soon instead of in an interval
+        self._next_run = int(time.time() + (RETENTION_INTERVAL if complete else 60))
+        if state.shared:
+            _set(state, 'retention:next_run', self._next_run)
+
+    def run(self):
+        while True:
+            try:
+                self.leading = self.lease.acquire()
+            except Exception as e:
+                # Cannot prove we hold it: stand down rather than risk two runners
+                print(f"[Retention] Leader lease error: {e}")
+                self.leading = False
+            if self.leading:
+                state = get_state()
+                try:
+                    if self._due(state):
+                        complete = run_retention()
+                        self._schedule(state, complete)
+                except Exception as e:
+                    print(f"[Retention] Error: {e}")
+            time.sleep(self.lease.ttl / 3)
+
+    def start(self):
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        self.leading = False
+        self.lease = (StateLease('retention:leader', RETENTION_LEASE_SECONDS) if get_state().shared
+                      else FileLease(shard_path('main') + '.retention-leader', RETENTION_LEASE_SECONDS))
+        threading.Thread(target=self.run, daemon=True, name='retention-daemon').start()
+        atexit.register(self.stop)
+        return True
+
+    def stop(self):
+        if self._pid == os.getpid() and self.leading:
+            try:
+                self.lease.release()
+            except Exception:
+                pass
+
+
+_daemon = RetentionDaemon()
+
+
+def start_retention_daemon():
+    """Start this process's candidate (once per process). Under gunicorn, call it in each worker, not the master."""
+    if not RETENTION_ENABLED or RETENTION_DAEMON == 'off' or not _daemon.start():
+        return None
+    print(f"[Retention] 🧹 Retention daemon candidate started in {os.getpid()} "
+          f"(runs every {RETENTION_INTERVAL}s, {_daemon.lease.kind} lease)")
+    return _daemon
+
+
+def retention_stats():
+    """Run counters plus on-disk size summed over every shard file."""
+    db_bytes = free_bytes = wal_bytes = 0
+    for shard in SHARDS:
+        conn = get_db(shard=shard)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        db_bytes += page_size * conn.execute("PRAGMA page_count").fetchone()[0]
+        free_bytes += page_size * conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.close()
+        wal = shard_path(shard) + '-wal'
+        wal_bytes += os.path.getsize(wal) if os.path.exists(wal) else 0
+    stats = _shared_stats() or dict(_stats, deleted=dict(_stats['deleted']))
+    return {
+        **stats,
+        'leader': _daemon.leading and _daemon._pid == os.getpid(),
+        'policies': RETENTION_POLICIES,
+        'db_bytes': db_bytes,
+        'free_bytes': free_bytes,
+        'wal_bytes': wal_bytes,
+    }
@@ -0,0 +1,159 @@
+"""
+HTTP Playground v3.0 — Full-Text Search
+FTS5 shadow table per module, kept in sync by triggers on the base table.
+Deep Freeze reverts go through plain SQL on the base table, so the triggers cover them too.
+
+Tokenizer (SEARCH_TOKENIZER):
+- trigram   (default) substring matching, same results as the old LIKE '%term%'
+- unicode61 word matching with prefix indexes, for prefix / word queries
+"""
+import os
+import re
+import sqlite3
+from database import get_db, fingerprint, schema_state, mark_schema_state, SHARDS
+
+SEARCH_TOKENIZER = os.getenv('SEARCH_TOKENIZER', 'trigram')
+TOKENIZERS = {
+    'trigram': "tokenize='trigram'",
+    'unicode61': "tokenize='unicode61 remove_diacritics 2', prefix='2 3'",
+}
+SEARCH_MODES = ('substring', 'prefix', 'words')
+TRIGRAM_MIN_LEN = 3
+
+# Base tables whose shadow FTS table is built and live in this process
+FTS_TABLES = set()
+
+
+def fts5_available():
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _fts_ddl(table, cols):
+    options = TOKENIZERS.get(SEARCH_TOKENIZER, TOKENIZERS['trigram'])
+    return (f"CREATE VIRTUAL TABLE {table}_fts USING fts5({', '.join(cols)}, "
+            f"content='{table}', content_rowid='id', {options})")
+
+
+def _trigger_ddl(table, cols):
+    col_list = ', '.join(cols)
+    new_vals = ', '.join(f'new.{c}' for c in cols)
+    old_vals = ', '.join(f'old.{c}' for c in cols)
+    fts = f'{table}_fts'
+    return [
+        f"""CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {col_list}) VALUES (new.id, {new_vals});
+        END""",
+        f"""CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+        END""",
+        f"""CREATE TRIGGER {fts}_au AFTER UPDATE OF id, {col_list} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts} (rowid, {col_list}) VALUES (new.id, {new_vals});
+        END""",
+    ]
+
+
+def _drop_fts(conn, table):
+    for suffix in ('ai', 'ad', 'au'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+    conn.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+def ensure_search_indexes(modules):
+    """
+    Create (or rebuild, when the searched columns / tokenizer changed) the
+    shadow FTS table and its sync triggers for every module with search_fields.
+    """
+    FTS_TABLES.clear()
+    if not fts5_available():
+        print("[Search] FTS5 not available — ?search= falls back to LIKE scans")
+        return {'enabled': False, 'rebuilt': []}
+
+    wanted = {m.table: list(m.search_fields) for m in modules if m.search_fields}
+    plan_fp = fingerprint((SEARCH_TOKENIZER, sorted(wanted.items()), SHARDS))
+    if schema_state('search')[1] == plan_fp:
+        FTS_TABLES.update(wanted)
+        return {'enabled': True, 'tokenizer': SEARCH_TOKENIZER, 'rebuilt': []}
+
+    rebuilt = []
+    for table, cols in wanted.items():
+        # The FTS table and its triggers live in the same file as the base table
+        conn = get_db(table)
+        existing = {
+            r['name']: r['sql'] for r in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE ?",
+                (f'{table}_fts%',)
+            ).fetchall()
+        }
+        ddl = _fts_ddl(table, cols)
+        triggers = [f'{table}_fts_{s}' for s in ('ai', 'ad', 'au')]
+        if existing.get(f'{table}_fts') != ddl or not all(t in existing for t in triggers):
+            _drop_fts(conn, table)
+            conn.execute(ddl)
+            for stmt in _trigger_ddl(table, cols):
+                conn.execute(stmt)
+            conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+            rebuilt.append(table)
+        conn.commit()
+        conn.close()
+        FTS_TABLES.add(table)
+    conn = get_db()
+    mark_schema_state(conn, 'search', fingerprint=plan_fp)
+    conn.commit()
+    conn.close()
+    return {'enabled': True, 'tokenizer': SEARCH_TOKENIZER, 'rebuilt': rebuilt}
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def match_expression(term, mode='substring'):
+    """Translate a ?search= term into an FTS5 MATCH expression, or None when FTS cannot answer it."""
+    term = term.strip()
+    if not term:
+        return None
+    if mode not in SEARCH_MODES:
+        mode = 'substring'
+    if SEARCH_TOKENIZER == 'trigram':
+        # Trigram phrases are substring matches; shorter terms have no trigrams to look up
+        if len(term) < TRIGRAM_MIN_LEN:
+            return None
+        if mode == 'substring':
+            return _quote(term)
+        tokens = [t for t in re.split(r'\s+', term) if len(t) >= TRIGRAM_MIN_LEN]
+        return ' AND '.join(_quote(t) for t in tokens) or None
+    tokens = re.findall(r'\w+', term)
+    if not tokens:
+        return None
+    if mode == 'words':
+        return ' AND '.join(_quote(t) for t in tokens)
+    # A word tokenizer cannot do true substrings — prefix queries are the closest match
+    return ' AND '.join(_quote(t) + '*' for t in tokens)
+
+
+def search_filter(table, term, mode='substring'):
+    """(sql, params) restricting `table` to matching ids, or None to fall back to LIKE."""
+    if table not in FTS_TABLES:
+        return None
+    expr = match_expression(term, mode)
+    if expr is None:
+        return None
+    return f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)", [expr]
+
+
+def ranked_join(table, term, mode='substring'):
+    """(join_sql, params) exposing bm25 as _score for ORDER BY, or None to fall back to LIKE."""
+    if table not in FTS_TABLES:
+        return None
+    expr = match_expression(term, mode)
+    if expr is None:
+        return None
+    return (f"JOIN (SELECT rowid AS _rid, bm25({table}_fts) AS _score FROM {table}_fts "
+            f"WHERE {table}_fts MATCH ?) AS _fts ON _fts._rid = {table}.id"), [expr]
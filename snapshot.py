@@ -0,0 +1,283 @@
+"""
+HTTP Playground v3.0 — Baseline Snapshots
+A copy of every module's frozen rows (is_frozen = 1) kept in its own SQLite
+file, SNAPSHOT_PATH (platform.snapshot.db next to DB_PATH by default). One
+table per module, no indexes or triggers, vacuumed after each capture.
+Frozen rows a user has edited in shared mode are captured as they were
+before the edit, from their pending user_modifications.
+
+Restoring a module resets it to that baseline in one transaction per shard:
+the snapshot file is ATTACHed, the module table is emptied and refilled with
+INSERT ... SELECT, and its pending user_modifications and overlay rows are
+dropped, so Deep Freeze has nothing left to revert. The row-count and search
+triggers are lifted for the copy (so the DELETE is a truncate) and the
+counter and FTS index are recomputed once before the same commit.
+
+The snapshot is captured at startup for any module it does not hold yet.
+Re-capture after changing the baseline on purpose:
+
+    python snapshot.py capture [module ...]
+    python snapshot.py restore [module ...]
+    python snapshot.py info
+"""
+import os
+import time
+import sqlite3
+from datetime import datetime
+from database import get_db, shard_for, shard_path
+from registry import MODULES, MODULES_BY_TABLE, MODULE_TABLES
+from overlay import overlay_table
+from codec import decode_snapshot, SnapshotUnreadable
+
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH') or shard_path('snapshot')
+
+# Written in the snapshot file: what each table holds and when it was taken
+META_DDL = """CREATE TABLE IF NOT EXISTS snap.snapshot_meta (
+    table_name TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    captured_at TIMESTAMP NOT NULL
+)"""
+
+_stats = {'captures': 0, 'restores': 0, 'rows_restored': 0, 'last_restore_ms': 0.0, 'max_restore_ms': 0.0}
+
+
+def resolve_tables(names=None):
+    """Module tables for module (or table) names; every module table when `names` is empty."""
+    if not names:
+        return list(MODULE_TABLES)
+    tables = []
+    for name in names:
+        module = MODULES.get(name) or MODULES_BY_TABLE.get(name)
+        if module is None:
+            raise KeyError(name)
+        tables.append(module.table)
+    return tables
+
+
+def _by_shard(tables):
+    groups = {}
+    for table in tables:
+        groups.setdefault(shard_for(table), []).append(table)
+    return groups
+
+
+class _Attached:
+    """The snapshot file ATTACHed as `snap` to a pooled write connection for one shard, detached on exit."""
+
+    def __init__(self, shard):
+        self.shard = shard
+
+    def __enter__(self):
+        self.conn = get_db(shard=self.shard, write=True)
+        self.conn.execute("ATTACH DATABASE ? AS snap", (SNAPSHOT_PATH,))
+        return self.conn
+
+    def __exit__(self, *exc):
+        if exc[0] is not None and self.conn.in_transaction:
+            self.conn.rollback()
+        # The connection goes back to the pool; it must not keep the file attached
+        self.conn.execute("DETACH DATABASE snap")
+        self.conn.close()
+
+
+def _suspend_triggers(conn, table):
+    """
+    Drop the row-count and search triggers of `table` for a bulk copy; returns their DDL, or None
+    (triggers left in place) if the table has any other trigger. Runs inside the restore transaction.
+    """
+    known = {f'{table}_count_ai', f'{table}_count_ad', f'{table}_fts_ai', f'{table}_fts_ad', f'{table}_fts_au'}
+    triggers = conn.execute("SELECT name, sql FROM main.sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                            (table,)).fetchall()
+    if any(name not in known for name, _ in triggers):
+        return None
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER main.{name}")
+    return {name: sql for name, sql in triggers}
+
+
+def _resume_triggers(conn, table, triggers):
+    """Bring the counter and search index in line with the copied rows, then reinstall the triggers."""
+    if f'{table}_count_ai' in triggers:
+        conn.execute(f"UPDATE main.row_counts SET row_count = (SELECT COUNT(*) FROM main.{table}) WHERE table_name = ?",
+                     (table,))
+    if f'{table}_fts_ai' in triggers:
+        conn.execute(f"INSERT INTO main.{table}_fts ({table}_fts) VALUES ('rebuild')")
+    for sql in triggers.values():
+        conn.execute(sql)
+
+
+def _columns(conn, schema, table):
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+
+# ============ CAPTURE ============
+def _unwind_pending(conn, table):
+    """Put frozen rows that users have edited or removed, pending a Deep Freeze revert, back as they were."""
+    module = MODULES_BY_TABLE[table]
+    cols = [c for c in _columns(conn, 'snap', table) if c != 'id']
+    mods = conn.execute(
+        "SELECT record_id, action, original_data FROM main.user_modifications "
+        "WHERE table_name = ? AND action IN ('update', 'delete') AND original_data IS NOT NULL ORDER BY id DESC",
+        (table,)
+    ).fetchall()
+    # Newest first, so the oldest snapshot of a record is the one left standing
+    for record_id, action, raw in mods:
+        try:
+            original = decode_snapshot(module, raw)
+        except SnapshotUnreadable as e:
+            print(f"[Snapshot] Cannot decode a pending {action} of {table} #{record_id} ({e}), capturing the live row")
+            continue
+        keep = [c for c in cols if c in original]
+        if not keep:
+            continue
+        if action == 'update':
+            # Only the columns the PUT changed; rows that are not frozen are not in the snapshot to match
+            conn.execute(f"UPDATE snap.{table} SET {', '.join(f'{c} = ?' for c in keep)} WHERE id = ?",
+                         [original[c] for c in keep] + [record_id])
+        elif original.get('is_frozen'):
+            conn.execute(f"DELETE FROM snap.{table} WHERE id = ?", (record_id,))
+            conn.execute(f"INSERT INTO snap.{table} (id, {', '.join(keep)}) VALUES ({', '.join('?' * (len(keep) + 1))})",
+                         [record_id] + [original[c] for c in keep])
+
+
+def capture_snapshot(tables=None, missing_only=False):
+    """Copy the frozen rows of `tables` (default: every module) into the snapshot. Returns {table: rows}."""
+    captured = {}
+    for shard, group in _by_shard(MODULE_TABLES if tables is None else tables).items():
+        with _Attached(shard) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(META_DDL)
+            have = {r[0] for r in conn.execute("SELECT table_name FROM snap.snapshot_meta").fetchall()}
+            for table in group:
+                if missing_only and table in have:
+                    continue
+                conn.execute(f"DROP TABLE IF EXISTS snap.{table}")
+                conn.execute(f"CREATE TABLE snap.{table} AS SELECT * FROM main.{table} WHERE is_frozen = 1")
+                _unwind_pending(conn, table)
+                rows = conn.execute(f"SELECT COUNT(*) FROM snap.{table}").fetchone()[0]
+                conn.execute("INSERT OR REPLACE INTO snap.snapshot_meta (table_name, row_count, captured_at) "
+                             "VALUES (?, ?, ?)", (table, rows, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
+                captured[table] = rows
+            conn.commit()
+            if captured and not missing_only:
+                # Re-captures leave the old copies' pages free; keep the file compact
+                conn.execute("VACUUM snap")
+    if captured:
+        _stats['captures'] += 1
+    return captured
+
+
+def ensure_snapshot(tables=None):
+    """Capture every module the snapshot file does not hold yet; a no-op once it is complete."""
+    have = snapshot_info()
+    captured = capture_snapshot([t for t in tables or MODULE_TABLES if t not in have], missing_only=True)
+    if captured:
+        print(f"[Snapshot] Captured baseline of {len(captured)} modules "
+              f"({sum(captured.values())} rows) in {SNAPSHOT_PATH}")
+    return captured
+
+
+# ============ RESTORE ============
+def restore_snapshot(tables=None):
+    """
+    Reset `tables` (default: every module) to the snapshot, one transaction per shard.
+    Returns {'tables': {table: rows}, 'modifications': purged, 'overlay_rows': purged, 'ms': elapsed}.
+    """
+    started = time.perf_counter()
+    tables = tables or MODULE_TABLES
+    # Checked up front: with sharding, a shard restored before the failing one would stay restored
+    captured = snapshot_info()
+    missing = [t for t in tables if t not in captured]
+    if missing:
+        raise LookupError(f"no snapshot of {', '.join(missing)}; run: python snapshot.py capture")
+    restored, purged, overlay_purged = {}, 0, 0
+    for shard, group in _by_shard(tables).items():
+        with _Attached(shard) as conn:
+            present = {r[0] for r in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+            conn.execute("BEGIN IMMEDIATE")
+            for table in group:
+                # Columns added since the capture take their defaults
+                snap_cols = set(_columns(conn, 'snap', table))
+                cols = ', '.join(c for c in _columns(conn, 'main', table) if c in snap_cols)
+                # Without triggers the DELETE is a truncate and the copy a straight append
+                triggers = _suspend_triggers(conn, table)
+                conn.execute(f"DELETE FROM main.{table}")
+                restored[table] = conn.execute(
+                    f"INSERT INTO main.{table} ({cols}) SELECT {cols} FROM snap.{table}").rowcount
+                if triggers is not None:
+                    _resume_triggers(conn, table, triggers)
+                purged += conn.execute("DELETE FROM main.user_modifications WHERE table_name = ?",
+                                       (table,)).rowcount
+                if overlay_table(table) in present:
+                    overlay_purged += conn.execute(f"DELETE FROM main.{overlay_table(table)}").rowcount
+            conn.commit()
+    elapsed = (time.perf_counter() - started) * 1000
+    _stats['restores'] += 1
+    _stats['rows_restored'] += sum(restored.values())
+    _stats['last_restore_ms'] = round(elapsed, 2)
+    _stats['max_restore_ms'] = max(_stats['max_restore_ms'], round(elapsed, 2))
+    return {'tables': restored, 'modifications': purged, 'overlay_rows': overlay_purged, 'ms': round(elapsed, 2)}
+
+
+def snapshot_info():
+    """{table: {'rows', 'captured_at'}} as recorded in the snapshot file; {} before the first capture."""
+    if not os.path.exists(SNAPSHOT_PATH):
+        return {}
+    with _Attached('main') as conn:
+        try:
+            rows = conn.execute("SELECT table_name, row_count, captured_at FROM snap.snapshot_meta").fetchall()
+        except sqlite3.OperationalError:
+            return {}
+    return {r[0]: {'rows': r[1], 'captured_at': r[2]} for r in rows}
+
+
+def snapshot_stats():
+    size = os.path.getsize(SNAPSHOT_PATH) if os.path.exists(SNAPSHOT_PATH) else 0
+    return dict(_stats, path=SNAPSHOT_PATH, bytes=size)
+
+
+# ============ CLI ============
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('capture', 'restore', 'info'))
+    parser.add_argument('modules', nargs='*', help='module names (default: all)')
+    args = parser.parse_args()
+
+    from database import init_db
+    from counters import ensure_counters
+    from search import ensure_search_indexes
+    from overlay import ensure_overlays
+    from codec import ensure_snapshot_schemas
+    from registry import TABLE_MODULES
+    init_db()
+    # Restores lean on the count and search triggers and clear the overlays, so install them as the app would
+    ensure_search_indexes(TABLE_MODULES)
+    ensure_counters(MODULE_TABLES)
+    ensure_overlays(TABLE_MODULES)
+    ensure_snapshot_schemas(TABLE_MODULES)
+    try:
+        tables = resolve_tables(args.modules)
+    except KeyError as e:
+        parser.error(f"unknown module {e.args[0]!r}")
+
+    if args.command == 'capture':
+        for table, rows in capture_snapshot(tables).items():
+            print(f"[Snapshot] {table:<20} {rows:>7} rows")
+        print(f"[Snapshot] Wrote {SNAPSHOT_PATH} ({os.path.getsize(SNAPSHOT_PATH)} bytes)")
+    elif args.command == 'restore':
+        try:
+            result = restore_snapshot(tables)
+        except LookupError as e:
+            parser.exit(1, f"[Snapshot] {e}\n")
+        for table, rows in result['tables'].items():
+            print(f"[Snapshot] {table:<20} {rows:>7} rows")
+        print(f"[Snapshot] Restored {len(result['tables'])} modules in {result['ms']:.1f} ms "
+              f"(dropped {result['modifications']} pending modifications, {result['overlay_rows']} overlay rows)")
+    else:
+        for table, info in sorted(snapshot_info().items()):
+            print(f"[Snapshot] {table:<20} {info['rows']:>7} rows   captured {info['captured_at']}")
+
+
+if __name__ == '__main__':
+    main()
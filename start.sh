@@ -6,6 +6,7 @@ DIR="$(cd "$(dirname "$0")" && pwd)"
 source "$DIR/venv/bin/activate"
 
 exec gunicorn app:app \
+    --config "$DIR/gunicorn.conf.py" \
     --bind 0.0.0.0:5050 \
     --workers 4 \
     --worker-class gevent \
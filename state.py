@@ -0,0 +1,418 @@
+"""
+HTTP Playground v3.0 — Shared State Backend
+Integer counters with optional expiry, shared by every worker that points
+at the same store. Used by the rate limiter, the login lockout and the
+quota ledger. STATE_BACKEND picks the store:
+
+- memory: an LRU dict in this process, capped at STATE_MEMORY_MAX_KEYS.
+  Counters are per worker (the old behaviour).
+- sqlite (default): a small WAL file next to the database
+  (platform.state.db). It is shared by every worker on the host, and each
+  operation is one statement.
+- redis: any server that speaks the Redis protocol (STATE_REDIS_URL). It is
+  shared across nodes. Only GET, SET, INCRBY, PTTL, PEXPIRE, DEL and
+  WATCH/MULTI/EXEC are used, so small stand-ins work too; the tests run
+  against one (tests/redis_stub.py).
+
+Backend errors raise StateUnavailable; callers decide whether to fail open
+or fall back to the database. An update that still conflicts at its
+deadline raises StateConflict, a subclass: the store is up, the key is hot.
+"""
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from database import shard_path
+
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')
+STATE_PATH = os.getenv('STATE_PATH') or shard_path('state')
+STATE_REDIS_URL = os.getenv('STATE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+STATE_REDIS_TIMEOUT = float(os.getenv('STATE_REDIS_TIMEOUT', 0.5))
+STATE_PREFIX = os.getenv('STATE_PREFIX', 'hp:')
+STATE_MEMORY_MAX_KEYS = int(os.getenv('STATE_MEMORY_MAX_KEYS', 100000))
+# redis update() retries a conflicting write with backoff until this deadline
+STATE_UPDATE_DEADLINE_MS = float(os.getenv('STATE_UPDATE_DEADLINE_MS', 100))
+
+
+class StateUnavailable(Exception):
+    """The shared store could not be reached or answered with an error."""
+
+
+class StateConflict(StateUnavailable):
+    """An update kept losing the race for one hot key until STATE_UPDATE_DEADLINE_MS; the store itself is fine."""
+
+
+class StateBackend:
+    """Counters: incr() creates missing keys at 0; ttl (seconds) only applies when a key is created."""
+    name = 'base'
+    shared = False
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def incr(self, key, amount=1, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it does not exist. Returns True if it was set."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def update(self, key, fn, ttl=None):
+        """Atomic read-modify-write: fn(value or None) -> (new value or None to keep, result).
+
+        The new value is stored with a fresh ttl; returns fn's result.
+        """
+        raise NotImplementedError
+
+    def metrics(self):
+        return {'backend': self.name, 'shared': self.shared}
+
+
+# ============ IN-PROCESS ============
+class MemoryBackend(StateBackend):
+    name = 'memory'
+
+    def __init__(self, max_keys=STATE_MEMORY_MAX_KEYS, sweep_every=1000):
+        self._data = OrderedDict()  # key -> [value, expires_at or None], least recently used first
+        self._lock = threading.Lock()
+        self._ops = 0
+        self._sweep_every = sweep_every
+        self.max_keys = max(1, max_keys)
+        self.evictions = 0
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _maybe_sweep(self, now):
+        self._ops += 1
+        if self._ops % self._sweep_every == 0:
+            for key in [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]:
+                del self._data[key]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else None
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._live(key, now)
+            if entry is None:
+                entry = [0, now + ttl if ttl else None]
+                self._store(key, entry)
+            entry[0] += amount
+            return entry[0]
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, [value, now + ttl if ttl else None])
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def update(self, key, fn, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._live(key, now)
+            value, result = fn(entry[0] if entry else None)
+            if value is not None:
+                self._store(key, [value, now + ttl if ttl else None])
+            return result
+
+    def metrics(self):
+        with self._lock:
+            keys = len(self._data)
+        return dict(super().metrics(), keys=keys, max_keys=self.max_keys, evictions=self.evictions)
+
+
+# ============ SQLITE FILE (one host) ============
+class SQLiteBackend(StateBackend):
+    name = 'sqlite'
+    shared = True
+
+    def __init__(self, path=STATE_PATH, sweep_interval=60):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._last_sweep = 0
+
+    def _connect(self):
+        # One connection per process: statements are microseconds and never yield
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL
+            ) WITHOUT ROWID""")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _execute(self, sql, params):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                if now - self._last_sweep > self.sweep_interval:
+                    self._last_sweep = now
+                    conn.execute("DELETE FROM state WHERE expires_at <= ?", (now,))
+                return conn.execute(sql, params).fetchone()
+            except sqlite3.Error as e:
+                raise StateUnavailable(str(e))
+
+    def get(self, key):
+        row = self._execute("SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                            (key, time.time()))
+        return row[0] if row else None
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        # An expired row restarts at amount with a fresh expiry, as if it had been deleted
+        row = self._execute("""
+            INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+                expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING value""", (key, amount, now + ttl if ttl else None, now, now))
+        return row[0]
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        row = self._execute("""
+            INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+                WHERE expires_at <= ?
+            RETURNING 1""", (key, value, now + ttl if ttl else None, now))
+        return row is not None
+
+    def delete(self, key):
+        self._execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def update(self, key, fn, ttl=None):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute("SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                                       (key, now)).fetchone()
+                    value, result = fn(row[0] if row else None)
+                    if value is not None:
+                        conn.execute("INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                                     (key, value, now + ttl if ttl else None))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                return result
+            except sqlite3.Error as e:
+                raise StateUnavailable(str(e))
+
+    def metrics(self):
+        row = self._execute("SELECT COUNT(*) FROM state", ())
+        return dict(super().metrics(), path=self.path, keys=row[0])
+
+
+# ============ REDIS PROTOCOL (cluster-wide) ============
+class RedisBackend(StateBackend):
+    """Minimal RESP2 client: one socket per process, one command round trip at a time."""
+    name = 'redis'
+    shared = True
+
+    def __init__(self, url=STATE_REDIS_URL, timeout=STATE_REDIS_TIMEOUT, prefix=STATE_PREFIX):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self.stats = {'commands': 0, 'reconnects': 0, 'errors': 0, 'conflicts': 0}
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._file, self._pid = sock, sock.makefile('rb'), os.getpid()
+        if self.password:
+            self._roundtrip([('AUTH', self.password)])
+        if self.db:
+            self._roundtrip([('SELECT', self.db)])
+
+    def _close(self):
+        try:
+            if self._sock is not None:
+                self._sock.close()
+        except OSError:
+            pass
+        self._sock = self._file = None
+
+    @staticmethod
+    def _encode(args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(out)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('connection closed')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise StateUnavailable(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)[:-2]
+            return data.decode()
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise ConnectionError(f'bad reply {line!r}')
+
+    def _roundtrip(self, commands):
+        self._sock.sendall(b''.join(self._encode(c) for c in commands))
+        return [self._read() for _ in commands]
+
+    def pipeline(self, *commands):
+        """Send several commands in one round trip; returns their replies in order."""
+        with self._lock:
+            return self._pipeline(commands)
+
+    def _pipeline(self, commands, retry=True):
+        # Caller holds self._lock
+        for attempt in ((0, 1) if retry else (1,)):
+            try:
+                if self._sock is None or self._pid != os.getpid():
+                    self._connect()
+                self.stats['commands'] += len(commands)
+                return self._roundtrip(commands)
+            except StateUnavailable:
+                self.stats['errors'] += 1
+                raise
+            except (OSError, ConnectionError, ValueError) as e:
+                # Stale socket (server restart, fork): reconnect once, then give up
+                self._close()
+                if attempt:
+                    self.stats['errors'] += 1
+                    raise StateUnavailable(str(e))
+                self.stats['reconnects'] += 1
+
+    def get(self, key):
+        value = self.pipeline(('GET', self.prefix + key))[0]
+        return int(value) if value is not None else None
+
+    def incr(self, key, amount=1, ttl=None):
+        key = self.prefix + key
+        if not ttl:
+            return self.pipeline(('INCRBY', key, amount))[0]
+        # One MULTI/EXEC: the key is created with its expiry before it is counted, so no crash or
+        # expiry between the two commands can leave a counter that never expires
+        replies = self.pipeline(('MULTI',), ('SET', key, 0, 'PX', max(1, int(ttl * 1000)), 'NX'),
+                                ('INCRBY', key, amount), ('EXEC',))
+        return replies[3][1]
+
+    def add(self, key, value, ttl=None):
+        command = ('SET', self.prefix + key, value, 'NX') + (('PX', int(ttl * 1000)) if ttl else ())
+        return self.pipeline(command)[0] == 'OK'
+
+    def delete(self, key):
+        self.pipeline(('DEL', self.prefix + key))
+
+    def update(self, key, fn, ttl=None):
+        # Optimistic: WATCH the key, write it in MULTI/EXEC, retry if another client got there first.
+        # The lock is held for each attempt because WATCH belongs to the (shared) connection;
+        # it is let go for the backoff, when EXEC has already cleared the WATCH.
+        key = self.prefix + key
+        deadline = time.monotonic() + STATE_UPDATE_DEADLINE_MS / 1000.0
+        backoff = 0.001
+        while True:
+            with self._lock:
+                current = self._pipeline((('WATCH', key), ('GET', key)))[1]
+                try:
+                    value, result = fn(int(current) if current is not None else None)
+                except BaseException:
+                    self._pipeline((('UNWATCH',),), retry=False)
+                    raise
+                if value is None:
+                    self._pipeline((('UNWATCH',),), retry=False)
+                    return result
+                command = ('SET', key, value) + (('PX', max(1, int(ttl * 1000))) if ttl else ())
+                # A dropped connection here must not be retried outside the WATCH
+                if self._pipeline((('MULTI',), command, ('EXEC',)), retry=False)[2] is not None:
+                    return result
+                self.stats['conflicts'] += 1
+            if time.monotonic() >= deadline:
+                raise StateConflict(f'update of {key} kept conflicting')
+            # Jittered, so the clients that collided do not collide again
+            time.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, 0.02)
+
+    def metrics(self):
+        return dict(super().metrics(), url=f'redis://{self.host}:{self.port}/{self.db}', **self.stats)
+
+
+BACKENDS = {'memory': MemoryBackend, 'sqlite': SQLiteBackend, 'redis': RedisBackend}
+
+_backend = None
+
+
+def get_state():
+    """The process-wide backend selected by STATE_BACKEND."""
+    global _backend
+    if _backend is None:
+        if STATE_BACKEND not in BACKENDS:
+            print(f"[State] Unknown STATE_BACKEND={STATE_BACKEND!r}, using memory")
+        _backend = BACKENDS.get(STATE_BACKEND, MemoryBackend)()
+    return _backend
+
+
+def state_stats():
+    try:
+        return get_state().metrics()
+    except StateUnavailable as e:
+        return {'backend': get_state().name, 'error': str(e)}
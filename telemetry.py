@@ -0,0 +1,180 @@
+"""
+HTTP Playground v3.0 — Buffered Telemetry Sink
+audit_logs and login_attempts rows are queued in memory and written in
+batches by a background flusher, so logging never holds the SQLite write lock
+inside the login request.
+
+- Bounded buffer (TELEMETRY_QUEUE_SIZE); on overflow TELEMETRY_OVERFLOW picks
+  what happens: drop_oldest (default), drop_newest, or sync (write inline).
+- Flushed every TELEMETRY_FLUSH_INTERVAL_MS, or early once TELEMETRY_BATCH_SIZE
+  rows are waiting, and once more at interpreter shutdown.
+- Rows carry their own created_at, taken when they were queued.
+"""
+import os
+import atexit
+import threading
+from collections import deque
+from datetime import datetime
+from database import get_db
+
+TELEMETRY_ENABLED = os.getenv('TELEMETRY_ENABLED', 'true').lower() in ('1', 'true', 'yes', 'on')
+TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', 5000))
+TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', 500))
+TELEMETRY_FLUSH_INTERVAL_MS = float(os.getenv('TELEMETRY_FLUSH_INTERVAL_MS', 250))
+TELEMETRY_OVERFLOW = os.getenv('TELEMETRY_OVERFLOW', 'drop_oldest')
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'sync')
+
+# SQLite CURRENT_TIMESTAMP format (UTC), so buffered rows compare like direct ones
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SINKS = {
+    'audit_logs': "INSERT INTO audit_logs (user_id, action, resource, details, ip_address, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+    'login_attempts': "INSERT INTO login_attempts (identifier, success, ip_address, created_at) VALUES (?, ?, ?, ?)",
+}
+
+
+def utc_timestamp(dt=None):
+    return (dt or datetime.utcnow()).strftime(TIMESTAMP_FORMAT)
+
+
+class TelemetryBuffer:
+    def __init__(self, capacity=TELEMETRY_QUEUE_SIZE, batch_size=TELEMETRY_BATCH_SIZE,
+                 interval_ms=TELEMETRY_FLUSH_INTERVAL_MS, overflow=TELEMETRY_OVERFLOW):
+        self.capacity = max(1, capacity)
+        self.batch_size = max(1, batch_size)
+        self.interval = max(1.0, interval_ms) / 1000.0
+        self.overflow = overflow if overflow in OVERFLOW_POLICIES else 'drop_oldest'
+        self._rows = deque()
+        self._inflight = []  # taken by the flusher, not yet committed
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self.counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'written_inline': 0,
+                         'flushes': 0, 'flush_errors': 0}
+
+    def _ensure_started(self):
+        # One flusher per process: gunicorn --preload forks after import
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._rows.clear()
+            threading.Thread(target=self._run, daemon=True, name='telemetry-flusher').start()
+            self._pid = os.getpid()
+
+    def put(self, table, row):
+        self._ensure_started()
+        with self._cond:
+            full = len(self._rows) >= self.capacity
+            if full and self.overflow == 'drop_newest':
+                self.counters['dropped'] += 1
+                return
+            if not full or self.overflow == 'drop_oldest':
+                if full:
+                    self._rows.popleft()
+                    self.counters['dropped'] += 1
+                self._rows.append((table, row))
+                self.counters['enqueued'] += 1
+                if len(self._rows) >= self.batch_size:
+                    self._cond.notify()
+                return
+        # overflow == 'sync': back-pressure the caller with a direct write
+        self._write([(table, row)])
+        self.counters['written_inline'] += 1
+
+    def pending(self, table, predicate):
+        """Rows of `table` not yet committed (buffered or mid-flush) that match predicate(row)."""
+        with self._cond:
+            return [row for t, row in (*self._inflight, *self._rows) if t == table and predicate(row)]
+
+    def _take(self):
+        with self._cond:
+            n = min(len(self._rows), self.batch_size)
+            self._inflight = [self._rows.popleft() for _ in range(n)]
+            return self._inflight
+
+    def _write(self, batch):
+        grouped = {}
+        for table, row in batch:
+            grouped.setdefault(table, []).append(row)
+        for table, rows in grouped.items():
+            conn = get_db(table)
+            try:
+                conn.executemany(SINKS[table], rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def flush(self):
+        """Write everything buffered right now. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.counters['flush_errors'] += 1
+                    self._requeue(batch)
+                    print(f"[Telemetry] Flush of {len(batch)} rows failed, will retry: {e}")
+                    return written
+                finally:
+                    with self._cond:
+                        self._inflight = []
+                self.counters['flushes'] += 1
+                self.counters['written'] += len(batch)
+                written += len(batch)
+
+    def _requeue(self, batch):
+        # Put a failed batch back in front, keeping the buffer bounded
+        with self._cond:
+            room = self.capacity - len(self._rows)
+            keep = batch[:max(0, room)]
+            self.counters['dropped'] += len(batch) - len(keep)
+            self._rows.extendleft(reversed(keep))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._rows) < self.batch_size:
+                    self._cond.wait(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Telemetry] Flusher error: {e}")
+
+    def metrics(self):
+        with self._cond:
+            buffered = len(self._rows)
+        return {'enabled': TELEMETRY_ENABLED, 'buffered': buffered, 'capacity': self.capacity,
+                'overflow': self.overflow, **self.counters}
+
+
+_buffer = TelemetryBuffer()
+atexit.register(_buffer.flush)
+
+
+def record(table, row):
+    """Queue (or, with TELEMETRY_ENABLED=false, write straight away) one telemetry row."""
+    if TELEMETRY_ENABLED:
+        _buffer.put(table, row)
+    else:
+        _buffer._write([(table, row)])
+
+
+def pending_rows(table, predicate):
+    return _buffer.pending(table, predicate) if TELEMETRY_ENABLED else []
+
+
+def flush_telemetry():
+    return _buffer.flush()
+
+
+def telemetry_stats():
+    return _buffer.metrics()
@@ -0,0 +1,14 @@
+"""
+Test setup: a scratch DB_PATH (and STATE_PATH next to it) for the whole session.
+Set before any project module is imported, since they read their settings at import.
+"""
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='playground-tests-')
+os.environ['DB_PATH'] = os.path.join(_workdir, 'platform.db')
+os.environ.setdefault('STATE_BACKEND', 'sqlite')
+# Ledgers under test are flushed by hand
+os.environ['QUOTA_FLUSH_INTERVAL'] = '3600'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,159 @@
+"""
+In-process stand-in for the Redis commands state.RedisBackend uses:
+GET, SET (NX, PX), INCRBY, PTTL, PEXPIRE, DEL, AUTH, SELECT, PING and
+WATCH/UNWATCH/MULTI/EXEC with Redis' optimistic-locking semantics (EXEC
+answers a null array when a watched key changed since WATCH).
+
+    stub = RedisStub().start()
+    backend = RedisBackend(stub.url)
+    ...
+    stub.stop()
+"""
+import socketserver
+import threading
+import time
+
+
+class RedisStub:
+    def __init__(self, host='127.0.0.1', port=0):
+        self.data = {}       # key -> [int value, expires_at ms or None]
+        self.versions = {}   # key -> write count, for WATCH
+        self.lock = threading.Lock()
+        self.commands = 0
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # Replies go out one write per command; without this Nagle holds them for the client's ACK
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                stub._serve(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = Server((host, port), Handler)
+        self.url = 'redis://%s:%d/0' % self.server.server_address
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True, name='redis-stub').start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ---------- protocol ----------
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(rfile.readline()[1:])
+            args.append(rfile.read(size + 2)[:-2].decode())
+        return args
+
+    @staticmethod
+    def _encode(reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, bool):
+            return b'+OK\r\n'
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, Exception):
+            return b'-ERR %s\r\n' % str(reply).encode()
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(RedisStub._encode(r) for r in reply)
+        if reply == 'QUEUED':
+            return b'+QUEUED\r\n'
+        return b'$%d\r\n%s\r\n' % (len(reply), reply.encode())
+
+    def _serve(self, rfile, wfile):
+        watched = {}    # this connection's WATCHed keys -> version at WATCH
+        queued = None   # commands after MULTI, until EXEC
+        while True:
+            args = self._read_command(rfile)
+            if args is None:
+                return
+            cmd = args[0].upper()
+            with self.lock:
+                self.commands += 1
+                if cmd == 'WATCH':
+                    watched.update((k, self.versions.get(k, 0)) for k in args[1:])
+                    reply = True
+                elif cmd == 'UNWATCH':
+                    watched.clear()
+                    reply = True
+                elif cmd == 'MULTI':
+                    queued = []
+                    reply = True
+                elif cmd == 'EXEC':
+                    if any(self.versions.get(k, 0) != v for k, v in watched.items()):
+                        reply = b'*-1\r\n'
+                    else:
+                        reply = [self._run(c) for c in queued or []]
+                    watched.clear()
+                    queued = None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = 'QUEUED'
+                else:
+                    reply = self._run(args)
+            wfile.write(reply if isinstance(reply, bytes) else self._encode(reply))
+
+    # ---------- commands ----------
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time() * 1000:
+            del self.data[key]
+            self._touch(key)
+            return None
+        return entry
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _run(self, args):
+        cmd, key = args[0].upper(), args[1] if len(args) > 1 else None
+        now = time.time() * 1000
+        if cmd == 'GET':
+            entry = self._live(key)
+            return None if entry is None else str(entry[0])
+        if cmd == 'SET':
+            opts = [a.upper() for a in args[3:]]
+            if 'NX' in opts and self._live(key) is not None:
+                return None
+            px = int(args[3 + opts.index('PX') + 1]) if 'PX' in opts else None
+            self.data[key] = [int(args[2]), now + px if px else None]
+            self._touch(key)
+            return True
+        if cmd == 'INCRBY':
+            entry = self._live(key) or [0, None]
+            entry[0] += int(args[2])
+            self.data[key] = entry
+            self._touch(key)
+            return entry[0]
+        if cmd == 'PTTL':
+            entry = self._live(key)
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int(entry[1] - now)
+        if cmd == 'PEXPIRE':
+            entry = self._live(key)
+            if entry is None:
+                return 0
+            entry[1] = now + int(args[2])
+            self._touch(key)
+            return 1
+        if cmd == 'DEL':
+            existed = self.data.pop(key, None) is not None
+            if existed:
+                self._touch(key)
+            return int(existed)
+        if cmd in ('AUTH', 'SELECT', 'PING'):
+            return True
+        return ValueError(f'unknown command {cmd!r}')
@@ -0,0 +1,36 @@
+"""Module list endpoints: offset and cursor pagination."""
+import pytest
+from flask import Flask
+
+from database import init_db
+from modules import modules_bp
+
+app = Flask(__name__)
+app.register_blueprint(modules_bp)
+
+
+@pytest.fixture(scope='module')
+def client():
+    init_db()
+    return app.test_client()
+
+
+def test_per_page_alone_keeps_the_plain_response(client):
+    body = client.get('/api/books?per_page=5').get_json()
+    assert 'pagination' not in body
+    assert body['count'] == body['total']
+
+
+def test_cursor_mode_is_opt_in(client):
+    first = client.get('/api/books?paging=cursor&per_page=5').get_json()
+    assert first['pagination']['mode'] == 'cursor' and first['count'] == 5
+    assert first['pagination']['has_more']
+    after = client.get('/api/books?per_page=5&cursor=' + first['pagination']['next_cursor']).get_json()
+    assert after['data'][0]['id'] < first['data'][-1]['id']
+    # An empty cursor asks for the first page
+    assert client.get('/api/books?per_page=5&cursor=').get_json()['data'] == first['data']
+
+
+def test_page_keeps_offset_paging(client):
+    body = client.get('/api/books?page=2&per_page=5').get_json()
+    assert 'pagination' not in body and body['count'] == 5
@@ -0,0 +1,142 @@
+"""Quota ledger: several workers (one QuotaLedger each) spending one key."""
+import itertools
+import secrets
+import time
+import pytest
+
+import quota
+from quota import QuotaLedger, QuotaBusy
+from database import init_db, get_db
+from state import MemoryBackend, SQLiteBackend
+
+WORKERS = 4
+LIMIT = 15
+
+
+@pytest.fixture(scope='module', autouse=True)
+def schema():
+    init_db()
+
+
+@pytest.fixture(params=['db', 'shared'])
+def backend(request, monkeypatch, tmp_path):
+    # 'db': leases claimed from api_keys; 'shared': from counters in a shared state store
+    store = MemoryBackend() if request.param == 'db' else SQLiteBackend(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(quota, 'get_state', lambda: store)
+    return store
+
+
+def make_key(max_requests=LIMIT):
+    conn = get_db(write=True)
+    name = 'quota_' + secrets.token_hex(4)
+    user_id = conn.execute("INSERT INTO users (username, email, password_hash, status) VALUES (?, ?, 'x', 'approved')",
+                           (name, name + '@example.com')).lastrowid
+    key_id = conn.execute("INSERT INTO api_keys (user_id, key, key_type, max_requests) VALUES (?, ?, 'standard', ?)",
+                          (user_id, 'nhk_' + secrets.token_hex(16), max_requests)).lastrowid
+    conn.commit()
+    conn.close()
+    return {'id': key_id, 'user_id': user_id, 'max_requests': max_requests}
+
+
+def key_row(key_id):
+    conn = get_db()
+    row = dict(conn.execute("SELECT request_count, is_active, (SELECT COALESCE(SUM(reserved), 0) FROM quota_leases "
+                            "WHERE key_id = ?) AS reserved FROM api_keys WHERE id = ?", (key_id, key_id)).fetchone())
+    conn.close()
+    return row
+
+
+def spend_all(ledgers, key, attempts=200):
+    """Round-robin requests over the workers until one reports the key exhausted; busy workers flush peers."""
+    served, busy = 0, 0
+    for ledger in itertools.islice(itertools.cycle(ledgers), attempts):
+        try:
+            remaining = ledger.take(key)
+        except QuotaBusy:
+            busy += 1
+            assert key_row(key['id'])['is_active'], 'deactivated while requests were only reserved'
+            for peer in ledgers:
+                peer.flush()
+            continue
+        if remaining is None:
+            return served, busy
+        served += 1
+        assert served <= key['max_requests']
+    raise AssertionError(f'key never exhausted after {served} requests')
+
+
+def test_every_request_is_served_across_workers(backend):
+    key = make_key()
+    ledgers = [QuotaLedger(block_size=5, workers=WORKERS) for _ in range(WORKERS)]
+    served, _ = spend_all(ledgers, key)
+    assert served == LIMIT
+    for ledger in ledgers:
+        ledger.flush(release_all=True)
+    row = key_row(key['id'])
+    assert row['request_count'] == LIMIT
+    assert not row['is_active']
+
+
+def test_blocks_shrink_near_the_limit(backend):
+    key = make_key()
+    ledgers = [QuotaLedger(block_size=5, workers=WORKERS) for _ in range(WORKERS)]
+    # Each worker serves one request: with 15 left the first blocks are 15 // 4 = 3, not 5
+    for ledger in ledgers:
+        ledger.take(key)
+    held = sum(ledger.metrics()['reserved_unspent'] for ledger in ledgers)
+    assert held + WORKERS < LIMIT
+
+
+def test_idle_leases_are_handed_back(backend):
+    key = make_key()
+    first, second = QuotaLedger(block_size=5, workers=1), QuotaLedger(block_size=5, workers=1)
+    for _ in range(LIMIT - 5):
+        first.take(key)
+    assert first.take(key) is not None
+    # The rest is held by the first worker
+    with pytest.raises(QuotaBusy):
+        second.take(key)
+    first.flush(release_all=True)
+    assert second.take(key) == 3
+    second.flush(release_all=True)
+    row = key_row(key['id'])
+    assert (row['request_count'], row['reserved'], row['is_active']) == (LIMIT - 3, 0, 1)
+
+
+def test_remaining_counts_requests_served_not_reserved(backend):
+    key = make_key()
+    ledgers = [QuotaLedger(block_size=5, workers=WORKERS) for _ in range(2)]
+    assert ledgers[0].take(key) == LIMIT - 1
+    # The first worker's block is reserved, not served: the second still sees 13 left after its own
+    assert ledgers[1].take(key) == LIMIT - 1
+    # Once the second worker has flushed, the first one's next flush picks up what it served
+    ledgers[1].flush()
+    ledgers[0].flush()
+    assert ledgers[0].take(key) == LIMIT - 3
+
+
+def test_reservations_of_a_dead_worker_expire(backend):
+    key = make_key()
+    crashed = QuotaLedger(block_size=LIMIT, workers=1, lease_ttl=0.2, holder='crashed')
+    survivor = QuotaLedger(block_size=5, workers=1, holder='survivor')
+    # The first worker reserves everything, serves one request, flushes once and is never heard of again
+    assert crashed.take(key) == LIMIT - 1
+    crashed.flush()
+    with pytest.raises(QuotaBusy):
+        survivor.take(key)
+    time.sleep(0.3)
+    served, busy = spend_all([survivor], key)
+    assert (served, busy) == (LIMIT - 1, 0)
+    survivor.flush(release_all=True)
+    row = key_row(key['id'])
+    assert (row['request_count'], row['reserved'], row['is_active']) == (LIMIT, 0, 0)
+
+
+def test_a_restarted_worker_drops_its_old_reservations(backend):
+    if backend.shared:
+        pytest.skip('claims from the shared store keep no quota_leases rows')
+    key = make_key()
+    QuotaLedger(block_size=LIMIT, workers=1, holder='worker-1').take(key)
+    assert key_row(key['id'])['reserved'] == LIMIT
+    QuotaLedger(holder='worker-1')._settle_leftovers()
+    assert key_row(key['id'])['reserved'] == 0
@@ -0,0 +1,69 @@
+"""Rate limiter: caller buckets."""
+import secrets
+import pytest
+from flask import Flask
+
+import ratelimit
+from auth import generate_api_key, create_access_token
+from database import init_db, get_db
+from ratelimit import caller_identity, check_rate_limit, Policy
+from state import MemoryBackend
+
+app = Flask(__name__)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def schema():
+    init_db()
+
+
+def make_key(key_type='standard', is_active=1):
+    conn = get_db(write=True)
+    name = 'ratelimit_' + secrets.token_hex(4)
+    user_id = conn.execute("INSERT INTO users (username, email, password_hash, status) VALUES (?, ?, 'x', 'approved')",
+                           (name, name + '@example.com')).lastrowid
+    key = generate_api_key(key_type)
+    conn.execute("INSERT INTO api_keys (user_id, key, key_type, is_active) VALUES (?, ?, ?, ?)",
+                 (user_id, key, key_type, is_active))
+    conn.commit()
+    conn.close()
+    return key
+
+
+def identity(**headers):
+    with app.test_request_context('/api/books', headers=headers, environ_base={'REMOTE_ADDR': '203.0.113.7'}):
+        return caller_identity()
+
+
+def test_existing_key_gets_its_own_bucket():
+    assert identity(**{'X-API-Key': make_key('standard')}).startswith('key:')
+    assert identity(**{'X-API-Key': make_key('ai')}).startswith('key:')
+
+
+def test_made_up_key_is_limited_by_ip():
+    assert identity(**{'X-API-Key': 'nhk_k0_' + 'a' * 32 + '_' + 'b' * 24}) == 'ip:203.0.113.7'
+    assert identity(**{'X-API-Key': 'whatever'}) == 'ip:203.0.113.7'
+    # Well-formed, but never issued or no longer active
+    assert identity(**{'X-API-Key': generate_api_key('standard')}) == 'ip:203.0.113.7'
+    assert identity(**{'X-API-Key': make_key(is_active=0)}) == 'ip:203.0.113.7'
+
+
+def test_random_legacy_keys_share_the_ip_bucket(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_ENABLED', True)
+    store = MemoryBackend()
+    monkeypatch.setattr(ratelimit, 'get_state', lambda: store)
+    monkeypatch.setitem(ratelimit.POLICIES, 'public', Policy.parse('3/minute'))
+    statuses = []
+    for _ in range(5):
+        with app.test_request_context('/api/books', headers={'X-API-Key': 'nhk_' + secrets.token_hex(24)},
+                                      environ_base={'REMOTE_ADDR': '203.0.113.8'}):
+            limited = check_rate_limit()
+            statuses.append(limited[1] if limited else 200)
+    # One bucket for all five: at most the burst of three gets through
+    assert statuses[0] == 200 and statuses.count(200) <= 3
+
+
+def test_verified_token_is_keyed_by_user():
+    token = create_access_token(42, 'alice', 'user')
+    assert identity(Authorization=f'Bearer {token}') == 'user:42'
+    assert identity(Authorization=f'Bearer {token}x') == 'ip:203.0.113.7'
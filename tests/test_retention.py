@@ -0,0 +1,31 @@
+"""Retention: one runner per deployment, stats readable from any worker."""
+import pytest
+
+import retention
+from database import init_db
+from state import SQLiteBackend
+
+
+@pytest.fixture
+def shared_state(monkeypatch, tmp_path):
+    init_db()
+    store = SQLiteBackend(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(retention, 'get_state', lambda: store)
+    return store
+
+
+def test_stats_come_from_the_shared_store(shared_state, monkeypatch):
+    retention.run_retention()
+    # Another worker: nothing ran in this process
+    monkeypatch.setattr(retention, '_stats', dict(retention._stats, runs=0, last_run_at=None))
+    stats = retention.retention_stats()
+    assert stats['runs'] == 1
+    assert stats['last_run_at'] is not None
+
+
+def test_schedule_is_shared_between_leaders(shared_state):
+    first, second = retention.RetentionDaemon(), retention.RetentionDaemon()
+    assert first._due(shared_state)
+    first._schedule(shared_state, complete=True)
+    # A worker taking over the lease keeps the interval instead of pruning again at once
+    assert not second._due(shared_state)
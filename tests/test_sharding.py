@@ -0,0 +1,45 @@
+"""Turning DB_SHARDING=module on over an existing unsharded install."""
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start(db_path, sharding, script=''):
+    """Run init_db in a fresh interpreter, as a restarted app would."""
+    env = dict(os.environ, DB_PATH=db_path, DB_SHARDING=sharding)
+    code = f"import sys; sys.path.insert(0, {ROOT!r})\nfrom database import init_db\ninit_db()\n{script}"
+    return subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+
+
+def test_existing_rows_move_into_new_shards(tmp_path):
+    db_path = str(tmp_path / 'platform.db')
+    start(db_path, 'off')
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE books SET title = 'Edited' WHERE id = 1")
+    conn.execute("INSERT INTO books (title, author) VALUES ('Added', 'Someone')")
+    conn.execute("INSERT INTO user_modifications (table_name, record_id, action, original_data, expires_at) "
+                 "VALUES ('books', 1, 'update', '{\"title\": \"The Great Gatsby\"}', '2099-01-01 00:00:00')")
+    conn.execute("INSERT INTO user_modifications (table_name, record_id, action, expires_at) "
+                 "VALUES ('movies', 1, 'delete', '2099-01-01 00:00:00')")
+    books = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    result = start(db_path, 'module')
+    assert 'moving books' in result.stdout
+
+    shard = sqlite3.connect(str(tmp_path / 'platform.books.db'))
+    assert shard.execute("SELECT COUNT(*) FROM books").fetchone()[0] == books
+    assert shard.execute("SELECT title FROM books WHERE id = 1").fetchone()[0] == 'Edited'
+    assert shard.execute("SELECT record_id FROM user_modifications WHERE table_name = 'books'").fetchall() == [(1,)]
+    shard.close()
+    main = sqlite3.connect(db_path)
+    # Moved out, so the main file no longer reverts them; other modules' entries went to their own shards
+    assert main.execute("SELECT COUNT(*) FROM user_modifications").fetchone()[0] == 0
+    main.close()
+
+    # A second start finds the shards seeded and copies nothing again
+    assert 'moving' not in start(db_path, 'module').stdout
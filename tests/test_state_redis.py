@@ -0,0 +1,120 @@
+"""RedisBackend against the in-process stand-in (tests/redis_stub.py)."""
+import threading
+import time
+import pytest
+
+import state
+from state import RedisBackend, StateConflict, StateUnavailable
+from redis_stub import RedisStub
+
+
+@pytest.fixture(scope='module')
+def stub():
+    server = RedisStub().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def backend(stub, request):
+    # A prefix per test keeps their keys apart on the shared stub
+    return RedisBackend(stub.url, prefix=f'{request.node.name}:')
+
+
+def test_get_missing_and_set(backend):
+    assert backend.get('a') is None
+    assert backend.add('a', 7)
+    assert backend.get('a') == 7
+
+
+def test_incr_creates_and_counts(backend):
+    assert backend.incr('n') == 1
+    assert backend.incr('n', 5) == 6
+    assert backend.incr('n', -2) == 4
+    assert backend.get('n') == 4
+
+
+def test_incr_ttl_set_once(backend):
+    backend.incr('hits', ttl=0.2)
+    time.sleep(0.1)
+    # A later incr must not push the expiry out: the window is fixed from the first hit
+    backend.incr('hits', ttl=0.2)
+    time.sleep(0.15)
+    assert backend.get('hits') is None
+
+
+def test_incr_never_leaves_a_counter_without_ttl(backend, stub, monkeypatch):
+    # The process dies after its first round trip: whatever that sent must already carry the expiry
+    sent = backend.pipeline
+
+    def gone(*commands):
+        raise StateUnavailable('connection lost')
+
+    def first_round_trip_only(*commands):
+        monkeypatch.setattr(backend, 'pipeline', gone)
+        return sent(*commands)
+
+    monkeypatch.setattr(backend, 'pipeline', first_round_trip_only)
+    try:
+        backend.incr('lockout', ttl=0.1)
+    except StateUnavailable:
+        pass
+    value, expires_at = stub.data[backend.prefix + 'lockout']
+    assert value == 1 and expires_at is not None
+
+
+def test_add_only_when_absent(backend):
+    assert backend.add('lock', 1, ttl=0.1)
+    assert not backend.add('lock', 2)
+    assert backend.get('lock') == 1
+    time.sleep(0.15)
+    assert backend.add('lock', 3)
+    assert backend.get('lock') == 3
+
+
+def test_update_read_modify_write(backend):
+    assert backend.update('v', lambda v: ((v or 0) + 10, 'set')) == 'set'
+    # None keeps the value untouched
+    assert backend.update('v', lambda v: (None, v)) == 10
+    assert backend.get('v') == 10
+
+
+def test_update_ttl(backend):
+    backend.update('t', lambda v: (1, None), ttl=0.1)
+    time.sleep(0.15)
+    assert backend.get('t') is None
+
+
+def test_concurrent_updates_are_not_lost(stub, backend):
+    clients = [RedisBackend(stub.url, prefix=backend.prefix) for _ in range(4)]
+
+    def bump(client):
+        for _ in range(50):
+            client.update('hot', lambda v: ((v or 0) + 1, None))
+
+    threads = [threading.Thread(target=bump, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.get('hot') == 200
+
+
+def test_update_conflicting_past_deadline(backend, monkeypatch):
+    monkeypatch.setattr(state, 'STATE_UPDATE_DEADLINE_MS', 20)
+    other = RedisBackend(f"redis://{backend.host}:{backend.port}/0", prefix=backend.prefix)
+
+    def always_raced(v):
+        # Another client writes the key between our WATCH and EXEC every time
+        other.incr('raced')
+        return (v or 0) + 1, None
+
+    with pytest.raises(StateConflict):
+        backend.update('raced', always_raced)
+    assert backend.stats['conflicts'] > 1
+
+
+def test_unreachable_server_raises(stub):
+    dead = RedisBackend('redis://127.0.0.1:1/0', timeout=0.2)
+    with pytest.raises(StateUnavailable):
+        dead.get('x')
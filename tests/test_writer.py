@@ -0,0 +1,29 @@
+"""Group-commit writer: callers that time out."""
+import threading
+import time
+import pytest
+
+from writer import GroupCommitWriter
+
+
+def test_timed_out_job_never_commits():
+    writer = GroupCommitWriter(max_rows=1, max_wait_ms=0)
+    release, ran = threading.Event(), []
+    # Hold the writer thread in a batch of its own
+    blocker = threading.Thread(target=writer.submit, args=(lambda conn: release.wait(5),))
+    blocker.start()
+    time.sleep(0.05)
+    with pytest.raises(TimeoutError):
+        writer.submit(lambda conn: ran.append(1), timeout=0.05)
+    release.set()
+    blocker.join()
+    writer.submit(lambda conn: None)
+    assert ran == []
+    assert writer.metrics()['abandoned'] == 1
+
+
+def test_job_already_committing_is_waited_for():
+    writer = GroupCommitWriter(max_rows=1, max_wait_ms=0)
+    # Outlives the caller's timeout, but it was picked up: the caller gets its result, not an error
+    assert writer.submit(lambda conn: time.sleep(0.2) or 'ok', timeout=0.05) == 'ok'
+    assert writer.metrics()['abandoned'] == 0
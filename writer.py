@@ -0,0 +1,189 @@
+"""
+HTTP Playground v3.0 — Group-Commit Writer
+Optional batching for public POST creates. Request handlers hand their insert
+to the writer thread of the table's database shard, which drains the queue into one transaction per
+batch (bounded by WRITE_BATCH_MAX_ROWS rows or WRITE_BATCH_MAX_WAIT_MS of
+latency) and wakes every caller with its own result. One commit, one fsync,
+per batch instead of per row.
+
+Each job runs inside its own SAVEPOINT, so a failing insert only fails its
+own caller; the rest of the batch still commits.
+
+A caller that times out abandons its job if the writer has not picked it up
+yet, so a request answered with an error never commits later. A job already
+in a committing batch is waited for instead: its outcome is the caller's.
+"""
+import os
+import queue
+import threading
+import time
+from database import get_db, shard_for
+
+WRITE_BATCH_ENABLED = os.getenv('WRITE_BATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes', 'on')
+WRITE_BATCH_MAX_ROWS = int(os.getenv('WRITE_BATCH_MAX_ROWS', 100))
+WRITE_BATCH_MAX_WAIT_MS = float(os.getenv('WRITE_BATCH_MAX_WAIT_MS', 5))
+WRITE_BATCH_QUEUE_SIZE = int(os.getenv('WRITE_BATCH_QUEUE_SIZE', 10000))
+WRITE_BATCH_TIMEOUT = float(os.getenv('WRITE_BATCH_TIMEOUT', 10))
+
+
+class WriteQueueFull(Exception):
+    """The writer is WRITE_BATCH_QUEUE_SIZE jobs behind; shed the request."""
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'done', 'result', 'error', 'started', 'abandoned')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Both set under the writer's lock: a job is either taken into a batch or abandoned, never both
+        self.started = False
+        self.abandoned = False
+
+
+class GroupCommitWriter:
+    """Batches jobs for one database shard (one writer per shard, so shards commit in parallel)."""
+
+    def __init__(self, shard='main', max_rows=WRITE_BATCH_MAX_ROWS, max_wait_ms=WRITE_BATCH_MAX_WAIT_MS,
+                 queue_size=WRITE_BATCH_QUEUE_SIZE):
+        self.shard = shard
+        self.max_rows = max(1, max_rows)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self.abandoned = 0
+        self.max_batch = 0
+
+    def _ensure_started(self):
+        # Started lazily and per process: gunicorn --preload forks after import
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True,
+                                      name=f'group-commit-writer-{self.shard}')
+            thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, fn, *args, timeout=WRITE_BATCH_TIMEOUT):
+        """Run fn(conn, *args) in the next batch and return its result (or raise its error)."""
+        self._ensure_started()
+        job = _Job(fn, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise WriteQueueFull('write queue full')
+        if not job.done.wait(timeout):
+            with self._lock:
+                job.abandoned = not job.started
+            if job.abandoned:
+                self.abandoned += 1
+                raise TimeoutError('write batch did not commit in time')
+            # Already in a committing batch: whatever it does is this caller's result
+            job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _collect(self, q):
+        batch = [q.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _take(self, batch):
+        """Claim the jobs whose callers are still waiting; abandoned ones are dropped unrun."""
+        with self._lock:
+            batch = [job for job in batch if not job.abandoned]
+            for job in batch:
+                job.started = True
+        return batch
+
+    def _run(self, q):
+        while True:
+            batch = self._take(self._collect(q))
+            if not batch:
+                continue
+            try:
+                self._commit(batch)
+            except Exception as e:
+                print(f"[Writer] Batch of {len(batch)} failed: {e}")
+                for job in batch:
+                    if job.error is None:
+                        job.error = e
+            for job in batch:
+                job.done.set()
+
+    def _commit(self, batch):
+        conn = get_db(shard=self.shard)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    job.result = job.fn(conn, *job.args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    job.error = e
+                    self.failed += 1
+                conn.execute("RELEASE job")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+
+    def metrics(self):
+        return {
+            'enabled': WRITE_BATCH_ENABLED,
+            'max_rows': self.max_rows,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+            'batches': self.batches,
+            'rows': self.rows,
+            'failed': self.failed,
+            'abandoned': self.abandoned,
+            'avg_batch': round(self.rows / self.batches, 2) if self.batches else 0,
+            'max_batch': self.max_batch,
+        }
+
+
+_writers = {}
+
+
+def submit_write(table, fn, *args):
+    """Run fn(conn, *args) in the next batch committed to the shard owning `table`."""
+    shard = shard_for(table)
+    writer = _writers.get(shard) or _writers.setdefault(shard, GroupCommitWriter(shard))
+    return writer.submit(fn, *args)
+
+
+def writer_stats():
+    per_shard = {shard: w.metrics() for shard, w in list(_writers.items())}
+    totals = GroupCommitWriter().metrics()
+    for m in per_shard.values():
+        for key in ('queued', 'batches', 'rows', 'failed', 'abandoned'):
+            totals[key] += m[key]
+        totals['max_batch'] = max(totals['max_batch'], m['max_batch'])
+    totals['avg_batch'] = round(totals['rows'] / totals['batches'], 2) if totals['batches'] else 0
+    totals['shards'] = len(per_shard)
+    return totals